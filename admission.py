@@ -0,0 +1,181 @@
+"""
+Admission control in front of the providers.
+
+Each provider gets an AdmissionQueue: at most `limit` STT, LLM or TTS
+calls run against it at once and the rest wait. Waiters are served by
+priority class first (interactive chat, then standard requests, then batch,
+echo and background jobs), and within a class round-robin across keys
+(the chat session, or the client address), so one busy session can't
+starve the others.
+
+Requests are shed with a 503 and Retry-After instead of queueing without
+bound: up front when the expected wait (callers ahead of this one x the
+recent mean time a slot is held / limit) is over ADMISSION_DEADLINE, and
+while queued when the wait actually reaches it. Work that was already
+accepted (background jobs, the items of a batch) waits without a deadline.
+
+Endpoints label their request with `classify(priority, key)`; the label
+lives in a context variable, so provider calls deep in the pipeline (and
+tasks started from it) pick it up.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Tuple
+
+from metrics import record_stage
+from resilience import LatencyWindow, ProviderError
+
+# Most seconds a request may wait for a provider slot before it is shed
+ADMISSION_DEADLINE = float(os.getenv("ADMISSION_DEADLINE", "5"))
+
+# Highest priority first
+PRIORITIES = ("interactive", "standard", "batch")
+
+# (priority, fairness key, shed after the deadline?) of the current request
+_request: contextvars.ContextVar[Tuple[str, str, bool]] = contextvars.ContextVar(
+    "admission_request", default=("standard", "", True)
+)
+
+
+def classify(priority: str, key: str = "", shed: bool = True):
+    """Label the current request (and the tasks it starts) for admission."""
+    _request.set((priority, key, shed))
+
+
+class Overloaded(ProviderError):
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"Too many requests waiting for {provider}; try again shortly",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class AdmissionQueue:
+    """At most `limit` concurrent calls to one provider; limit 0 admits everything."""
+
+    def __init__(self, name: str, limit: int, deadline: float = ADMISSION_DEADLINE):
+        self.name = name
+        self.limit = limit
+        self.deadline = deadline
+        self.in_use = 0
+        # priority -> key -> waiters in arrival order; keys rotate as they are served
+        self._waiters: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self.queued = {p: 0 for p in PRIORITIES}
+        self._hold = 0.0
+        self.waits = LatencyWindow()
+        self.admitted = 0
+        self.shed = {p: 0 for p in PRIORITIES}
+
+    def expected_wait(self, priority: str) -> float:
+        """Rough wait for a new caller of this priority, from the queue ahead of it."""
+        if not self.limit or self.in_use < self.limit:
+            return 0.0
+        ahead = 0
+        for p in PRIORITIES:
+            ahead += self.queued[p]
+            if p == priority:
+                break
+        return (ahead + 1) * self._hold / self.limit
+
+    def check(self):
+        """Shed the current request now if it would wait past the deadline."""
+        priority = _request.get()[0]
+        expected = self.expected_wait(priority)
+        if expected > self.deadline:
+            self.shed[priority] += 1
+            raise Overloaded(self.name, expected)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - started
+            # Moving average of how long a call keeps its slot, for expected_wait()
+            self._hold = held if not self._hold else 0.9 * self._hold + 0.1 * held
+            self._release()
+
+    async def _acquire(self):
+        priority, key, shed = _request.get()
+        if not self.limit or (self.in_use < self.limit and not any(self.queued.values())):
+            self.in_use += 1
+            self.admitted += 1
+            return
+        if shed:
+            self.check()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].setdefault(key, deque()).append(waiter)
+        self.queued[priority] += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.deadline if shed else None)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                self._discard(priority, key, waiter)
+                self.shed[priority] += 1
+                raise Overloaded(self.name, self.expected_wait(priority)) from None
+            # The slot was handed over just as the deadline passed: it is ours, so use it
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the caller went away
+                self._release()
+            else:
+                self._discard(priority, key, waiter)
+            raise
+        waited = time.perf_counter() - started
+        self.waits.add(waited)
+        self.admitted += 1
+        record_stage("admission_wait", waited, provider=self.name)
+
+    def _discard(self, priority: str, key: str, waiter: asyncio.Future):
+        waiters = self._waiters[priority].get(key)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued[priority] -= 1
+            if not waiters:
+                del self._waiters[priority][key]
+
+    def _release(self):
+        self.in_use -= 1
+        while self.in_use < self.limit and self._hand_over():
+            pass
+
+    def _hand_over(self) -> bool:
+        """Give a free slot to the next waiter; False if nobody is waiting."""
+        for priority in PRIORITIES:
+            keys = self._waiters[priority]
+            while keys:
+                key, waiters = next(iter(keys.items()))
+                waiter = waiters.popleft()
+                self.queued[priority] -= 1
+                if waiters:
+                    keys.move_to_end(key)
+                else:
+                    del keys[key]
+                if not waiter.done():
+                    waiter.set_result(None)
+                    self.in_use += 1
+                    return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.waits.quantile(0.5), self.waits.quantile(0.95)
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "queued": dict(self.queued),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "wait_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "wait_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "mean_hold_ms": round(self._hold * 1000, 1),
+        }
@@ -1,26 +1,104 @@
 
 
+import startup_profile
+startup_profile.install()
+
 import os
-import requests
+import asyncio
+import httpx
+from contextlib import aclosing, asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, Form, HTTPException, Request, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from starlette.requests import Request as StarletteRequest
-import assemblyai as aai
-import io
+import gzip
+import hashlib
+import json
 import time
-from assemblyai import Client, Transcriber, types
-from pydantic import BaseModel
-import google.generativeai as genai
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from http_client import ProviderHTTPClient
+from resilience import CIRCUIT_STATES, ProviderError, ProviderPolicy
+from admission import PRIORITIES, AdmissionQueue, classify
+from transcript_poller import TranscriptPoller
+from streaming import MURF_MAX_CHARS, iter_sentences, split_for_tts, sse_event
+from session_store import create_session_store
+from upload_store import MultipartError, MultipartFileStream, UploadStore, UploadTooLarge
+from audio_preprocess import AudioPreprocessor, NoSpeechDetected
+from singleflight import SingleFlight
+from batch import run_batch
+from jobs import JobManager, QueueFull
+from audio_proxy import AudioProxy, content_type_for, parse_range
+from llm_models import ModelRegistry
+from conversation import CONTEXT_MAX_MESSAGES, ConversationContext, summary_prompt
+from metrics import TimingMiddleware, record_stage, set_response_header, stage, timing_context, timings_ms
+import metrics
+from caches import ResultCache, StaleWhileRevalidate, content_hash, normalize_text, tts_key
 
 load_dotenv()
 
-app = FastAPI()
+# Shared pooled HTTP client for all provider calls (created at startup)
+http = ProviderHTTPClient()
+
+# Adaptive timeouts, hedged retries and circuit breakers per provider (see resilience.py)
+murf_policy = ProviderPolicy("murf")
+assemblyai_policy = ProviderPolicy("assemblyai")
+gemini_policy = ProviderPolicy("gemini")
+provider_policies = (murf_policy, assemblyai_policy, gemini_policy)
+
+# Bounded concurrent calls per provider (transcriptions, LLM calls, syntheses); the rest
+# queue by priority and session, or are shed with a 503 (see admission.py). 0 = no limit
+assemblyai_admission = AdmissionQueue("assemblyai", int(os.getenv("ASSEMBLYAI_CONCURRENCY", "64")))
+gemini_admission = AdmissionQueue("gemini", int(os.getenv("GEMINI_CONCURRENCY", "32")))
+murf_admission = AdmissionQueue("murf", int(os.getenv("MURF_CONCURRENCY", "32")))
+admission_queues = (assemblyai_admission, gemini_admission, murf_admission)
+
+# Concurrent identical provider calls share one upstream request
+stt_flight = SingleFlight("stt")
+llm_flight = SingleFlight("llm")
+tts_flight = SingleFlight("tts")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup_profile.step("http client start"):
+        await http.start()
+    with startup_profile.step("session store start"):
+        await session_store.start()
+    with startup_profile.step("transcript poller start"):
+        await transcript_poller.start()
+    with startup_profile.step("voices snapshot load"):
+        await voices_cache.load_snapshot()
+    with startup_profile.step("upload store start"):
+        await upload_store.start()
+    with startup_profile.step("job manager start"):
+        await jobs.start()
+    with startup_profile.step("audio proxy start"):
+        await audio_proxy.start()
+    startup_profile.mark("serving")
+    # Readiness flips once the warm-up finishes; liveness isn't blocked on it
+    warmup_task = asyncio.create_task(_warm_up())
+    try:
+        yield
+    finally:
+        readiness["ready"] = False
+        warmup_task.cancel()
+        await jobs.close()
+        await audio_proxy.close()
+        await transcript_poller.close()
+        await upload_store.close()
+        await session_store.close()
+        await http.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -31,20 +109,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Chat history datastore - in-memory dictionary for prototype
-# In production, use a proper database like PostgreSQL, MongoDB, or Redis
-chat_history: Dict[str, List[Dict[str, str]]] = {}
+# Per-stage timings in a Server-Timing header (plus X-Audio-Preprocess), see metrics.py
+app.add_middleware(TimingMiddleware)
+
+# Chat history datastore - in-memory by default; set SESSION_STORE=sqlite or redis
+# so sessions are shared between uvicorn workers / pods
+session_store = create_session_store()
 
 API_KEY = os.getenv("MURF_API_KEY")
-MURF_URL = "https://api.murf.ai/v1/speech/generate"
+MURF_BASE_URL = os.getenv("MURF_BASE_URL", "https://api.murf.ai").rstrip("/")
+MURF_URL = f"{MURF_BASE_URL}/v1/speech/generate"
+MURF_VOICES_URL = f"{MURF_BASE_URL}/v1/speech/voices"
 
-templates = Jinja2Templates(directory="templates")
+# Jinja2 is only needed for the index page; set up on its first request
+templates = None
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Serve index.html at root
 @app.get("/", response_class=HTMLResponse)
 async def read_index(request: StarletteRequest):
+    global templates
+    if templates is None:
+        from fastapi.templating import Jinja2Templates
+        templates = Jinja2Templates(directory="templates")
     return templates.TemplateResponse("index.html", {"request": request})
 
 # Generate a new session ID
@@ -52,56 +140,275 @@ async def read_index(request: StarletteRequest):
 async def create_session():
     """Create a new chat session and return the session ID"""
     session_id = str(uuid.uuid4())
-    chat_history[session_id] = []
+    await session_store.create(session_id)
     return {"session_id": session_id}
 
-# Get chat history for a session
+# Most messages returned per history request; larger histories are paged with `next_cursor`
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "200"))
+# History responses at least this large are gzipped for clients that accept it
+CHAT_HISTORY_GZIP_BYTES = int(os.getenv("CHAT_HISTORY_GZIP_BYTES", "1024"))
+
+
+# `since` is a message index, or a Unix timestamp when it has a fraction or is that large
+def _parse_since(since: Optional[str]) -> Tuple[int, Optional[float]]:
+    if since is None or since == "":
+        return 0, None
+    try:
+        value = float(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be a message index or a Unix timestamp")
+    if value < 0:
+        raise HTTPException(status_code=400, detail="since must not be negative")
+    if "." in since or value >= 1e9:
+        return 0, value
+    return int(value), None
+
+
+# Get chat history for a session: incremental (`since`), paged (`cursor`, `limit`), 304 when unchanged
 @app.get("/agent/chat/{session_id}")
-async def get_chat_history(session_id: str):
-    """Get chat history for a specific session"""
-    if session_id not in chat_history:
+async def get_chat_history(
+    session_id: str, request: Request, since: Optional[str] = None, cursor: Optional[int] = None, limit: Optional[int] = None,
+):
+    """Get chat history for a specific session
+
+    `since` returns only messages after a message index (the `next_cursor` of an
+    earlier response, or `message_count` from a chat turn) or a timestamp; `cursor`
+    continues a paged response. Each message carries its `index`.
+    """
+    version = await session_store.version(session_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return {"messages": chat_history[session_id]}
+    # Messages never change once appended, so the count within one incarnation of the
+    # session (its epoch) identifies a version
+    epoch, version = version
+    etag = f'W/"{epoch:x}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    start, after = _parse_since(since)
+    if cursor is not None:
+        if cursor < 0:
+            raise HTTPException(status_code=400, detail="cursor must not be negative")
+        start = cursor
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    limit = min(limit or CHAT_HISTORY_PAGE_SIZE, CHAT_HISTORY_PAGE_SIZE)
+    # One extra message tells whether another page follows
+    messages, total = await session_store.page(session_id, start, limit + 1, after)
+    more = len(messages) > limit
+    messages = messages[:limit]
+    next_cursor = messages[-1]["index"] + 1 if messages else total
+    if total != version:
+        headers["ETag"] = f'W/"{epoch:x}-{total}"'
+    body = {
+        "messages": messages,
+        "message_count": total,
+        "next_cursor": next_cursor,
+        "has_more": more,
+    }
+    return _compact_json(request, body, headers)
+
+
+# JSON without the default encoder's overhead (orjson when installed), gzipped when large
+# enough and the client accepts it
+def _compact_json(request: Request, body, headers: Dict[str, str]) -> Response:
+    if orjson is not None:
+        content = orjson.dumps(body)
+    else:
+        content = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(content) >= CHAT_HISTORY_GZIP_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        content = gzip.compress(content, compresslevel=5)
+        headers = {**headers, "Content-Encoding": "gzip"}
+    return Response(content, media_type="application/json", headers=headers)
+
+# Uploaded recordings are streamed to disk and stored once per content hash (see upload_store.py)
+upload_store = UploadStore()
+# Slack for multipart boundaries/headers on top of the file size cap
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+# Upload bodies are parsed by hand as they stream in, so describe the form for the docs
+def _upload_openapi(*text_fields: str) -> Dict:
+    properties = {"file": {"type": "string", "format": "binary"}}
+    properties.update({name: {"type": "string"} for name in text_fields})
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": {
+                "type": "object",
+                "required": ["file"],
+                "properties": properties,
+            }}},
+        }
+    }
+
+
+# Reject oversized uploads up front when the client announces the size
+def _check_upload_length(request: Request):
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > upload_store.max_bytes + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {upload_store.max_bytes} byte limit")
+
+
+# Who sent a request, for per-client fairness and scoping when there's no session
+def _client_id(request: Request) -> str:
+    return request.client.host if request.client else ""
+
+
+# Label a pipeline request for admission control (fair queueing per session, or per client
+# without one) and shed it before reading the body if its first provider is backed up.
+# `wait=True` requests are never shed once accepted (a batch shouldn't fail item by item)
+def _admit(request: Request, priority: str, session_id: Optional[str] = None,
+           first: AdmissionQueue = assemblyai_admission, wait: bool = False):
+    classify(priority, session_id or _client_id(request), shed=not wait)
+    first.check()
+
+
+# Run a provider call once its admission queue has a free slot
+async def _admitted(queue: AdmissionQueue, call):
+    async with queue.slot():
+        return await call()
+
 
 # Endpoint to receive uploaded audio file
-@app.post("/upload_audio")
-async def upload_audio(file: UploadFile = File(...)):
-    upload_dir = "uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, file.filename)
-    # Save file
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+@app.post("/upload_audio", openapi_extra=_upload_openapi())
+async def upload_audio(request: Request):
+    _check_upload_length(request)
+    upload = MultipartFileStream(request, "file", max_bytes=upload_store.max_bytes)
+    try:
+        digest, size, deduplicated = await upload_store.save(upload)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultipartError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        "filename": file.filename,
-        "content_type": file.content_type,
-        "size": len(content)
+        "filename": upload.filename,
+        "content_type": upload.content_type,
+        "size": size,
+        "sha256": digest,
+        "deduplicated": deduplicated
     }
 
+# Voice catalogue rarely changes: fetch once, serve from memory, refresh in the background
+async def _fetch_voices():
+    r = await murf_policy.call("voices", lambda: http.get(MURF_VOICES_URL, headers={"api-key": API_KEY}), hedge=True)
+    r.raise_for_status()
+    return r.json()
+
+voices_cache = StaleWhileRevalidate(
+    "voices",
+    _fetch_voices,
+    ttl=float(os.getenv("VOICES_CACHE_TTL", "3600")),
+    snapshot_path=os.getenv("VOICES_SNAPSHOT_PATH"),
+)
+VOICES_BROWSER_MAX_AGE = int(os.getenv("VOICES_BROWSER_MAX_AGE", "300"))
+
 # Endpoint to get available voices from Murf
 @app.get("/voices")
-async def get_voices():
+async def get_voices(request: Request):
+    try:
+        voices, etag = await voices_cache.get()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=400, detail=_provider_error_detail(e))
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={VOICES_BROWSER_MAX_AGE}"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(voices, headers=headers)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates or "*" in candidates
+
+# Murf audio URLs expire after 72 hours, so cached URLs must be dropped well before that
+tts_cache = ResultCache(
+    "tts",
+    max_entries=int(os.getenv("TTS_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("TTS_CACHE_TTL", "86400")),
+    disk_dir=os.getenv("TTS_CACHE_DIR"),
+)
+
+# Optional local copy of Murf's audio, served from /audio/{name}
+audio_proxy = AudioProxy(http)
+
+
+# Synthesized audio served from the local cache (AUDIO_PROXY=true, see audio_proxy.py)
+@app.get("/audio/{name}")
+async def proxied_audio(name: str, request: Request):
+    audio = await audio_proxy.get(name)
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    etag = f'"{name}"'
     headers = {
-        "api-key": API_KEY
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
     }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    media_type = content_type_for(name)
+
+    if not isinstance(audio, bytes):
+        await audio.started.wait()
+        if audio.error is not None and not audio.data:
+            raise HTTPException(status_code=502, detail=f"Audio fetch failed: {audio.error}")
+
+    if isinstance(audio, bytes):
+        size = len(audio)
+    elif audio.length is not None:
+        # Still downloading, but the size is known: ranges can be served as the bytes arrive
+        size = audio.length
+    else:
+        # Still downloading with unknown size: stream everything (ignoring any Range)
+        return StreamingResponse(audio.iter_bytes(), media_type=media_type, headers={**headers, "Cache-Control": "no-store"})
+
     try:
-        r = requests.get("https://api.murf.ai/v1/speech/voices", headers=headers)
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.RequestException as e:
-        try:
-            error_detail = r.json()
-        except Exception:
-            error_detail = str(e)
-        raise HTTPException(status_code=400, detail=error_detail)
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError as e:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"}, content=str(e))
+    start, end = byte_range or (0, size)
+    headers["Content-Length"] = str(end - start)
+    status_code = 200
+    if byte_range is not None:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    if isinstance(audio, bytes):
+        return Response(audio[start:end], status_code=status_code, media_type=media_type, headers=headers)
+    return StreamingResponse(audio.iter_bytes(start, end), status_code=status_code, media_type=media_type, headers=headers)
 
-# Accept voice_id from frontend
-@app.post("/generate")
-async def generate_audio(request: Request):
-    form = await request.form()
-    text = form.get("text")
-    voice_id = form.get("voice_id", "en-US-natalie")
+
+# Chunks of a long reply played back to back as one stream (see _synthesize_reply)
+@app.get("/audio/playlist/{name}")
+async def playlist_audio(name: str):
+    urls = audio_proxy.playlist(name)
+    if urls is None:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    return StreamingResponse(
+        audio_proxy.iter_playlist(urls),
+        media_type=content_type_for(name),
+        headers={"Cache-Control": "public, max-age=3600"},
+    )
+
+
+# Helper to synthesize text with Murf and return the audio URL
+async def _synthesize_with_murf(text: str, voice_id: str, source: Optional[str] = None) -> str:
+    # Same (normalized text, voice, format) → same audio; serve repeats from the cache
+    text = normalize_text(text or "")
+    cache_key = tts_key(text, voice_id, "mp3")
+    with stage("tts", provider="murf", voice_id=voice_id) as span:
+        audio_url = await tts_cache.get(cache_key, source=source)
+        if audio_url is not None:
+            span.status = "cache_hit"
+        else:
+            # Identical in-flight requests (retries, double clicks) share one Murf call
+            audio_url = await tts_flight.do(cache_key, lambda: _murf_generate(text, voice_id, cache_key))
+    # Hand out a local URL and start pulling the audio into the proxy cache
+    return audio_proxy.local_url(audio_url) if audio_proxy.enabled else audio_url
+
+
+async def _murf_generate(text: str, voice_id: str, cache_key: str) -> str:
     headers = {
         "api-key": API_KEY,
         "Content-Type": "application/json"
@@ -111,377 +418,1102 @@ async def generate_audio(request: Request):
         "voice_id": voice_id,
         "output_format": "mp3"
     }
-    try:
-        r = requests.post(MURF_URL, json=payload, headers=headers)
-        r.raise_for_status()
-        response = r.json()
-        audio_url = response.get("audio_url") or response.get("audioFile")
-        if not audio_url:
-            print("Murf API response:", response)
-            raise HTTPException(status_code=500, detail=f"No audio URL returned. Murf response: {response}")
-        return {"audio_url": audio_url}
-    except requests.exceptions.RequestException as e:
+    # Synthesis is idempotent, so a slow call may be hedged with a second one. Murf takes
+    # longer for longer texts: short sentences and long chunks keep separate latency histories
+    operation = "generate" if len(text) < 1000 else "generate_long"
+    r = await _admitted(murf_admission, lambda: murf_policy.call(
+        operation, lambda: http.post(MURF_URL, json=payload, headers=headers), hedge=True,
+    ))
+    r.raise_for_status()
+    response = r.json()
+    audio_url = response.get("audio_url") or response.get("audioFile")
+    if not audio_url:
+        raise HTTPException(status_code=500, detail=f"No audio URL returned. Murf response: {response}")
+    await tts_cache.set(cache_key, audio_url)
+    return audio_url
+
+
+TTS_CHUNK_CHARS = min(int(os.getenv("TTS_CHUNK_CHARS", str(MURF_MAX_CHARS))), MURF_MAX_CHARS)
+TTS_CHUNK_CONCURRENCY = int(os.getenv("TTS_CHUNK_CONCURRENCY", "4"))
+# Also hand out one /audio/playlist URL per multi-chunk reply (playlists are kept per process)
+TTS_PLAYLIST = os.getenv("TTS_PLAYLIST", "false").lower() in ("1", "true", "yes")
+
+
+# Synthesize a reply of any length: text over Murf's limit is split at sentence/paragraph
+# boundaries and the chunks are synthesized concurrently. Returns (the first chunk's URL,
+# or with TTS_PLAYLIST one URL playing the whole reply; the ordered chunk URLs).
+async def _synthesize_reply(text: str, voice_id: str, source: str) -> Tuple[str, List[str]]:
+    chunks = split_for_tts(text or "", TTS_CHUNK_CHARS)
+    if len(chunks) <= 1:
+        audio_url = await _synthesize_with_murf(text, voice_id, source=source)
+        return audio_url, [audio_url]
+    audio_urls: List[str] = [""] * len(chunks)
+    synthesize = lambda chunk: _synthesize_with_murf(chunk, voice_id, source=source)
+    async with aclosing(run_batch(chunks, synthesize, TTS_CHUNK_CONCURRENCY)) as results:
+        async for index, audio_url, error in results:
+            if error is not None:
+                raise error
+            audio_urls[index] = audio_url
+    return (audio_proxy.playlist_url(audio_urls) if TTS_PLAYLIST else audio_urls[0]), audio_urls
+
+
+# Extract the most useful error detail from a failed provider call
+def _provider_error_detail(e: httpx.HTTPError):
+    response = getattr(e, "response", None)
+    if response is not None:
         try:
-            error_detail = r.json()
+            return response.json()
         except Exception:
-            error_detail = str(e)
-        raise HTTPException(status_code=400, detail=error_detail)
+            pass
+    return str(e)
+
+# Accept voice_id from frontend
+@app.post("/generate")
+async def generate_audio(request: Request):
+    _admit(request, "standard", first=murf_admission)
+    form = await request.form()
+    text = form.get("text")
+    voice_id = form.get("voice_id", "en-US-natalie")
+    try:
+        audio_url, audio_urls = await _synthesize_reply(text, voice_id, source="generate")
+        return {"audio_url": audio_url, "audio_urls": audio_urls}
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=400, detail=_provider_error_detail(e))
 
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
+ASSEMBLYAI_BASE_URL = os.getenv("ASSEMBLYAI_BASE_URL", "https://api.assemblyai.com").rstrip("/")
+# Public base URL of this server; when set, AssemblyAI calls back instead of us polling
+ASSEMBLYAI_WEBHOOK_BASE_URL = os.getenv("ASSEMBLYAI_WEBHOOK_BASE_URL", "").rstrip("/")
+ASSEMBLYAI_WEBHOOK_SECRET = os.getenv("ASSEMBLYAI_WEBHOOK_SECRET") or uuid.uuid4().hex
+WEBHOOK_AUTH_HEADER = "X-Webhook-Secret"
+
+# One background scheduler tracks every outstanding transcript
+transcript_poller = TranscriptPoller(http, ASSEMBLYAI_BASE_URL, ASSEMBLYAI_API_KEY, policy=assemblyai_policy)
+
+# Transcripts keyed by a hash of the audio bytes, so retries and duplicate uploads skip AssemblyAI
+transcript_cache = ResultCache(
+    "transcripts",
+    max_entries=int(os.getenv("TRANSCRIPT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TRANSCRIPT_CACHE_TTL", "86400")),
+    disk_dir=os.getenv("TRANSCRIPT_CACHE_DIR"),
+)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+# Override the Gemini endpoint (e.g. to point at stub_providers.py); uses the REST transport
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "").rstrip("/")
+
+# Gemini models are built once and reused across requests (GEMINI_MODELS are built by the
+# startup warm-up, which is also when the Gemini SDK is imported and configured)
+gemini_models = ModelRegistry(GEMINI_API_KEY, GEMINI_BASE_URL)
+
+# Open pooled connections to every provider before reporting ready
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))
+readiness = {"ready": False, "warmup": None}
+
+
+async def _warm_up():
+    started = time.perf_counter()
+    report = {}
+    # Off the event loop: importing the SDK takes most of a second
+    with startup_profile.step("gemini models build"):
+        await run_in_threadpool(gemini_models.build_all)
+    if WARMUP_ON_STARTUP:
+        murf, assemblyai = await asyncio.gather(
+            http.warm(MURF_BASE_URL, WARMUP_TIMEOUT),
+            http.warm(ASSEMBLYAI_BASE_URL, WARMUP_TIMEOUT),
+        )
+        report = {"murf": murf, "assemblyai": assemblyai}
+        if GEMINI_API_KEY:
+            report["gemini"] = await gemini_models.warm(WARMUP_TIMEOUT)
+    # Warm-up failures are reported but don't keep the worker out of rotation
+    readiness["warmup"] = {"errors": report, "seconds": round(time.perf_counter() - started, 3)}
+    readiness["ready"] = True
+    startup_profile.mark("ready")
+    if startup_profile.STARTUP_PROFILE:
+        startup_profile.print_report()
 
-# Configure Gemini if key present
-if GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-    except Exception:
-        # Defer detailed error handling to endpoint call
-        pass
+
+# Readiness probe for the load balancer: 503 until startup warm-up has finished
+@app.get("/ready")
+async def ready():
+    body = {**readiness, "models": gemini_models.stats()}
+    return JSONResponse(body, status_code=200 if readiness["ready"] else 503)
+
+
+# Where startup time went: process age at each milestone, init steps and (with STARTUP_PROFILE=true) imports
+@app.get("/startup")
+async def startup_report():
+    return startup_profile.report()
 
 
 # Endpoint for the full non-streaming pipeline
-@app.post("/llm/query")
-async def llm_query_audio(
-    file: UploadFile = File(...),
-    model: str = Form("gemini-1.5-flash"),
-    voice_id: str = Form("en-US-natalie")
-):
+@app.post("/llm/query", openapi_extra=_upload_openapi("model", "voice_id"))
+async def llm_query_audio(request: Request):
     """
     Full non-streaming pipeline: Audio → Transcription → LLM → Murf TTS → Return audio
     """
+    _check_llm_keys()
+    _admit(request, "standard")
+    try:
+        # 1-2. Stream the upload straight into AssemblyAI and transcribe it
+        transcript_text, upload = await _transcribe_request_upload(request)
+        return await _llm_query_reply(transcript_text, upload.fields)
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=400, detail=_provider_error_detail(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _check_llm_keys():
     if not GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="Gemini API key not set. Define GEMINI_API_KEY or GOOGLE_API_KEY in environment or .env")
     
     if not API_KEY:
         raise HTTPException(status_code=500, detail="MURF API key not set")
+
+
+# Progress callback for pipelines run outside a job
+def _no_progress(event: str, data: Dict):
+    pass
+
+
+# Steps 3-5 of /llm/query (shared with job mode); progress gets "generated" and "synthesized"
+async def _llm_query_reply(transcript_text: str, fields: Dict[str, str], progress=_no_progress) -> Dict:
+    model = fields.get("model") or "gemini-1.5-flash"
+    voice_id = fields.get("voice_id") or "en-US-natalie"
+    
+    if not transcript_text or transcript_text.strip() == "":
+        raise HTTPException(status_code=400, detail="Could not transcribe audio - no text detected")
     
+    # 3. Send transcript to LLM (SDK call is blocking, keep it off the event loop);
+    #    the prompt is stateless here, so identical in-flight prompts share one call
     try:
-        # 1. Read audio file
-        audio_bytes = await file.read()
-        
-        # 2. Transcribe audio with AssemblyAI
-        transcript_text = _transcribe_with_assemblyai(audio_bytes)
-        
-        if not transcript_text or transcript_text.strip() == "":
-            raise HTTPException(status_code=400, detail="Could not transcribe audio - no text detected")
-        
-        # 3. Send transcript to LLM
-        try:
-            genai_model = genai.GenerativeModel(model)
-            result = genai_model.generate_content(transcript_text)
-            response_text = getattr(result, "text", None)
-            if not response_text:
-                try:
-                    response_text = result.candidates[0].content.parts[0].text
-                except Exception:
-                    response_text = str(result)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
-        
-        # 4. Handle Murf API character limit (3000 chars)
-        if len(response_text) > 3000:
-            # Truncate to 3000 characters, trying to end at a sentence boundary
-            truncated_text = response_text[:3000]
-            last_period = truncated_text.rfind('.')
-            last_exclamation = truncated_text.rfind('!')
-            last_question = truncated_text.rfind('?')
-            
-            # Find the last sentence ending
-            last_sentence_end = max(last_period, last_exclamation, last_question)
-            if last_sentence_end > 2800:  # Leave some buffer
-                truncated_text = truncated_text[:last_sentence_end + 1]
-            else:
-                # If no good sentence boundary, just truncate and add ellipsis
-                truncated_text = truncated_text[:2997] + "..."
-            
-            response_text = truncated_text
-        
-        # 5. Generate TTS with Murf
-        headers = {
-            "api-key": API_KEY,
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "text": response_text,
-            "voice_id": voice_id,
-            "output_format": "mp3"
-        }
-        
-        r = requests.post(MURF_URL, json=payload, headers=headers)
-        r.raise_for_status()
-        response = r.json()
-        audio_url = response.get("audio_url") or response.get("audioFile")
-        
-        if not audio_url:
-            raise HTTPException(status_code=500, detail=f"No audio URL returned. Murf response: {response}")
-        
-        return {
-            "audio_url": audio_url,
-            "transcript": transcript_text,
-            "llm_response": response_text,
-            "model": model,
-            "voice_id": voice_id
-        }
-        
-    except requests.exceptions.RequestException as e:
-        try:
-            error_detail = r.json()
-        except Exception:
-            error_detail = str(e)
-        raise HTTPException(status_code=400, detail=error_detail)
+        genai_model = await gemini_models.aget(model)
+        llm_key = hashlib.sha256(f"{model}\0{transcript_text}".encode("utf-8")).hexdigest()
+        with stage("llm", provider="gemini", model=model):
+            result = await llm_flight.do(llm_key, lambda: _admitted(gemini_admission, lambda: gemini_policy.call(
+                "generate", lambda: run_in_threadpool(genai_model.generate_content, transcript_text),
+            )))
+        response_text = getattr(result, "text", None)
+        if not response_text:
+            try:
+                response_text = result.candidates[0].content.parts[0].text
+            except Exception:
+                response_text = str(result)
+    except ProviderError:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
+    progress("generated", {"llm_response": response_text})
+    
+    # 4-5. Generate TTS with Murf (long replies in concurrent chunks)
+    audio_url, audio_urls = await _synthesize_reply(response_text, voice_id, source="llm_query")
+    progress("synthesized", {"audio_url": audio_url, "audio_urls": audio_urls})
+    
+    return {
+        "audio_url": audio_url,
+        "audio_urls": audio_urls,
+        "transcript": transcript_text,
+        "llm_response": response_text,
+        "model": model,
+        "voice_id": voice_id
+    }
+
 
-@app.post("/transcribe/file")
-async def transcribe_file(file: UploadFile = File(...)):
+@app.post("/transcribe/file", openapi_extra=_upload_openapi())
+async def transcribe_file(request: Request):
     if not ASSEMBLYAI_API_KEY:
         raise HTTPException(status_code=500, detail="AssemblyAI API key not set.")
+    _admit(request, "standard")
     try:
-        audio_bytes = await file.read()
-        headers = {
-            "authorization": ASSEMBLYAI_API_KEY,
-        }
-        # 1. Upload audio to AssemblyAI
-        upload_response = requests.post(
-            "https://api.assemblyai.com/v2/upload",
-            headers=headers,
-            data=audio_bytes
-        )
-        if upload_response.status_code != 200:
-            raise RuntimeError(f"Upload failed: {upload_response.text}")
-        audio_url = upload_response.json()["upload_url"]
-
-        # 2. Request transcription
-        transcript_response = requests.post(
-            "https://api.assemblyai.com/v2/transcript",
-            headers={**headers, "content-type": "application/json"},
-            json={"audio_url": audio_url}
-        )
-        if transcript_response.status_code != 200:
-            raise RuntimeError(f"Transcript request failed: {transcript_response.text}")
-        transcript_id = transcript_response.json()["id"]
-
-        # 3. Poll for completion
-        polling_url = f"https://api.assemblyai.com/v2/transcript/{transcript_id}"
-        while True:
-            poll_response = requests.get(polling_url, headers=headers)
-            if poll_response.status_code != 200:
-                raise RuntimeError(f"Polling failed: {poll_response.text}")
-            status = poll_response.json()["status"]
-            if status == "completed":
-                return {"transcript": poll_response.json()["text"]}
-            elif status == "error":
-                raise RuntimeError(f"Transcription failed: {poll_response.json().get('error')}")
-            time.sleep(2)
+        transcript_text, _ = await _transcribe_request_upload(request)
+        return {"transcript": transcript_text}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+
+# Batch transcription: many files ("files" fields) and/or stored upload IDs (sha256 from
+# /upload_audio) are transcribed concurrently through the same path as /transcribe/file.
+# One NDJSON line per item is streamed in completion order, then a summary line; a
+# failed item gets an error line and the rest of the batch carries on.
+@app.post("/transcribe/batch", openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {"schema": {"type": "object", "properties": {
+                "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                "upload_ids": {"type": "string", "description": "Comma-separated sha256 IDs"},
+                "concurrency": {"type": "integer"},
+            }}},
+            "application/json": {"schema": {"type": "object", "properties": {
+                "upload_ids": {"type": "array", "items": {"type": "string"}},
+                "concurrency": {"type": "integer"},
+            }}},
+        },
+    }
+})
+async def transcribe_batch(request: Request):
+    if not ASSEMBLYAI_API_KEY:
+        raise HTTPException(status_code=500, detail="AssemblyAI API key not set.")
+    _admit(request, "batch", wait=True)
+
+    form = None
+    items: List[Dict] = []
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(body, dict) or not isinstance(body.get("upload_ids", []), list):
+            raise HTTPException(status_code=400, detail='Expected {"upload_ids": [...]}')
+        upload_ids = [str(upload_id) for upload_id in body.get("upload_ids", [])]
+        concurrency = body.get("concurrency")
+    else:
+        # Files are spooled to temporary files by the form parser, not held in memory
+        form = await request.form(max_files=BATCH_MAX_ITEMS, max_fields=BATCH_MAX_ITEMS + 10)
+        for upload in form.getlist("files"):
+            if not isinstance(upload, str):
+                items.append({"name": upload.filename, "file": upload})
+        upload_ids = [part.strip() for value in form.getlist("upload_ids") for part in str(value).split(",") if part.strip()]
+        concurrency = form.get("concurrency")
+    items.extend({"name": upload_id, "upload_id": upload_id} for upload_id in upload_ids)
+
+    error = None
+    try:
+        concurrency = max(1, min(int(concurrency or BATCH_CONCURRENCY), BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        error = "concurrency must be an integer"
+    if not items:
+        error = "No files or upload_ids given"
+    elif len(items) > BATCH_MAX_ITEMS:
+        error = f"At most {BATCH_MAX_ITEMS} items per batch"
+    if error:
+        if form is not None:
+            await form.close()
+        raise HTTPException(status_code=400, detail=error)
+
+    async def transcribe_item(item: Dict) -> str:
+        if "upload_id" in item:
+            audio_bytes = await upload_store.load(item["upload_id"])
+        else:
+            if item["file"].size is not None and item["file"].size > upload_store.max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {upload_store.max_bytes} byte limit")
+            audio_bytes = await item["file"].read()
+        return await _transcribe_with_assemblyai(audio_bytes)
+
+    async def lines():
+        start = time.perf_counter()
+        failed = 0
+        try:
+            async for index, transcript_text, error in run_batch(items, transcribe_item, concurrency):
+                line = {"index": index, "name": items[index]["name"]}
+                if error is None:
+                    line["transcript"] = transcript_text
+                else:
+                    failed += 1
+                    line["status_code"], line["error"] = _batch_error(error)
+                yield json.dumps(line) + "\n"
+            yield json.dumps({
+                "done": True,
+                "total": len(items),
+                "succeeded": len(items) - failed,
+                "failed": failed,
+                "concurrency": concurrency,
+                "elapsed_seconds": round(time.perf_counter() - start, 3),
+            }) + "\n"
+        finally:
+            if form is not None:
+                await form.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+# (status code, detail) reported for a failed batch item
+def _batch_error(e: Exception):
+    if isinstance(e, HTTPException):
+        return e.status_code, e.detail
+    if isinstance(e, KeyError):
+        return 404, f"Unknown upload_id {e.args[0]}"
+    if isinstance(e, UploadTooLarge):
+        return 413, str(e)
+    if isinstance(e, httpx.HTTPError):
+        return 502, _provider_error_detail(e)
+    return 500, str(e)
+
+
+# AssemblyAI completion webhook (only used when ASSEMBLYAI_WEBHOOK_BASE_URL is set)
+@app.post("/transcribe/webhook")
+async def transcribe_webhook(request: Request):
+    if request.headers.get(WEBHOOK_AUTH_HEADER) != ASSEMBLYAI_WEBHOOK_SECRET:
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    body = await request.json()
+    transcript_id = body.get("transcript_id")
+    if not transcript_id:
+        raise HTTPException(status_code=400, detail="Missing transcript_id")
+    await transcript_poller.notify(transcript_id)
+    return {"received": transcript_id}
+
+
+# Cache hit/miss counters
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "transcripts": transcript_cache.stats(),
+        "tts": tts_cache.stats(),
+        "context": conversation_context.stats(),
+        "sessions": session_store.stats(),
+        "uploads": upload_store.stats(),
+        "audio_preprocess": audio_preprocessor.stats(),
+        "audio_proxy": audio_proxy.stats(),
+        "coalesced": {flight.name: flight.stats() for flight in (stt_flight, llm_flight, tts_flight)},
+        "providers": {policy.name: policy.stats() for policy in provider_policies},
+        "admission": {queue.name: queue.stats() for queue in admission_queues},
+        "voices": {
+            "loaded": voices_cache.value is not None,
+            "stale": voices_cache.stale,
+            "fetched_at": voices_cache.fetched_at,
+            "refreshes": voices_cache.refreshes,
+            "refresh_errors": voices_cache.refresh_errors,
+        },
+    }
+
+
+# Prometheus metrics: stage/request latency histograms plus current gauges and counters
+@app.get("/metrics")
+async def metrics_endpoint():
+    caches = {"transcripts": transcript_cache.stats(), "tts": tts_cache.stats()}
+    flights = (stt_flight, llm_flight, tts_flight)
+    job_stats = jobs.stats()
+    extra = [
+        *metrics.render_samples("voicer_requests_in_flight", "gauge", "HTTP requests being handled.", {(): metrics.requests_in_flight()}),
+        *metrics.render_samples("voicer_sessions", "gauge", "Chat sessions in the session store.", {(): await session_store.count()}),
+        *metrics.render_samples("voicer_cache_entries", "gauge", "Entries held in memory per cache.", {
+            (("cache", name),): stats["entries"] for name, stats in caches.items()
+        }),
+        *metrics.render_samples("voicer_cache_hits_total", "counter", "Cache hits per cache.", {
+            (("cache", name),): stats["hits"] for name, stats in caches.items()
+        }),
+        *metrics.render_samples("voicer_cache_misses_total", "counter", "Cache misses per cache.", {
+            (("cache", name),): stats["misses"] for name, stats in caches.items()
+        }),
+        *metrics.render_samples("voicer_context_summaries", "gauge", "Sessions with a running conversation summary.", {
+            (): conversation_context.stats()["sessions"]
+        }),
+        *metrics.render_samples("voicer_provider_calls_in_flight", "gauge", "Distinct upstream calls in flight per stage.", {
+            (("stage", flight.name),): flight.stats()["in_flight"] for flight in flights
+        }),
+        *metrics.render_samples("voicer_coalesced_calls_total", "counter", "Calls that joined an identical in-flight call.", {
+            (("stage", flight.name),): flight.stats()["saved"] for flight in flights
+        }),
+        *metrics.render_samples("voicer_jobs", "gauge", "Background jobs by state.", {
+            (("state", state),): job_stats[state] for state in ("queued", "running", "retained")
+        }),
+        *metrics.render_samples("voicer_transcripts_outstanding", "gauge", "Transcripts waiting on AssemblyAI.", {
+            (): transcript_poller.outstanding
+        }),
+        *metrics.render_samples("voicer_circuit_state", "gauge", "Provider circuit breaker: 0 closed, 1 half-open, 2 open.", {
+            (("provider", policy.name),): CIRCUIT_STATES[policy.breaker.state] for policy in provider_policies
+        }),
+        *metrics.render_samples("voicer_provider_rejected_total", "counter", "Provider calls refused by an open circuit.", {
+            (("provider", policy.name),): policy.breaker.rejected for policy in provider_policies
+        }),
+        *metrics.render_samples("voicer_provider_timeouts_total", "counter", "Provider calls cut off by the adaptive timeout.", {
+            (("provider", policy.name),): policy.timeouts for policy in provider_policies
+        }),
+        *metrics.render_samples("voicer_provider_hedges_total", "counter", "Hedged second attempts sent.", {
+            (("provider", policy.name),): policy.hedges for policy in provider_policies
+        }),
+        *metrics.render_samples("voicer_admission_in_use", "gauge", "Provider calls holding an admission slot.", {
+            (("provider", queue.name),): queue.in_use for queue in admission_queues
+        }),
+        *metrics.render_samples("voicer_admission_queued", "gauge", "Requests waiting for a provider slot.", {
+            (("provider", queue.name), ("priority", priority)): queue.queued[priority]
+            for queue in admission_queues for priority in PRIORITIES
+        }),
+        *metrics.render_samples("voicer_admission_shed_total", "counter", "Requests shed with a 503 instead of queueing.", {
+            (("provider", queue.name), ("priority", priority)): queue.shed[priority]
+            for queue in admission_queues for priority in PRIORITIES
+        }),
+    ]
+    return Response(metrics.render(extra), media_type="text/plain; version=0.0.4")
+
+
+# Optional silence trimming / downmix before upload (AUDIO_PREPROCESS=true, see audio_preprocess.py)
+audio_preprocessor = AudioPreprocessor()
+
 
 # Helper to transcribe raw audio bytes with AssemblyAI
-def _transcribe_with_assemblyai(audio_bytes: bytes) -> str:
+async def _transcribe_with_assemblyai(audio_bytes: bytes) -> str:
+    with stage("stt", provider="assemblyai") as span:
+        audio_key = content_hash(audio_bytes)
+        cached = await transcript_cache.get(audio_key)
+        if cached is not None:
+            span.status = "cache_hit"
+            return cached
+        if audio_preprocessor.enabled:
+            audio_bytes = await _preprocess_audio(audio_bytes)
+        return await stt_flight.do(audio_key, lambda: _upload_and_transcribe(audio_key, audio_bytes))
+
+
+# Trim silence before upload; per-request savings go in the X-Audio-Preprocess header
+async def _preprocess_audio(audio_bytes: bytes) -> bytes:
+    with stage("audio_preprocess"):
+        try:
+            audio_bytes, audio_stats = await audio_preprocessor.process(audio_bytes)
+        except NoSpeechDetected as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    set_response_header("X-Audio-Preprocess", ", ".join(f"{key}={value}" for key, value in audio_stats.items()))
+    return audio_bytes
+
+
+async def _upload_and_transcribe(audio_key: str, audio_bytes: bytes) -> str:
+    audio_url = await _upload_to_assemblyai(audio_bytes)
+    return await _transcribe_and_cache(audio_key, audio_url)
+
+
+# Uploads up to this size are read in full and looked up in the transcript cache before
+# anything is sent to AssemblyAI; larger ones are piped into the upload as they arrive
+STT_BUFFER_BYTES = int(os.getenv("STT_BUFFER_BYTES", str(1024 * 1024)))
+
+
+# Transcribe the "file" field of a multipart request. A recording up to STT_BUFFER_BYTES
+# (most voice turns) is read first, so a transcript cache hit makes no AssemblyAI call at
+# all. Past that the body is piped straight into the AssemblyAI upload while it is still
+# arriving, so client and upstream uploads overlap and memory per request stays bounded;
+# the cache is keyed on the same content hash, computed as the bytes pass, and still saves
+# the transcription. Preprocessing needs the whole recording, so with it enabled the
+# upload is buffered (bounded by UPLOAD_MAX_BYTES). Returns the transcript and the parsed
+# upload (for the form fields).
+async def _transcribe_request_upload(request: Request) -> Tuple[str, MultipartFileStream]:
+    _check_upload_length(request)
+    upload = MultipartFileStream(request, "file", max_bytes=upload_store.max_bytes)
+    chunks = upload.__aiter__()
+    head = bytearray()
+    try:
+        with stage("audio_read"):
+            while audio_preprocessor.enabled or len(head) <= STT_BUFFER_BYTES:
+                try:
+                    head += await chunks.__anext__()
+                except StopAsyncIteration:
+                    chunks = None
+                    break
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultipartError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if chunks is None:
+        return await _transcribe_with_assemblyai(bytes(head)), upload
+
+    audio_hash = hashlib.sha256(head)
+
+    async def body():
+        yield bytes(head)
+        async for chunk in chunks:
+            audio_hash.update(chunk)
+            yield chunk
+
+    # The stt span includes reading the client upload, since the two overlap
+    with stage("stt", provider="assemblyai") as span:
+        try:
+            audio_url = await _upload_to_assemblyai(body())
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except MultipartError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        audio_key = audio_hash.hexdigest()
+        transcript_text = await transcript_cache.get(audio_key)
+        if transcript_text is None:
+            transcript_text = await stt_flight.do(audio_key, lambda: _transcribe_and_cache(audio_key, audio_url))
+        else:
+            span.status = "cache_hit"
+    return transcript_text, upload
+
+
+# Request a transcript for uploaded audio and cache it under the audio's content hash
+async def _transcribe_and_cache(audio_key: str, audio_url: str) -> str:
+    transcript_text = await _transcribe_uploaded_audio(audio_url)
+    await transcript_cache.set(audio_key, transcript_text)
+    return transcript_text
+
+
+# Upload audio to AssemblyAI; content may be bytes or an async iterator of chunks,
+# in which case the upload streams while the chunks are still arriving
+async def _upload_to_assemblyai(content) -> str:
     if not ASSEMBLYAI_API_KEY:
         raise HTTPException(status_code=500, detail="AssemblyAI API key not set.")
+    with stage("stt_upload", provider="assemblyai"):
+        # The body may be streaming in from a client, so its duration isn't AssemblyAI's
+        upload_response = await assemblyai_policy.call("upload", lambda: http.post(
+            f"{ASSEMBLYAI_BASE_URL}/v2/upload",
+            headers={"authorization": ASSEMBLYAI_API_KEY},
+            content=content,
+        ), adaptive_timeout=False)
+    if upload_response.status_code != 200:
+        raise RuntimeError(f"Upload failed: {upload_response.text}")
+    return upload_response.json()["upload_url"]
+
+
+# Request a transcript for uploaded audio and wait for it to finish
+async def _transcribe_uploaded_audio(audio_url: str) -> str:
     headers = {
         "authorization": ASSEMBLYAI_API_KEY,
     }
-    # 1. Upload audio to AssemblyAI
-    upload_response = requests.post(
-        "https://api.assemblyai.com/v2/upload",
-        headers=headers,
-        data=audio_bytes,
-    )
-    if upload_response.status_code != 200:
-        raise RuntimeError(f"Upload failed: {upload_response.text}")
-    audio_url = upload_response.json()["upload_url"]
+    # 1. Request transcription
+    transcript_request = {"audio_url": audio_url}
+    if ASSEMBLYAI_WEBHOOK_BASE_URL:
+        transcript_request.update({
+            "webhook_url": f"{ASSEMBLYAI_WEBHOOK_BASE_URL}/transcribe/webhook",
+            "webhook_auth_header_name": WEBHOOK_AUTH_HEADER,
+            "webhook_auth_header_value": ASSEMBLYAI_WEBHOOK_SECRET,
+        })
+    # A transcription holds its AssemblyAI slot from submission until the transcript is done
+    async with assemblyai_admission.slot():
+        with stage("stt_submit", provider="assemblyai"):
+            transcript_response = await assemblyai_policy.call("submit", lambda: http.post(
+                f"{ASSEMBLYAI_BASE_URL}/v2/transcript",
+                headers={**headers, "content-type": "application/json"},
+                json=transcript_request,
+            ))
+        if transcript_response.status_code != 200:
+            raise RuntimeError(f"Transcript request failed: {transcript_response.text}")
+        transcript_id = transcript_response.json()["id"]
 
-    # 2. Request transcription
-    transcript_response = requests.post(
-        "https://api.assemblyai.com/v2/transcript",
-        headers={**headers, "content-type": "application/json"},
-        json={"audio_url": audio_url},
-    )
-    if transcript_response.status_code != 200:
-        raise RuntimeError(f"Transcript request failed: {transcript_response.text}")
-    transcript_id = transcript_response.json()["id"]
-
-    # 3. Poll for completion
-    polling_url = f"https://api.assemblyai.com/v2/transcript/{transcript_id}"
-    while True:
-        poll_response = requests.get(polling_url, headers=headers)
-        if poll_response.status_code != 200:
-            raise RuntimeError(f"Polling failed: {poll_response.text}")
-        status = poll_response.json()["status"]
-        if status == "completed":
-            return poll_response.json().get("text", "")
-        elif status == "error":
-            raise RuntimeError(
-                f"Transcription failed: {poll_response.json().get('error')}"
-            )
-        time.sleep(2)
+        # 2. Wait for completion (shared poll scheduler, or webhook if configured)
+        with stage("stt_wait", provider="assemblyai"):
+            return await transcript_poller.wait(transcript_id, webhook=bool(ASSEMBLYAI_WEBHOOK_BASE_URL))
 
 
 # New endpoint: accepts audio, transcribes it, sends text to Murf, returns Murf audio URL
-@app.post("/tts/echo")
-async def tts_echo(file: UploadFile = File(...), voice_id: str = Form("en-US-natalie")):
+@app.post("/tts/echo", openapi_extra=_upload_openapi("voice_id"))
+async def tts_echo(request: Request):
+    _admit(request, "batch")
     try:
-        audio_bytes = await file.read()
-
-        # 1) Transcribe with AssemblyAI
-        transcript_text = _transcribe_with_assemblyai(audio_bytes)
-
-        # 2) Generate TTS with Murf
-        headers = {
-            "api-key": API_KEY,
-            "Content-Type": "application/json",
-        }
-        payload = {
-            "text": transcript_text or "",
-            "voice_id": voice_id,
-            "output_format": "mp3",
-        }
-        r = requests.post(MURF_URL, json=payload, headers=headers)
-        r.raise_for_status()
-        response = r.json()
-        audio_url = response.get("audio_url") or response.get("audioFile")
-        if not audio_url:
-            raise HTTPException(
-                status_code=500,
-                detail=f"No audio URL returned. Murf response: {response}",
-            )
-
-        return {"audio_url": audio_url, "transcript": transcript_text}
-    except requests.exceptions.RequestException as e:
-        try:
-            error_detail = r.json()  # type: ignore[name-defined]
-        except Exception:
-            error_detail = str(e)
-        raise HTTPException(status_code=400, detail=error_detail)
+        # 1) Transcribe with AssemblyAI while the upload is still arriving
+        transcript_text, upload = await _transcribe_request_upload(request)
+        return await _tts_echo_reply(transcript_text, upload.fields)
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=400, detail=_provider_error_detail(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+async def _tts_echo_reply(transcript_text: str, fields: Dict[str, str], progress=_no_progress) -> Dict:
+    voice_id = fields.get("voice_id") or "en-US-natalie"
+
+    # 2) Generate TTS with Murf
+    audio_url, audio_urls = await _synthesize_reply(transcript_text or "", voice_id, source="tts_echo")
+    progress("synthesized", {"audio_url": audio_url, "audio_urls": audio_urls})
+
+    return {"audio_url": audio_url, "audio_urls": audio_urls, "transcript": transcript_text}
+
+
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-1.5-flash")
+
+# Fold turns that no longer fit the context budget into the session's running summary
+async def _summarize_turns(previous_summary: str, messages: List[Dict]) -> str:
+    genai_model = await gemini_models.aget(SUMMARY_MODEL)
+    with stage("llm_summary", provider="gemini", model=SUMMARY_MODEL):
+        result = await _admitted(gemini_admission, lambda: gemini_policy.call(
+            "summary", lambda: run_in_threadpool(genai_model.generate_content, summary_prompt(previous_summary, messages)),
+        ))
+    return getattr(result, "text", "") or ""
+
+conversation_context = ConversationContext(_summarize_turns, session_store.page)
+
 # New endpoint for chat with history
-@app.post("/agent/chat/{session_id}")
-async def agent_chat(
-    session_id: str,
-    file: UploadFile = File(...),
-    model: str = Form("gemini-1.5-flash"),
-    voice_id: str = Form("en-US-natalie")
-):
+@app.post("/agent/chat/{session_id}", openapi_extra=_upload_openapi("model", "voice_id"))
+async def agent_chat(session_id: str, request: Request):
     """
-    Full conversational pipeline with chat history: 
+    Full conversational pipeline with chat history:
     Audio → Transcription → Append to history → LLM with context → Add response to history → TTS → Return audio
     """
-    if not GEMINI_API_KEY:
-        raise HTTPException(status_code=500, detail="Gemini API key not set. Define GEMINI_API_KEY or GOOGLE_API_KEY in environment or .env")
-    
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="MURF API key not set")
+    _check_llm_keys()
+    # Interactive chat goes ahead of batch and echo traffic in every provider queue
+    _admit(request, "interactive", session_id)
     
     # Initialize session if it doesn't exist
-    if session_id not in chat_history:
-        chat_history[session_id] = []
+    await session_store.ensure(session_id)
     
     try:
-        # 1. Read audio file
-        audio_bytes = await file.read()
-        
-        # 2. Transcribe audio with AssemblyAI
-        transcript_text = _transcribe_with_assemblyai(audio_bytes)
-        
-        if not transcript_text or transcript_text.strip() == "":
-            raise HTTPException(status_code=400, detail="Could not transcribe audio - no text detected")
-        
-        # 3. Add user message to chat history
-        user_message = {"role": "user", "content": transcript_text, "timestamp": time.time()}
-        chat_history[session_id].append(user_message)
-        
-        # 4. Prepare conversation context for LLM
-        conversation_context = ""
-        if len(chat_history[session_id]) > 1:
-            # Include previous messages for context (limit to last 10 messages to avoid token limits)
-            recent_messages = chat_history[session_id][-10:]
-            conversation_context = "Previous conversation:\n"
-            for msg in recent_messages[:-1]:  # Exclude the current user message
-                role = "User" if msg["role"] == "user" else "Assistant"
-                conversation_context += f"{role}: {msg['content']}\n"
-            conversation_context += "\nCurrent user message: "
+        # 1-2. Stream the upload straight into AssemblyAI and transcribe it
+        transcript_text, upload = await _transcribe_request_upload(request)
+        return await _agent_chat_reply(session_id, transcript_text, upload.fields)
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=400, detail=_provider_error_detail(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Steps 3-8 of /agent/chat (shared with job mode); progress gets "generated" and "synthesized"
+async def _agent_chat_reply(session_id: str, transcript_text: str, fields: Dict[str, str], progress=_no_progress) -> Dict:
+    model = fields.get("model") or "gemini-1.5-flash"
+    voice_id = fields.get("voice_id") or "en-US-natalie"
+    
+    if not transcript_text or transcript_text.strip() == "":
+        raise HTTPException(status_code=400, detail="Could not transcribe audio - no text detected")
+    
+    # 3. Add user message to chat history
+    user_message = {"role": "user", "content": transcript_text, "timestamp": time.time()}
+    with stage("history"):
+        user_count = await session_store.append(session_id, user_message)
         
-        # 5. Send transcript to LLM with conversation context
+        # 4. Prepare conversation context for LLM (summary + recent turns within the token budget)
+        recent_messages = await session_store.messages(session_id, last=CONTEXT_MAX_MESSAGES)
+        contents, context_info = conversation_context.build(session_id, recent_messages, user_count)
+    
+    # 5. Send transcript to LLM with conversation context
+    try:
+        genai_model = await gemini_models.aget(model)
+        with stage("llm", provider="gemini", model=model):
+            result = await _admitted(gemini_admission, lambda: gemini_policy.call(
+                "generate", lambda: run_in_threadpool(genai_model.generate_content, contents),
+            ))
+        usage = getattr(result, "usage_metadata", None)
+        if usage is not None and getattr(usage, "prompt_token_count", None):
+            context_info["reported_prompt_tokens"] = usage.prompt_token_count
+        response_text = getattr(result, "text", None)
+        if not response_text:
+            try:
+                response_text = result.candidates[0].content.parts[0].text
+            except Exception:
+                response_text = str(result)
+    except ProviderError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
+    progress("generated", {"llm_response": response_text})
+    
+    # 6. Add AI response to chat history
+    ai_message = {"role": "assistant", "content": response_text, "timestamp": time.time()}
+    with stage("history"):
+        message_count = await session_store.append(session_id, ai_message)
+    
+    # 7-8. Generate TTS with Murf (long replies in concurrent chunks)
+    audio_url, audio_urls = await _synthesize_reply(response_text, voice_id, source="agent_chat")
+    progress("synthesized", {"audio_url": audio_url, "audio_urls": audio_urls})
+    
+    return {
+        "audio_url": audio_url,
+        "audio_urls": audio_urls,
+        "transcript": transcript_text,
+        "llm_response": response_text,
+        "model": model,
+        "voice_id": voice_id,
+        "session_id": session_id,
+        "message_count": message_count,
+        # The turn's messages with their history indexes, so the client needn't refetch
+        "messages": [{**user_message, "index": user_count - 1}, {**ai_message, "index": message_count - 1}],
+        "context": context_info
+    }
+
+
+
+# --- Job mode: submit returns a job ID at once, the pipeline runs in a worker pool ---
+
+jobs = JobManager()
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+
+
+# Store the upload, then queue transcription + `reply(transcript, fields, progress)` as a job.
+# A repeated Idempotency-Key returns the original job without reading the body again. Keys are
+# scoped to `scope` (the chat session) or else the client's address, so unrelated clients that
+# happen to send the same key don't get each other's job.
+async def _submit_upload_job(request: Request, kind: str, reply, scope: str = "") -> JSONResponse:
+    idempotency_key = request.headers.get("idempotency-key")
+    if idempotency_key:
+        idempotency_key = f"{scope or 'client ' + _client_id(request)}:{idempotency_key}"
+    job = jobs.find(kind, idempotency_key)
+    if job is None:
+        _check_upload_length(request)
+        upload = MultipartFileStream(request, "file", max_bytes=upload_store.max_bytes)
         try:
-            genai_model = genai.GenerativeModel(model)
-            
-            # Create the prompt with conversation context
-            if conversation_context:
-                full_prompt = conversation_context + transcript_text
-            else:
-                full_prompt = transcript_text
-            
-            result = genai_model.generate_content(full_prompt)
-            response_text = getattr(result, "text", None)
-            if not response_text:
+            digest, _, _ = await upload_store.save(upload)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except MultipartError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        async def run(progress):
+            # Accepted jobs queue behind live traffic but are never shed
+            classify("batch", scope or digest, shed=False)
+            audio_bytes = await upload_store.load(digest)
+            transcript_text = await _transcribe_with_assemblyai(audio_bytes)
+            progress("transcribed", {"transcript": transcript_text})
+            return await reply(transcript_text, upload.fields, progress)
+
+        try:
+            job = jobs.submit(kind, run, idempotency_key)
+        except QueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return JSONResponse({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }, status_code=202)
+
+
+# Job variant of /llm/query
+@app.post("/jobs/llm/query", status_code=202, openapi_extra=_upload_openapi("model", "voice_id"))
+async def llm_query_job(request: Request):
+    _check_llm_keys()
+    return await _submit_upload_job(request, "llm_query", _llm_query_reply)
+
+
+# Job variant of /tts/echo
+@app.post("/jobs/tts/echo", status_code=202, openapi_extra=_upload_openapi("voice_id"))
+async def tts_echo_job(request: Request):
+    return await _submit_upload_job(request, "tts_echo", _tts_echo_reply)
+
+
+# Job variant of /agent/chat/{session_id}
+@app.post("/jobs/agent/chat/{session_id}", status_code=202, openapi_extra=_upload_openapi("model", "voice_id"))
+async def agent_chat_job(session_id: str, request: Request):
+    _check_llm_keys()
+    await session_store.ensure(session_id)
+
+    async def reply(transcript_text, fields, progress):
+        return await _agent_chat_reply(session_id, transcript_text, fields, progress)
+
+    return await _submit_upload_job(request, "agent_chat", reply, scope=session_id)
+
+
+def _get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+# Job status, result and the events after `since`; with `wait` (seconds) this long-polls
+# until there is a newer event or the job has finished
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, since: int = 0, wait: float = 0):
+    job = _get_job(job_id)
+    if wait > 0:
+        await job.wait(since, min(wait, JOB_MAX_WAIT))
+    return job.to_dict(max(0, since))
+
+
+# Job progress over SSE: replays events from `since` (or Last-Event-ID), then follows
+# until the job finishes, so a reconnecting client picks up where it left off
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, since: int = 0):
+    job = _get_job(job_id)
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id) + 1
+
+    async def events():
+        index = max(0, since)
+        while True:
+            while index < len(job.events):
+                event = job.events[index]
+                yield sse_event(event["event"], event["data"], event["id"])
+                index += 1
+            if job.finished:
+                return
+            await job.wait(index, JOB_MAX_WAIT)
+
+    return _sse_response(events())
+
+
+# --- Streaming pipeline: LLM output is spoken sentence by sentence over SSE ---
+
+# Stream text chunks from Gemini without blocking the event loop (prompt may be a
+# plain string or a list of multi-turn contents)
+async def _stream_llm_text(model: str, prompt):
+    genai_model = await gemini_models.aget(model)
+    start = time.perf_counter()
+    first_token = True
+    status = "cancelled"
+    try:
+        # The slot is held until the whole reply has streamed
+        async with gemini_admission.slot():
+            response = await gemini_policy.call("stream", lambda: run_in_threadpool(genai_model.generate_content, prompt, stream=True))
+            async for chunk in iterate_in_threadpool(response):
                 try:
-                    response_text = result.candidates[0].content.parts[0].text
-                except Exception:
-                    response_text = str(result)
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. safety metadata only)
+                    continue
+                if text:
+                    if first_token:
+                        record_stage("llm_first_token", time.perf_counter() - start, "gemini", model)
+                        first_token = False
+                    yield text
+        status = "ok"
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        record_stage("llm", time.perf_counter() - start, "gemini", model, status=status)
+
+
+# Yield (sentence, audio_url) pairs in order; each sentence goes to Murf as soon as
+# it is complete, so synthesis of later sentences overlaps with playback of earlier ones
+async def _stream_spoken_reply(model: str, prompt, voice_id: str, raw_parts: List[str], source: str):
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for sentence in iter_sentences(_stream_llm_text(model, prompt), raw_parts=raw_parts):
+                queue.put_nowait((sentence, asyncio.create_task(_synthesize_with_murf(sentence, voice_id, source=source))))
+            queue.put_nowait(None)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
-        
-        # 6. Add AI response to chat history
+            queue.put_nowait(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            sentence, tts_task = item
+            yield sentence, await tts_task
+    finally:
+        # Client went away or a stage failed: stop the LLM stream and pending TTS calls
+        producer.cancel()
+        while not queue.empty():
+            item = queue.get_nowait()
+            if isinstance(item, tuple):
+                item[1].cancel()
+
+
+async def _transcribe_upload(request: Request) -> Tuple[str, MultipartFileStream]:
+    try:
+        transcript_text, upload = await _transcribe_request_upload(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not transcript_text or transcript_text.strip() == "":
+        raise HTTPException(status_code=400, detail="Could not transcribe audio - no text detected")
+    return transcript_text, upload
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _reply_events(model: str, prompt, voice_id: str, raw_parts: List[str], source: str):
+    index = 0
+    try:
+        async for sentence, audio_url in _stream_spoken_reply(model, prompt, voice_id, raw_parts, source):
+            yield "audio", {"index": index, "text": sentence, "audio_url": audio_url}
+            index += 1
+    except httpx.HTTPError as e:
+        yield "error", {"detail": _provider_error_detail(e)}
+    except HTTPException as e:
+        yield "error", {"detail": e.detail}
+    except Exception as e:
+        yield "error", {"detail": f"LLM error: {str(e)}"}
+
+
+# Events for one chat turn: transcript, spoken reply, done; the reply is stored in history
+async def _chat_turn_events(session_id: str, transcript_text: str, model: str, voice_id: str, source: str):
+    user_message = {"role": "user", "content": transcript_text, "timestamp": time.time()}
+    with stage("history"):
+        message_count = await session_store.append(session_id, user_message)
+        recent_messages = await session_store.messages(session_id, last=CONTEXT_MAX_MESSAGES)
+        contents, context_info = conversation_context.build(session_id, recent_messages, message_count)
+    # Messages this turn appended, with their history indexes (the client needn't refetch)
+    new_messages = [{**user_message, "index": message_count - 1}]
+
+    yield "transcript", {"transcript": transcript_text}
+    raw_parts: List[str] = []
+    async for event, data in _reply_events(model, contents, voice_id, raw_parts, source):
+        yield event, data
+        if event == "error":
+            return
+    response_text = "".join(raw_parts)
+    if response_text:
         ai_message = {"role": "assistant", "content": response_text, "timestamp": time.time()}
-        chat_history[session_id].append(ai_message)
-        
-        # 7. Handle Murf API character limit (3000 chars)
-        if len(response_text) > 3000:
-            # Truncate to 3000 characters, trying to end at a sentence boundary
-            truncated_text = response_text[:3000]
-            last_period = truncated_text.rfind('.')
-            last_exclamation = truncated_text.rfind('!')
-            last_question = truncated_text.rfind('?')
-            
-            # Find the last sentence ending
-            last_sentence_end = max(last_period, last_exclamation, last_question)
-            if last_sentence_end > 2800:  # Leave some buffer
-                truncated_text = truncated_text[:last_sentence_end + 1]
-            else:
-                # If no good sentence boundary, just truncate and add ellipsis
-                truncated_text = truncated_text[:2997] + "..."
-            
-            response_text = truncated_text
-        
-        # 8. Generate TTS with Murf
-        headers = {
-            "api-key": API_KEY,
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "text": response_text,
-            "voice_id": voice_id,
-            "output_format": "mp3"
-        }
-        
-        r = requests.post(MURF_URL, json=payload, headers=headers)
-        r.raise_for_status()
-        response = r.json()
-        audio_url = response.get("audio_url") or response.get("audioFile")
-        
-        if not audio_url:
-            raise HTTPException(status_code=500, detail=f"No audio URL returned. Murf response: {response}")
-        
-        return {
-            "audio_url": audio_url,
-            "transcript": transcript_text,
-            "llm_response": response_text,
-            "model": model,
-            "voice_id": voice_id,
-            "session_id": session_id,
-            "message_count": len(chat_history[session_id])
-        }
-        
-    except requests.exceptions.RequestException as e:
+        with stage("history"):
+            message_count = await session_store.append(session_id, ai_message)
+        new_messages.append({**ai_message, "index": message_count - 1})
+    yield "done", {
+        "llm_response": response_text,
+        "model": model,
+        "voice_id": voice_id,
+        "session_id": session_id,
+        "message_count": message_count,
+        "messages": new_messages,
+        "context": context_info,
+        "timings": timings_ms(),
+    }
+
+
+# Streaming variant of /llm/query: emits transcript, then one audio event per sentence
+@app.post("/llm/query/stream", openapi_extra=_upload_openapi("model", "voice_id"))
+async def llm_query_stream(request: Request):
+    """
+    Streaming pipeline: Audio → Transcription → streamed LLM → per-sentence Murf TTS → SSE
+    """
+    _check_llm_keys()
+    _admit(request, "standard")
+    transcript_text, upload = await _transcribe_upload(request)
+    model = upload.fields.get("model") or "gemini-1.5-flash"
+    voice_id = upload.fields.get("voice_id") or "en-US-natalie"
+
+    async def events():
+        yield sse_event("transcript", {"transcript": transcript_text})
+        raw_parts: List[str] = []
+        async for event, data in _reply_events(model, transcript_text, voice_id, raw_parts, "llm_query_stream"):
+            yield sse_event(event, data)
+            if event == "error":
+                return
+        yield sse_event("done", {"llm_response": "".join(raw_parts), "model": model, "voice_id": voice_id, "timings": timings_ms()})
+
+    return _sse_response(events())
+
+
+# Streaming variant of /agent/chat/{session_id}
+@app.post("/agent/chat/{session_id}/stream", openapi_extra=_upload_openapi("model", "voice_id"))
+async def agent_chat_stream(session_id: str, request: Request):
+    """
+    Streaming conversational pipeline: same as /agent/chat/{session_id}, but the reply is
+    spoken sentence by sentence over SSE and the full reply is stored in chat history
+    """
+    _check_llm_keys()
+    _admit(request, "interactive", session_id)
+    await session_store.ensure(session_id)
+
+    transcript_text, upload = await _transcribe_upload(request)
+    model = upload.fields.get("model") or "gemini-1.5-flash"
+    voice_id = upload.fields.get("voice_id") or "en-US-natalie"
+
+    async def events():
+        async for event, data in _chat_turn_events(session_id, transcript_text, model, voice_id, "agent_chat_stream"):
+            yield sse_event(event, data)
+
+    return _sse_response(events())
+
+
+# WebSocket chat: audio chunks are forwarded to AssemblyAI while the user is still speaking
+@app.websocket("/ws/agent/{session_id}")
+async def agent_chat_ws(websocket: WebSocket, session_id: str):
+    """
+    Protocol (one utterance per round, repeatable on the same connection):
+      client → binary frames with MediaRecorder chunks, then {"type": "end", "voice_id": ..., "model": ...}
+      server → {"type": "transcript" | "audio" | "done" | "error", ...} (same events as the SSE stream)
+    """
+    await websocket.accept()
+    if not GEMINI_API_KEY or not API_KEY or not ASSEMBLYAI_API_KEY:
+        await websocket.send_json({"type": "error", "detail": "Gemini, Murf and AssemblyAI API keys must be set"})
+        await websocket.close()
+        return
+
+    await session_store.ensure(session_id)
+    classify("interactive", session_id)
+
+    try:
+        while True:
+            # Each turn gets its own stage timings (reported in the "done" event)
+            with timing_context():
+                await _ws_chat_turn(websocket, session_id)
+    except WebSocketDisconnect:
+        pass
+
+
+async def _ws_chat_turn(websocket: WebSocket, session_id: str):
+    chunks: asyncio.Queue = asyncio.Queue()
+
+    async def upload_body():
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    upload_task = None
+    audio_hash = hashlib.sha256()
+    # Silence trimming needs the whole utterance, so with preprocessing on chunks are buffered
+    buffered: List[bytes] = []
+    received = 0
+    try:
+        # 1. Stream chunks into the AssemblyAI upload as they arrive
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                received += len(message["bytes"])
+                if received > upload_store.max_bytes:
+                    await websocket.send_json({"type": "error", "detail": f"Upload exceeds the {upload_store.max_bytes} byte limit"})
+                    return
+            if message.get("bytes") and audio_preprocessor.enabled:
+                buffered.append(message["bytes"])
+            elif message.get("bytes"):
+                if upload_task is None:
+                    upload_task = asyncio.create_task(_upload_to_assemblyai(upload_body()))
+                # A failed upload stops reading; its error is reported unless the transcript is cached
+                if not upload_task.done():
+                    chunks.put_nowait(message["bytes"])
+                audio_hash.update(message["bytes"])
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if control.get("type") == "end":
+                    break
+        if upload_task is None and not buffered:
+            await websocket.send_json({"type": "error", "detail": "No audio received"})
+            return
+        chunks.put_nowait(None)
+
+        # 2. Upload is already done by now; request the transcript right away
         try:
-            error_detail = r.json()
-        except Exception:
-            error_detail = str(e)
-        raise HTTPException(status_code=400, detail=error_detail)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+            if buffered:
+                transcript_text = await _transcribe_with_assemblyai(b"".join(buffered))
+            else:
+                with stage("stt", provider="assemblyai") as span:
+                    transcript_text = await transcript_cache.get(audio_hash.hexdigest())
+                    if transcript_text is None:
+                        audio_url = await upload_task
+                        transcript_text = await stt_flight.do(
+                            audio_hash.hexdigest(), lambda: _transcribe_and_cache(audio_hash.hexdigest(), audio_url)
+                        )
+                    else:
+                        span.status = "cache_hit"
+        except HTTPException as e:
+            await websocket.send_json({"type": "error", "detail": e.detail})
+            return
+        except Exception as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            return
+        if not transcript_text or transcript_text.strip() == "":
+            await websocket.send_json({"type": "error", "detail": "Could not transcribe audio - no text detected"})
+            return
+
+        # 3. LLM → TTS, same events as the SSE stream
+        model = control.get("model") or "gemini-1.5-flash"
+        voice_id = control.get("voice_id") or "en-US-natalie"
+        async for event, data in _chat_turn_events(session_id, transcript_text, model, voice_id, "agent_chat_ws"):
+            await websocket.send_json({"type": event, **data})
+    finally:
+        if upload_task is not None:
+            # Also retrieves the error of an upload that failed before a cache hit
+            upload_task.cancel()
+            await asyncio.gather(upload_task, return_exceptions=True)
+
+
+startup_profile.mark("app imported")
@@ -0,0 +1,190 @@
+"""
+Optional audio preprocessing before speech-to-text.
+
+Recordings are decoded to 16 kHz mono PCM, silence is cut with a
+vectorized energy-based voice activity detector, and what's left is
+re-encoded compactly (Opus when ffmpeg is available, otherwise 16-bit WAV)
+before being uploaded to AssemblyAI. Utterances with no speech at all are
+rejected locally so they never cost an upload or a transcript.
+
+WAV input is decoded with the standard library; anything else (e.g. the
+browser's WebM/Opus) needs ffmpeg on PATH and is passed through untouched
+when it isn't installed.
+
+Enable with AUDIO_PREPROCESS=true. numpy is imported on first use, so
+it costs nothing at startup while preprocessing is off.
+"""
+
+import asyncio
+import io
+import os
+import shutil
+import wave
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "false").lower() in ("1", "true", "yes")
+SAMPLE_RATE = 16000
+# 30 ms analysis frames
+FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000
+# Frames quieter than this (dBFS) are never speech
+AUDIO_VAD_MIN_DB = float(os.getenv("AUDIO_VAD_MIN_DB", "-50"))
+# Speech must be this far above the noise floor (and is at most this far below the peak)
+AUDIO_VAD_MARGIN_DB = float(os.getenv("AUDIO_VAD_MARGIN_DB", "12"))
+# Silence kept around speech, so word onsets and tails aren't clipped
+AUDIO_VAD_PADDING_MS = int(os.getenv("AUDIO_VAD_PADDING_MS", "250"))
+# Less detected speech than this counts as an empty utterance
+AUDIO_MIN_SPEECH_MS = int(os.getenv("AUDIO_MIN_SPEECH_MS", "150"))
+AUDIO_OPUS_BITRATE = os.getenv("AUDIO_OPUS_BITRATE", "24k")
+
+
+class NoSpeechDetected(Exception):
+    """The recording contains no speech."""
+
+
+def detect_speech(samples: "np.ndarray", padding_ms: int = AUDIO_VAD_PADDING_MS) -> "np.ndarray":
+    """Boolean keep-mask per FRAME_SAMPLES frame of 16 kHz mono int16 audio."""
+    import numpy as np
+
+    n_frames = len(samples) // FRAME_SAMPLES
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool)
+    frames = samples[: n_frames * FRAME_SAMPLES].reshape(n_frames, FRAME_SAMPLES).astype(np.float32) / 32768.0
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(AUDIO_VAD_MIN_DB, min(noise_floor + AUDIO_VAD_MARGIN_DB, energy_db.max() - AUDIO_VAD_MARGIN_DB))
+    speech = energy_db > threshold
+    if speech.sum() * FRAME_SAMPLES < AUDIO_MIN_SPEECH_MS * SAMPLE_RATE // 1000:
+        return np.zeros(n_frames, dtype=bool)
+    # Dilate the speech frames by the padding on both sides
+    pad = max(0, padding_ms * SAMPLE_RATE // 1000 // FRAME_SAMPLES)
+    return np.convolve(speech.astype(np.int32), np.ones(2 * pad + 1, dtype=np.int32), mode="same") > 0
+
+
+def _decode_wav(data: bytes) -> Optional["np.ndarray"]:
+    """16 kHz mono int16 samples from a PCM WAV, or None if it isn't one."""
+    import numpy as np
+
+    try:
+        with wave.open(io.BytesIO(data)) as w:
+            channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+            raw = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}.get(width)
+    if dtype is None:
+        return None
+    samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+    if width == 1:
+        samples = (samples - 128.0) * 256.0
+    elif width == 4:
+        samples /= 65536.0
+    # Downmix, then linear resample to 16 kHz
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(samples):
+        target = int(len(samples) * SAMPLE_RATE / rate)
+        samples = np.interp(np.arange(target) * (rate / SAMPLE_RATE), np.arange(len(samples)), samples)
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+
+def _encode_wav(samples: "np.ndarray") -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(samples.tobytes())
+    return out.getvalue()
+
+
+async def _ffmpeg(args, data: bytes) -> bytes:
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", *args,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate(data)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {err.decode(errors='replace').strip()}")
+    return out
+
+
+class AudioPreprocessor:
+    """Trims silence and downmixes recordings; keeps running totals."""
+
+    def __init__(self, enabled: bool = AUDIO_PREPROCESS, ffmpeg: Optional[str] = None):
+        self.enabled = enabled
+        self.ffmpeg = ffmpeg if ffmpeg is not None else shutil.which("ffmpeg")
+        self.processed = 0
+        self.skipped = 0
+        self.rejected_empty = 0
+        self.seconds_in = 0.0
+        self.seconds_removed = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def process(self, data: bytes) -> Tuple[bytes, Dict[str, Any]]:
+        """Return (audio to upload, stats); raises NoSpeechDetected for empty utterances.
+
+        Audio that can't be decoded is returned unchanged with a "skipped" reason.
+        """
+        import numpy as np
+
+        samples = await asyncio.to_thread(_decode_wav, data)
+        if samples is None and self.ffmpeg:
+            try:
+                pcm = await _ffmpeg(["-i", "pipe:0", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"], data)
+                samples = np.frombuffer(pcm, dtype=np.int16)
+            except (OSError, RuntimeError) as e:
+                print("Audio decode failed:", e)
+        if samples is None:
+            self.skipped += 1
+            return data, {"skipped": "ffmpeg not available" if not self.ffmpeg else "could not decode audio"}
+
+        keep = await asyncio.to_thread(detect_speech, samples)
+        seconds = len(samples) / SAMPLE_RATE
+        if not keep.any():
+            self.rejected_empty += 1
+            raise NoSpeechDetected("No speech detected in the recording")
+        trimmed = samples[: len(keep) * FRAME_SAMPLES][np.repeat(keep, FRAME_SAMPLES)]
+        kept_seconds = len(trimmed) / SAMPLE_RATE
+
+        if self.ffmpeg:
+            audio = await _ffmpeg(
+                ["-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+                 "-c:a", "libopus", "-b:a", AUDIO_OPUS_BITRATE, "-f", "ogg", "pipe:1"],
+                trimmed.tobytes(),
+            )
+        else:
+            audio = await asyncio.to_thread(_encode_wav, trimmed)
+        # Nothing trimmed and re-encoding didn't shrink it: upload the original
+        if kept_seconds >= seconds and len(audio) >= len(data):
+            audio = data
+
+        self.processed += 1
+        self.seconds_in += seconds
+        self.seconds_removed += seconds - kept_seconds
+        self.bytes_in += len(data)
+        self.bytes_out += len(audio)
+        return audio, {
+            "original_seconds": round(seconds, 3),
+            "kept_seconds": round(kept_seconds, 3),
+            "removed_seconds": round(seconds - kept_seconds, 3),
+            "original_bytes": len(data),
+            "uploaded_bytes": len(audio),
+            "removed_bytes": len(data) - len(audio),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ffmpeg": bool(self.ffmpeg),
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "rejected_empty": self.rejected_empty,
+            "seconds_in": round(self.seconds_in, 3),
+            "seconds_removed": round(self.seconds_removed, 3),
+            "bytes_in": self.bytes_in,
+            "bytes_removed": self.bytes_in - self.bytes_out,
+        }
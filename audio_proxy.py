@@ -0,0 +1,380 @@
+"""
+Local proxy/cache for synthesized audio.
+
+With AUDIO_PROXY=true the endpoints hand out /audio/<id> URLs instead of
+Murf's expiring ones. As soon as Murf returns a URL the audio is fetched in
+the background into a size-bounded cache: recently used files in memory,
+everything on disk under AUDIO_PROXY_DIR (least recently used files are
+evicted past AUDIO_PROXY_DISK_MB). A request that arrives while the fetch is
+still running follows the same download, so the client streams from Murf
+while the cache fills. An id always names the same audio, so finished files
+are served with Range support and immutable caching headers.
+
+Workers sharing AUDIO_PROXY_DIR serve each other's finished files, but the
+id -> Murf URL map (and so a download still in progress) is kept per
+process: until the file is on disk, only the worker that handed out an id
+can serve it, so with several workers route /audio requests back to it.
+
+Long replies are synthesized in several chunks; with TTS_PLAYLIST a playlist
+URL (/audio/playlist/<id>) plays them back to back as one stream. Chunks that
+are cached locally are read from the cache, the others (all of them without
+AUDIO_PROXY) are streamed from Murf through this server. Playlists are kept
+in memory per process, so another worker answers 404 for them.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlsplit
+
+AUDIO_PROXY = os.getenv("AUDIO_PROXY", "false").lower() in ("1", "true", "yes")
+AUDIO_PROXY_DIR = os.getenv("AUDIO_PROXY_DIR", "audio_cache")
+AUDIO_PROXY_MEMORY_MB = float(os.getenv("AUDIO_PROXY_MEMORY_MB", "64"))
+AUDIO_PROXY_DISK_MB = float(os.getenv("AUDIO_PROXY_DISK_MB", "1024"))
+AUDIO_PROXY_MAX_FILE_MB = float(os.getenv("AUDIO_PROXY_MAX_FILE_MB", "25"))
+# Upstream URLs remembered for audio that isn't cached yet
+AUDIO_PROXY_MAX_URLS = int(os.getenv("AUDIO_PROXY_MAX_URLS", "10000"))
+# Prefix for the returned URLs, e.g. a CDN in front of this server (default: relative /audio/...)
+AUDIO_PROXY_BASE_URL = os.getenv("AUDIO_PROXY_BASE_URL", "").rstrip("/")
+
+CONTENT_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".ogg": "audio/ogg",
+    ".flac": "audio/flac",
+}
+NAME = re.compile(r"^[0-9a-f]{32}(\.[a-z0-9]{1,5})?$")
+PLAYLIST_NAME = re.compile(r"^([0-9a-f]{32})(\.[a-z0-9]{1,5})?$")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class AudioTooLarge(Exception):
+    """The upstream audio is bigger than AUDIO_PROXY_MAX_FILE_MB."""
+
+
+def content_type_for(name: str) -> str:
+    return CONTENT_TYPES.get(os.path.splitext(name)[1], "audio/mpeg")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end exclusive) for a single-range `Range` header, None to send everything.
+
+    Raises ValueError when the range can't be satisfied (answer 416).
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if match is None:
+        # Absent, malformed or multi-range: a full response is always allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(0, size - int(last)), size
+    else:
+        start = int(first)
+        end = min(size, int(last) + 1) if last else size
+    if start >= size or start >= end:
+        raise ValueError(f"Range not satisfiable for {size} bytes")
+    return start, end
+
+
+class Download:
+    """Audio being fetched from upstream; any number of readers can follow it."""
+
+    __slots__ = ("data", "length", "done", "error", "started", "_changed")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.length: Optional[int] = None
+        self.done = False
+        self.error: Optional[Exception] = None
+        # Set once upstream's response headers (and so `length`) are in, or the download ended
+        self.started = asyncio.Event()
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        position = start
+        while True:
+            changed = self._changed
+            stop = len(self.data) if end is None else min(end, len(self.data))
+            if position < stop:
+                chunk = bytes(self.data[position:stop])
+                position = stop
+                yield chunk
+                continue
+            if end is not None and position >= end:
+                return
+            if self.error is not None:
+                raise self.error
+            if self.done:
+                return
+            await changed.wait()
+
+
+class AudioProxy:
+    """Prefetches Murf audio into a memory + disk cache and serves it locally."""
+
+    def __init__(
+        self,
+        http,
+        enabled: bool = AUDIO_PROXY,
+        directory: str = AUDIO_PROXY_DIR,
+        memory_mb: float = AUDIO_PROXY_MEMORY_MB,
+        disk_mb: float = AUDIO_PROXY_DISK_MB,
+        max_file_mb: float = AUDIO_PROXY_MAX_FILE_MB,
+        max_urls: int = AUDIO_PROXY_MAX_URLS,
+        base_url: str = AUDIO_PROXY_BASE_URL,
+    ):
+        self.http = http
+        self.enabled = enabled
+        self.directory = directory
+        self.memory_bytes = int(memory_mb * 1024 * 1024)
+        self.disk_bytes = int(disk_mb * 1024 * 1024)
+        self.max_file_bytes = int(max_file_mb * 1024 * 1024)
+        self.max_urls = max_urls
+        self.base_url = base_url
+        self._urls: "OrderedDict[str, str]" = OrderedDict()
+        # playlist id -> chunk URLs in playback order
+        self._playlists: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        # name -> size, least recently used first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._downloads: Dict[str, Download] = {}
+        self._tasks = set()
+        self.prefetches = 0
+        self.prefetch_errors = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.followed = 0
+        self.evictions = 0
+
+    async def start(self):
+        if self.enabled:
+            for name, size in await asyncio.to_thread(self._scan):
+                self._disk[name] = size
+                self._disk_size += size
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    def local_url(self, audio_url: str) -> str:
+        """Local URL for upstream audio; starts fetching it unless it's already cached."""
+        ext = os.path.splitext(urlsplit(audio_url).path)[1].lower()
+        name = hashlib.sha256(audio_url.encode("utf-8")).hexdigest()[:32] + (ext if ext in CONTENT_TYPES else "")
+        if name not in self._memory and name not in self._disk and name not in self._downloads:
+            self._urls[name] = audio_url
+            self._urls.move_to_end(name)
+            while len(self._urls) > self.max_urls:
+                self._urls.popitem(last=False)
+            self._start_download(name)
+        return f"{self.base_url}/audio/{name}"
+
+    def playlist_url(self, urls: Sequence[str]) -> str:
+        """URL that plays `urls` back to back as one audio stream."""
+        playlist_id = hashlib.sha256("\n".join(urls).encode("utf-8")).hexdigest()[:32]
+        self._playlists[playlist_id] = list(urls)
+        self._playlists.move_to_end(playlist_id)
+        while len(self._playlists) > self.max_urls:
+            self._playlists.popitem(last=False)
+        ext = os.path.splitext(urlsplit(urls[0]).path)[1].lower() if urls else ""
+        return f"{self.base_url}/audio/playlist/{playlist_id}{ext if ext in CONTENT_TYPES else ''}"
+
+    def playlist(self, name: str) -> Optional[List[str]]:
+        match = PLAYLIST_NAME.match(name)
+        return self._playlists.get(match.group(1)) if match else None
+
+    async def iter_playlist(self, urls: Sequence[str]) -> AsyncIterator[bytes]:
+        """The audio of every URL in order; MP3 streams can simply be concatenated."""
+        prefix = f"{self.base_url}/audio/"
+        for url in urls:
+            name = url[len(prefix):] if url.startswith(prefix) else None
+            audio = await self.get(name) if name else None
+            if isinstance(audio, bytes):
+                yield audio
+            elif audio is not None:
+                async for chunk in audio.iter_bytes():
+                    yield chunk
+            else:
+                async with self.http.stream("GET", url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        yield chunk
+
+    async def get(self, name: str) -> Union[bytes, Download, None]:
+        """Cached bytes, a Download still in progress, or None for an unknown id."""
+        if not NAME.match(name):
+            return None
+        data = self._memory.get(name)
+        if data is not None:
+            self._memory.move_to_end(name)
+            if name in self._disk:
+                self._disk.move_to_end(name)
+            self.memory_hits += 1
+            return data
+        indexed = name in self._disk
+        if indexed:
+            try:
+                data = await asyncio.to_thread(_read, self._path(name))
+            except FileNotFoundError:
+                self._disk_size -= self._disk.pop(name, 0)
+            else:
+                self._disk.move_to_end(name)
+                self.disk_hits += 1
+                self._remember(name, data)
+                return data
+        download = self._downloads.get(name)
+        if download is None and not indexed:
+            # Another worker sharing the directory may have cached it
+            data = await self._read_unindexed(name)
+            if data is not None:
+                return data
+        if download is None and name in self._urls:
+            # Evicted, or the prefetch failed earlier: fetch it again
+            download = self._start_download(name)
+        if download is not None:
+            self.followed += 1
+        return download
+
+    async def _read_unindexed(self, name: str) -> Optional[bytes]:
+        """A file under the directory that this process's index doesn't know about."""
+        try:
+            data = await asyncio.to_thread(_read, self._path(name))
+        except FileNotFoundError:
+            return None
+        self.disk_hits += 1
+        self._remember(name, data)
+        evicted = self._add_to_disk(name, len(data))
+        if evicted:
+            await asyncio.to_thread(_remove_all, evicted)
+        return data
+
+    def _start_download(self, name: str) -> Download:
+        download = self._downloads[name] = Download()
+        self.prefetches += 1
+        task = asyncio.create_task(self._download(name, self._urls[name], download))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return download
+
+    async def _download(self, name: str, url: str, download: Download):
+        try:
+            data = await self._read_unindexed(name)
+            if data is not None:
+                download.data.extend(data)
+                download.length = len(data)
+                download.done = True
+                return
+            async with self.http.stream("GET", url) as response:
+                response.raise_for_status()
+                length = response.headers.get("content-length")
+                download.length = int(length) if length and length.isdigit() else None
+                download.started.set()
+                async for chunk in response.aiter_bytes():
+                    if len(download.data) + len(chunk) > self.max_file_bytes:
+                        raise AudioTooLarge(f"Audio exceeds the {self.max_file_bytes} byte cache limit")
+                    download.data.extend(chunk)
+                    download._notify()
+            data = bytes(download.data)
+            await asyncio.to_thread(_write, self._path(name), data)
+            self._remember(name, data)
+            download.done = True
+            evicted = self._add_to_disk(name, len(data))
+            if evicted:
+                await asyncio.to_thread(_remove_all, evicted)
+        except Exception as e:
+            print("Audio prefetch failed:", e)
+            self.prefetch_errors += 1
+            download.error = e
+        finally:
+            download.started.set()
+            download._notify()
+            if self._downloads.get(name) is download:
+                del self._downloads[name]
+
+    def _remember(self, name: str, data: bytes):
+        # Files too big to share the memory budget are only kept on disk
+        if len(data) > self.memory_bytes // 8 or name in self._memory:
+            return
+        self._memory[name] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _add_to_disk(self, name: str, size: int) -> List[str]:
+        """Index a written file; returns the paths of files evicted to make room."""
+        self._disk_size += size - self._disk.get(name, 0)
+        self._disk[name] = size
+        self._disk.move_to_end(name)
+        evicted = []
+        while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+            evicted_name, evicted_size = self._disk.popitem(last=False)
+            self._disk_size -= evicted_size
+            self.evictions += 1
+            evicted.append(self._path(evicted_name))
+        return evicted
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    def _scan(self):
+        """(name, size) of cached files, oldest first."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if NAME.match(name):
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, name, st.st_size))
+        files.sort()
+        return [(name, size) for _, name, size in files]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_size,
+            "downloading": len(self._downloads),
+            "prefetches": self.prefetches,
+            "prefetch_errors": self.prefetch_errors,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "followed": self.followed,
+            "evictions": self.evictions,
+            "playlists": len(self._playlists),
+        }
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remove_all(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
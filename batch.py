@@ -0,0 +1,37 @@
+"""
+Bounded-concurrency batch runner.
+
+`run_batch(items, fn, concurrency)` calls `fn(item)` for every item with at
+most `concurrency` calls in flight and yields `(index, result, error)` as
+each call finishes, so results can be streamed in completion order. An item
+that fails is reported with its exception and doesn't stop the others;
+closing the generator early (e.g. the client went away) cancels the rest.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Sequence, Tuple
+
+
+async def run_batch(
+    items: Sequence[Any],
+    fn: Callable[[Any], Awaitable[Any]],
+    concurrency: int,
+) -> AsyncIterator[Tuple[int, Any, Optional[Exception]]]:
+    results: asyncio.Queue = asyncio.Queue()
+    # Shared by all workers; each takes the next item when it finishes one
+    pending = iter(enumerate(items))
+
+    async def worker():
+        for index, item in pending:
+            try:
+                results.put_nowait((index, await fn(item), None))
+            except Exception as e:
+                results.put_nowait((index, None, e))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
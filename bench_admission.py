@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Admission control benchmark: a traffic spike against rate-limited providers.
+
+The stub lets at most --provider-limit calls per provider run at once and
+answers the rest with 429, like Murf and Gemini under a spike. For
+--seconds the app gets:
+
+- a flood of /tts/echo requests (--echo-clients concurrent clients), batch
+  traffic;
+- one chatty chat session with --chatty-loops turns in parallel;
+- --sessions other chat sessions taking one turn at a time.
+
+Reported per class: status codes and latency of successful requests, plus
+how many calls the stub rate-limited. The app runs with MURF_CONCURRENCY /
+GEMINI_CONCURRENCY set to the provider limit; point --app-dir at an older
+checkout (which ignores them) to compare.
+
+Usage:
+    python bench_admission.py [--seconds 20] [--echo-clients 48] [--sessions 4] [--chatty-loops 6]
+                              [--provider-limit 8] [--deadline 2] [--app-dir .]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+
+from load_test import _free_port, _start, _wait_ready, percentiles
+
+
+def _audio() -> bytes:
+    # Distinct bytes per request, so the transcript cache and coalescing don't hide the load
+    return b"RIFF" + uuid.uuid4().bytes * 512
+
+
+async def _loop(client: httpx.AsyncClient, url: str, until: float, samples: List[Tuple[int, float]]):
+    while time.monotonic() < until:
+        start = time.perf_counter()
+        try:
+            r = await client.post(url, files={"file": ("a.wav", _audio(), "audio/wav")}, data={"voice_id": "en-US-natalie"})
+            status = r.status_code
+            if status == 503 and "retry-after" in r.headers:
+                # Shed: back off as told, like a well-behaved client
+                await asyncio.sleep(min(float(r.headers["retry-after"]), 1.0))
+        except httpx.HTTPError:
+            status = 0
+        samples.append((status, time.perf_counter() - start))
+
+
+def _summary(samples: List[Tuple[int, float]]) -> str:
+    statuses = Counter(status for status, _ in samples)
+    ok = [seconds for status, seconds in samples if status == 200]
+    codes = " ".join(f"{code}:{count}" for code, count in sorted(statuses.items()))
+    if not ok:
+        return f"no successes  [{codes}]"
+    p = percentiles(ok)
+    return f"{len(ok):>5} ok  p50 {p['p50']:.2f}s  p95 {p['p95']:.2f}s  [{codes}]"
+
+
+async def _run(args) -> Dict:
+    stub_port, app_port = _free_port(), _free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    stub = _start("stub_providers:app", stub_port, {
+        "STUB_LATENCY": str(args.latency),
+        "STUB_TRANSCRIBE_TIME": "0.5",
+        "STUB_CONCURRENCY_LIMIT": str(args.provider_limit),
+    })
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(app_port), "--log-level", "warning"],
+        env={
+            **os.environ,
+            "MURF_API_KEY": "stub",
+            "ASSEMBLYAI_API_KEY": "stub",
+            "GEMINI_API_KEY": "stub",
+            "MURF_BASE_URL": stub_url,
+            "ASSEMBLYAI_BASE_URL": stub_url,
+            "GEMINI_BASE_URL": stub_url,
+            "WARMUP_ON_STARTUP": "false",
+            "UPLOAD_DIR": f"/tmp/bench-admission-{app_port}",
+            "MURF_CONCURRENCY": str(args.provider_limit),
+            "GEMINI_CONCURRENCY": str(args.provider_limit),
+            "ADMISSION_DEADLINE": str(args.deadline),
+        },
+        cwd=args.app_dir, stdout=subprocess.DEVNULL,
+    )
+    try:
+        await _wait_ready(f"{stub_url}/stub/calls")
+        await _wait_ready(f"{app_url}/docs")
+        # Rate-limit Murf and Gemini; AssemblyAI polls stay unlimited
+        async with httpx.AsyncClient() as c:
+            await c.post(f"{stub_url}/stub/faults", json={"providers": ["murf", "gemini"]})
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+        samples: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        async with httpx.AsyncClient(base_url=app_url, timeout=120, limits=limits) as client:
+            until = time.monotonic() + args.seconds
+            loops = [_loop(client, "/tts/echo", until, samples["echo (batch)"]) for _ in range(args.echo_clients)]
+            loops += [_loop(client, "/agent/chat/chatty", until, samples["chatty session"]) for _ in range(args.chatty_loops)]
+            loops += [
+                _loop(client, f"/agent/chat/session-{i}", until, samples["other sessions"]) for i in range(args.sessions)
+            ]
+            await asyncio.gather(*loops)
+            admission = (await client.get("/cache/stats")).json().get("admission")
+        async with httpx.AsyncClient() as c:
+            rate_limited = (await c.get(f"{stub_url}/stub/calls")).json().get("rate_limited", 0)
+        return {"samples": samples, "rate_limited": rate_limited, "admission": admission}
+    finally:
+        for process in (server, stub):
+            process.terminate()
+        for process in (server, stub):
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--echo-clients", type=int, default=48)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--chatty-loops", type=int, default=6)
+    parser.add_argument("--provider-limit", type=int, default=8, help="concurrent calls the stub allows per provider")
+    parser.add_argument("--deadline", type=float, default=2.0, help="ADMISSION_DEADLINE for the app")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub latency per call (s)")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+
+    result = await _run(args)
+    print(f"{args.app_dir}: {args.seconds:.0f}s spike, provider limit {args.provider_limit}")
+    for name, samples in result["samples"].items():
+        print(f"  {name:<15} {_summary(samples)}")
+    print(f"  provider calls rate-limited (429): {result['rate_limited']}")
+    if result["admission"]:
+        for name, stats in result["admission"].items():
+            print(f"  admission {name:<10} shed {stats['shed']}  wait p50 {stats['wait_p50_ms']} ms  p95 {stats['wait_p95_ms']} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Chat history benchmark: what keeping a chat view in sync costs as the
+conversation grows.
+
+One session takes --turns chat turns against stub providers. After each
+turn the client syncs its view twice, the way a page polling for changes
+would:
+
+- full: GET /agent/chat/{id}, the whole history every time (what the page
+  did before);
+- incremental: GET ?since=<next index> to fetch only the new messages,
+  then a revalidation poll with If-None-Match (304 when nothing changed).
+
+Reported: bytes on the wire (gzip accepted) and latency per sync. Point
+--app-dir at an older checkout to compare; it ignores `since` and ETags,
+so both modes return the full history there.
+
+Usage:
+    python bench_chat_history.py [--turns 100] [--app-dir .]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from load_test import _free_port, _start, _wait_ready, percentiles
+
+
+async def _sync(client: httpx.AsyncClient, url: str, samples: Dict[str, List], **kwargs) -> httpx.Response:
+    start = time.perf_counter()
+    r = await client.get(url, **kwargs)
+    samples["ms"].append(time.perf_counter() - start)
+    samples["bytes"].append(r.num_bytes_downloaded)
+    return r
+
+
+def _summary(samples: Dict[str, List]) -> str:
+    p = percentiles(samples["ms"])
+    total = sum(samples["bytes"])
+    return (
+        f"{total / 1024:>9.1f} KiB total  {total / len(samples['bytes']) / 1024:>7.2f} KiB/sync  "
+        f"p50 {p['p50'] * 1000:.1f} ms  p95 {p['p95'] * 1000:.1f} ms"
+    )
+
+
+async def _run(args) -> Dict[str, Dict[str, List]]:
+    stub_port, app_port = _free_port(), _free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    stub = _start("stub_providers:app", stub_port, {"STUB_LATENCY": "0.01", "STUB_TRANSCRIBE_TIME": "0.01"})
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(app_port), "--log-level", "warning"],
+        env={
+            **os.environ,
+            "MURF_API_KEY": "stub",
+            "ASSEMBLYAI_API_KEY": "stub",
+            "GEMINI_API_KEY": "stub",
+            "MURF_BASE_URL": stub_url,
+            "ASSEMBLYAI_BASE_URL": stub_url,
+            "GEMINI_BASE_URL": stub_url,
+            "WARMUP_ON_STARTUP": "false",
+            "UPLOAD_DIR": f"/tmp/bench-history-{app_port}",
+        },
+        cwd=args.app_dir, stdout=subprocess.DEVNULL,
+    )
+    samples = {mode: {"ms": [], "bytes": []} for mode in ("full", "incremental", "revalidate")}
+    try:
+        await _wait_ready(f"{stub_url}/stub/calls")
+        await _wait_ready(f"{app_url}/docs")
+        async with httpx.AsyncClient(base_url=app_url, timeout=60, headers={"Accept-Encoding": "gzip"}) as client:
+            session_id = (await client.post("/agent/session")).json()["session_id"]
+            url = f"/agent/chat/{session_id}"
+            cursor, etag = 0, None
+            for turn in range(args.turns):
+                audio = b"RIFF" + turn.to_bytes(4, "big") * 1024
+                r = await client.post(url, files={"file": ("a.wav", audio, "audio/wav")})
+                r.raise_for_status()
+
+                await _sync(client, url, samples["full"])
+
+                r = await _sync(client, f"{url}?since={cursor}", samples["incremental"])
+                data = r.json()
+                cursor = data.get("next_cursor", len(data["messages"]))
+                etag = r.headers.get("etag")
+                # Nothing new since: revalidate rather than refetch
+                headers = {"If-None-Match": etag} if etag else {}
+                await _sync(client, f"{url}?since={cursor}", samples["revalidate"], headers=headers)
+        return samples
+    finally:
+        for process in (server, stub):
+            process.terminate()
+        for process in (server, stub):
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+
+    samples = await _run(args)
+    print(f"{args.app_dir}: {args.turns} turns, one sync of each kind per turn")
+    for mode, values in samples.items():
+        print(f"  {mode:<12} {_summary(values)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
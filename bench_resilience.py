@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Provider resilience benchmark against the fault-injecting stub.
+
+tail:   a share of Murf calls are slow (--slow-rate, --slow-seconds) and a
+        few never answer (--hang-rate). /generate runs once with hedging off
+        and once with it on; compare p95/p99 and how many requests hung
+        until the adaptive timeout (504).
+outage: Murf fails every call for a while. Requests fail slowly until the
+        circuit opens, then get an immediate 503 with Retry-After. Once the
+        outage ends the circuit's probe call closes it again.
+
+Usage:
+    python bench_resilience.py [--scenarios tail,outage] [--requests 400] [--concurrency 8]
+                               [--slow-rate 0.05] [--slow-seconds 2] [--hang-rate 0.01]
+"""
+
+import argparse
+import asyncio
+import subprocess
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import httpx
+
+from load_test import _free_port, _start, _wait_ready, percentiles
+
+COOLDOWN = 2.0
+WARMUP_REQUESTS = 40
+
+
+async def _generate(client: httpx.AsyncClient) -> Tuple[int, float]:
+    start = time.perf_counter()
+    try:
+        # Distinct text per request, so neither the TTS cache nor coalescing hides Murf
+        r = await client.post("/generate", data={"text": f"Resilience check {uuid.uuid4().hex}.", "voice_id": "en-US-natalie"})
+        status = r.status_code
+    except httpx.HTTPError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+async def _drive(client: httpx.AsyncClient, requests: int, concurrency: int) -> List[Tuple[int, float]]:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            return await _generate(client)
+
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+def _summary(samples: List[Tuple[int, float]]) -> str:
+    statuses = Counter(status for status, _ in samples)
+    latencies = [seconds for _, seconds in samples]
+    p = percentiles(latencies)
+    codes = " ".join(f"{code}:{count}" for code, count in sorted(statuses.items()))
+    return f"p50 {p['p50']:.3f}s  p95 {p['p95']:.3f}s  p99 {p['p99']:.3f}s  max {max(latencies):.3f}s  [{codes}]"
+
+
+async def _with_servers(app_env: Dict[str, str], stub_env: Dict[str, str], scenario):
+    stub_port, app_port = _free_port(), _free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    stub = _start("stub_providers:app", stub_port, stub_env)
+    server = _start("app:app", app_port, {
+        "MURF_API_KEY": "stub",
+        "ASSEMBLYAI_API_KEY": "stub",
+        "GEMINI_API_KEY": "stub",
+        "MURF_BASE_URL": stub_url,
+        "ASSEMBLYAI_BASE_URL": stub_url,
+        "GEMINI_BASE_URL": stub_url,
+        "WARMUP_ON_STARTUP": "false",
+        **app_env,
+    })
+    try:
+        await _wait_ready(f"{stub_url}/stub/calls")
+        await _wait_ready(f"{app_url}/docs")
+        async with httpx.AsyncClient(base_url=app_url, timeout=120) as client, httpx.AsyncClient(base_url=stub_url) as stub_client:
+            return await scenario(client, stub_client)
+    finally:
+        for process in (server, stub):
+            process.terminate()
+        for process in (server, stub):
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                # uvicorn waits for in-flight requests, and injected hangs never finish
+                process.kill()
+                process.wait()
+
+
+async def tail(args):
+    stub_env = {"STUB_LATENCY": str(args.latency), "STUB_JITTER": str(args.latency / 4)}
+    print(f"\ntail: {args.slow_rate:.0%} of Murf calls +{args.slow_seconds}s, {args.hang_rate:.0%} hang; "
+          f"{args.requests} requests at concurrency {args.concurrency}")
+    for hedge in ("false", "true"):
+        async def scenario(client, stub_client):
+            # Healthy warm-up, so the policy has a latency history before the faults start
+            await _drive(client, WARMUP_REQUESTS, args.concurrency)
+            await stub_client.post("/stub/faults", json={
+                "slow_rate": args.slow_rate, "slow_seconds": args.slow_seconds, "hang_rate": args.hang_rate,
+            })
+            samples = await _drive(client, args.requests, args.concurrency)
+            stats = (await client.get("/cache/stats")).json()["providers"]["murf"]
+            return samples, stats
+
+        samples, stats = await _with_servers({"PROVIDER_HEDGE": hedge}, stub_env, scenario)
+        print(f"  hedging {hedge:<5}  {_summary(samples)}  hedges {stats['hedges']} (won {stats['hedge_wins']}), "
+              f"timeouts {stats['timeouts']}")
+
+
+async def outage(args):
+    stub_env = {"STUB_LATENCY": str(args.latency)}
+    app_env = {"BREAKER_COOLDOWN": str(COOLDOWN)}
+    print(f"\noutage: Murf fails every call, then recovers (breaker cooldown {COOLDOWN:.0f}s)")
+
+    async def scenario(client, stub_client):
+        print(f"  healthy    {_summary(await _drive(client, 40, args.concurrency))}")
+        await stub_client.post("/stub/faults", json={"error_rate": 1, "providers": ["murf"]})
+        before = (await stub_client.get("/stub/calls")).json().get("murf_generate", 0)
+        print(f"  outage     {_summary(await _drive(client, 200, args.concurrency))}")
+        reached = (await stub_client.get("/stub/calls")).json().get("murf_generate", 0) - before
+        print(f"             Murf calls sent during the outage: {reached} of 200")
+        await stub_client.post("/stub/faults", json={"error_rate": 0, "providers": []})
+        await asyncio.sleep(COOLDOWN)
+        print(f"  recovered  {_summary(await _drive(client, 40, args.concurrency))}")
+        stats = (await client.get("/cache/stats")).json()["providers"]["murf"]
+        print(f"             circuit {stats['circuit']}, opened {stats['circuit_opens']}x, rejected {stats['rejected']}")
+
+    await _with_servers(app_env, stub_env, scenario)
+
+
+SCENARIOS = {"tail": tail, "outage": outage}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="tail,outage")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1, help="normal stub latency (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-seconds", type=float, default=2.0)
+    parser.add_argument("--hang-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    for name in args.scenarios.split(","):
+        await SCENARIOS[name](args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+In-memory session store benchmark: fills MemorySessionStore with many
+sessions (100k by default) of a few messages each and reports the memory
+they take (tracemalloc) and the process RSS growth.
+
+Each configuration runs in a fresh process. "unbounded" lifts the session
+limit so every session stays in memory and only the message representation
+differs; "default" uses the SESSION_* settings from the environment, so
+sessions past SESSION_MEMORY_SESSIONS leave memory. Point --app-dir at
+another checkout to compare against older code.
+
+Usage:
+    python bench_session_memory.py [--sessions 100000] [--messages 6] [--chars 80] [--app-dir .]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+CONFIGS = {
+    "unbounded": {"SESSION_MEMORY_SESSIONS": "0", "SESSION_IDLE_SECONDS": "0"},
+    "default": {},
+}
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def _fill(app_dir: str, sessions: int, messages: int, chars: int) -> dict:
+    sys.path.insert(0, app_dir)
+    from session_store import MemorySessionStore
+
+    store = MemorySessionStore()
+    await store.start()
+    text = "x" * chars
+    rss_before = _rss_bytes()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(sessions):
+        session_id = f"bench-session-{i:08d}"
+        await store.create(session_id)
+        for j in range(messages):
+            # Distinct strings per message, like real transcripts and replies
+            content = f"{j} {text}"[:chars] + str(i)
+            await store.append(session_id, {"role": "user" if j % 2 == 0 else "assistant", "content": content, "timestamp": time.time()})
+    elapsed = time.perf_counter() - start
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {
+        "traced_mb": traced / 1e6,
+        "rss_mb": (_rss_bytes() - rss_before) / 1e6,
+        "seconds": elapsed,
+        "sessions": await store.count(),
+    }
+    await store.close()
+    return result
+
+
+def _measure(app_dir: str, config: str, args) -> dict:
+    env = {**os.environ, **CONFIGS[config]}
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--app-dir", app_dir,
+         "--sessions", str(args.sessions), "--messages", str(args.messages), "--chars", str(args.chars)],
+        env=env, cwd=app_dir, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=6, help="messages per session")
+    parser.add_argument("--chars", type=int, default=80, help="characters per message")
+    parser.add_argument("--configs", default="unbounded,default")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_fill(args.app_dir, args.sessions, args.messages, args.chars))))
+        return
+
+    print(f"{args.sessions} sessions x {args.messages} messages of ~{args.chars} chars ({args.app_dir})")
+    print(f"{'config':<10} {'traced MB':>10} {'RSS MB':>8} {'B/message':>10} {'in store':>9} {'fill s':>7}")
+    for config in args.configs.split(","):
+        r = _measure(args.app_dir, config, args)
+        per_message = r["traced_mb"] * 1e6 / (args.sessions * args.messages)
+        print(f"{config:<10} {r['traced_mb']:>10.1f} {r['rss_mb']:>8.1f} {per_message:>10.0f} {r['sessions']:>9} {r['seconds']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
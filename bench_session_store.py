@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Session store benchmark: appends from several worker processes to the
+same sessions, checks that no message is lost, and reports throughput per
+backend as the number of processes grows. The Redis backend runs against
+the Redis-protocol stand-in in stub_providers.py.
+
+With --app it also runs the app under `uvicorn --workers 1` and `--workers N`
+for each backend, reporting request throughput and checking that a session
+created on one worker is visible from every other worker.
+
+Usage:
+    python bench_session_store.py [--backends memory,sqlite,redis] [--processes 1,2,4] [--appends 500] [--app]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from load_test import _free_port, _wait_ready
+from session_store import MemorySessionStore, RedisSessionStore, SQLiteSessionStore
+
+SESSIONS = 8
+
+
+def _make_store(backend: str, target: str):
+    if backend == "sqlite":
+        return SQLiteSessionStore(target)
+    if backend == "redis":
+        return RedisSessionStore(target)
+    return MemorySessionStore()
+
+
+async def _worker(backend: str, target: str, worker: int, appends: int, concurrency: int = 16):
+    store = _make_store(backend, target)
+    await store.start()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with sem:
+            session_id = f"bench-{i % SESSIONS}"
+            await store.append(session_id, {"role": "user", "content": f"w{worker} m{i}", "timestamp": time.time()})
+            await store.messages(session_id, last=10)
+
+    await asyncio.gather(*(one(i) for i in range(appends)))
+    await store.close()
+
+
+def _run_worker(args):
+    asyncio.run(_worker(*args))
+
+
+async def _count_messages(backend: str, target: str) -> int:
+    store = _make_store(backend, target)
+    await store.start()
+    total = 0
+    for i in range(SESSIONS):
+        total += len(await store.messages(f"bench-{i}"))
+    await store.close()
+    return total
+
+
+def bench_backend(backend: str, target: str, processes: int, appends: int):
+    start = time.perf_counter()
+    if processes == 1 or backend == "memory":
+        asyncio.run(_worker(backend, target, 0, appends * processes))
+        lost = 0
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            pool.map(_run_worker, [(backend, target, w, appends) for w in range(processes)])
+    elapsed = time.perf_counter() - start
+    if backend != "memory":
+        lost = appends * processes - asyncio.run(_count_messages(backend, target))
+    return appends * processes / elapsed, lost
+
+
+async def _check_app_workers(workers: int, env: dict, sessions: int = 50, reads: int = 8):
+    """Returns (requests/s, number of 404s for sessions that do exist)."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **env},
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await _wait_ready(f"{base_url}/docs")
+        # Give the other workers time to come up too
+        await asyncio.sleep(1.0)
+
+        async def one_session():
+            # Fresh connections so requests spread over the workers
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                session_id = (await client.post("/agent/session")).json()["session_id"]
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                responses = await asyncio.gather(*(client.get(f"/agent/chat/{session_id}") for _ in range(reads)))
+            return sum(r.status_code == 404 for r in responses)
+
+        start = time.perf_counter()
+        not_found = sum(await asyncio.gather(*(one_session() for _ in range(sessions))))
+        elapsed = time.perf_counter() - start
+        return sessions * (reads + 1) / elapsed, not_found
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", default="memory,sqlite,redis")
+    parser.add_argument("--processes", default="1,2,4")
+    parser.add_argument("--appends", type=int, default=500, help="appends per process")
+    parser.add_argument("--app", action="store_true", help="also check sessions across uvicorn workers")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="voicer-sessions-")
+    resp_port = _free_port()
+    resp = subprocess.Popen(
+        [sys.executable, "stub_providers.py", "--resp"],
+        env={**os.environ, "STUB_RESP_PORT": str(resp_port)},
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    time.sleep(1.0)
+    try:
+        print(f"{'backend':>8} {'procs':>6} {'appends/s':>10} {'lost':>6}")
+        for backend in args.backends.split(","):
+            for processes in [int(p) for p in args.processes.split(",")]:
+                if backend == "sqlite":
+                    target = os.path.join(tmpdir, f"bench-{processes}.db")
+                elif backend == "redis":
+                    target = f"redis://127.0.0.1:{resp_port}/0"
+                    asyncio.run(RedisSessionStore(target).client.execute("FLUSHDB"))
+                else:
+                    target = ""
+                rate, lost = bench_backend(backend, target, processes, args.appends)
+                label = processes if backend != "memory" else f"{processes}*"
+                print(f"{backend:>8} {label:>6} {rate:>10.0f} {lost:>6}")
+        print("* memory is private to one process; it runs the same total work in a single process")
+
+        if args.app:
+            print(f"\nApp under uvicorn --workers (404s = session created on another worker):")
+            print(f"{'backend':>8} {'workers':>8} {'req/s':>8} {'404s':>6}")
+            for backend, env in [
+                ("memory", {"SESSION_STORE": "memory"}),
+                ("sqlite", {"SESSION_STORE": "sqlite", "SESSION_SQLITE_PATH": os.path.join(tmpdir, "app.db")}),
+                ("redis", {"SESSION_STORE": "redis", "SESSION_REDIS_URL": f"redis://127.0.0.1:{resp_port}/0"}),
+            ]:
+                for workers in sorted({1, args.workers}):
+                    rate, not_found = asyncio.run(_check_app_workers(workers, env))
+                    print(f"{backend:>8} {workers:>8} {rate:>8.0f} {not_found:>6}")
+    finally:
+        resp.terminate()
+        resp.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: time from launching uvicorn to the first response and to
+/ready, against stub providers (warm-up included).
+
+Each run starts a fresh server process from --app-dir and polls it every
+10 ms; the median over --runs is reported. With --profile the last run is
+started with STARTUP_PROFILE=true and its GET /startup report (init steps
+and the slowest imports) is printed, so the numbers can be tracked over
+time. Point --app-dir at another checkout to compare against older code.
+
+Usage:
+    python bench_startup.py [--runs 5] [--app-dir .] [--profile] [--json startup.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from load_test import _free_port, _start, _wait_ready
+
+POLL_INTERVAL = 0.01
+
+
+async def _poll(client: httpx.AsyncClient, url: str, started: float, timeout: float = 60.0) -> float:
+    """Seconds from `started` until `url` answers 200."""
+    while time.perf_counter() - started < timeout:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(POLL_INTERVAL)
+    raise RuntimeError(f"{url} did not answer within {timeout:.0f}s")
+
+
+async def _run(app_dir: str, stub_url: str, profile: bool) -> Dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "MURF_API_KEY": "stub",
+        "ASSEMBLYAI_API_KEY": "stub",
+        "GEMINI_API_KEY": "stub",
+        "MURF_BASE_URL": stub_url,
+        "ASSEMBLYAI_BASE_URL": stub_url,
+        "GEMINI_BASE_URL": stub_url,
+        "STARTUP_PROFILE": "true" if profile else "false",
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=app_dir, stdout=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=30) as client:
+            first = await _poll(client, "/cache/stats", started)
+            ready = await _poll(client, "/ready", started)
+            report: Optional[Dict] = None
+            if profile:
+                r = await client.get("/startup")
+                report = r.json() if r.status_code == 200 else None
+        return {"first_response_s": first, "ready_s": ready, "report": report}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _print_report(report: Dict, top: int):
+    print("\nprocess age at milestones:")
+    for name, age in report["process_age_s"].items():
+        print(f"  {name:<24} {age}s")
+    print("init steps:")
+    for entry in report["steps_ms"]:
+        print(f"  {entry['step']:<28} {entry['ms']:>8.1f} ms")
+    print(f"slowest imports (top {top}):")
+    for entry in report["imports_ms"][:top]:
+        print(f"  {entry['module']:<28} {entry['ms']:>8.1f} ms  from {entry['imported_by']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--profile", action="store_true", help="print the /startup report of the last run")
+    parser.add_argument("--top", type=int, default=10, help="imports shown with --profile")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    stub_port = _free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stub = _start("stub_providers:app", stub_port, {"STUB_LATENCY": "0.05"})
+    try:
+        await _wait_ready(f"{stub_url}/stub/calls")
+        runs = []
+        for i in range(args.runs):
+            runs.append(await _run(args.app_dir, stub_url, args.profile and i == args.runs - 1))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    first = statistics.median(r["first_response_s"] for r in runs)
+    ready = statistics.median(r["ready_s"] for r in runs)
+    print(f"{args.app_dir}: {args.runs} runs, median first response {first:.3f}s, ready {ready:.3f}s")
+    report = runs[-1]["report"]
+    if report:
+        _print_report(report, args.top)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"first_response_s": first, "ready_s": ready, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
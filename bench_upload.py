@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Upload forwarding benchmark: posts 1 MB and 50 MB recordings to
+/transcribe/file against the local stub providers and reports latency and
+the app's memory growth (peak RSS over the RSS after startup).
+
+A fresh app is started per file size so peaks don't carry over. The client
+sends the multipart body in 64 KB chunks, optionally throttled with
+--client-mbps to mimic a slow uplink; when the app forwards the stream to
+AssemblyAI as it arrives, latency stays close to the client upload time.
+Point --app-dir at another checkout to compare against older code.
+
+Usage:
+    python bench_upload.py [--sizes 1,50] [--runs 3] [--concurrency 1] [--client-mbps 0] [--app-dir .]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from load_test import _free_port, _start, _wait_ready
+
+CHUNK = 64 * 1024
+BOUNDARY = "voicer-bench-boundary"
+
+
+def _memory_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+async def _multipart_body(size: int, client_mbps: float):
+    # Random bytes per request so the transcript cache doesn't short-circuit anything
+    yield (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="recording.webm"\r\n'
+        "Content-Type: audio/webm\r\n\r\n"
+    ).encode()
+    sent = 0
+    started = time.perf_counter()
+    while sent < size:
+        n = min(CHUNK, size - sent)
+        yield os.urandom(n)
+        sent += n
+        if client_mbps:
+            ahead = sent / (client_mbps * 1024 * 1024) - (time.perf_counter() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def _one(client: httpx.AsyncClient, size: int, client_mbps: float) -> float:
+    start = time.perf_counter()
+    r = await client.post(
+        "/transcribe/file",
+        content=_multipart_body(size, client_mbps),
+        headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+    r.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def bench_size(size_mb: float, args, stub_url: str) -> dict:
+    port = _free_port()
+    app = _start("app:app", port, {
+        "MURF_API_KEY": "stub",
+        "ASSEMBLYAI_API_KEY": "stub",
+        "MURF_BASE_URL": stub_url,
+        "ASSEMBLYAI_BASE_URL": stub_url,
+        "UPLOAD_MAX_BYTES": str(1024 * 1024 * 1024),
+        "WARMUP_ON_STARTUP": "false",
+    }, args.app_dir)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await _wait_ready(f"{base_url}/docs")
+        baseline = _memory_kb(app.pid, "VmRSS")
+        size = int(size_mb * 1024 * 1024)
+        latencies = []
+        async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+            for _ in range(args.runs):
+                latencies += await asyncio.gather(*(_one(client, size, args.client_mbps) for _ in range(args.concurrency)))
+        peak = _memory_kb(app.pid, "VmHWM")
+        return {
+            "size_mb": size_mb,
+            "p50_s": statistics.median(latencies),
+            "max_s": max(latencies),
+            "rss_growth_mb": (peak - baseline) / 1024,
+        }
+    finally:
+        app.terminate()
+        app.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1,50", help="file sizes in MB")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--client-mbps", type=float, default=0, help="throttle the client upload (MB/s, 0 = unthrottled)")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub provider latency (s)")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+
+    stub_port = _free_port()
+    stub = _start("stub_providers:app", stub_port, {"STUB_LATENCY": str(args.latency), "STUB_TRANSCRIBE_TIME": "0"})
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    try:
+        await _wait_ready(f"{stub_url}/stub/calls")
+        print(f"{'size MB':>8} {'p50 s':>8} {'max s':>8} {'RSS growth MB':>14}   (concurrency {args.concurrency})")
+        for size_mb in [float(s) for s in args.sizes.split(",")]:
+            result = await bench_size(size_mb, args, stub_url)
+            print(f"{result['size_mb']:>8g} {result['p50_s']:>8.3f} {result['max_s']:>8.3f} {result['rss_growth_mb']:>14.1f}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,285 @@
+"""
+Result caches for expensive provider calls.
+
+ResultCache is an in-memory LRU with optional TTL and an optional on-disk
+tier (one JSON file per key) that survives restarts. StaleWhileRevalidate
+holds a single rarely-changing value (e.g. the Murf voice catalogue). Disk
+reads and writes run in a worker thread so they never block the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def content_hash(data: bytes) -> str:
+    """Content address for a blob (e.g. uploaded audio)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different texts share a cache entry."""
+    return " ".join(text.split())
+
+
+def tts_key(text: str, voice_id: str, output_format: str) -> str:
+    return hashlib.sha256(f"{voice_id}\0{output_format}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _ratio(hits: int, misses: int) -> float:
+    lookups = hits + misses
+    return round(hits / lookups, 4) if lookups else 0.0
+
+
+class ResultCache:
+    """LRU + TTL cache with hit/miss counters and an optional disk tier."""
+
+    # Prune the disk tier every this many writes
+    DISK_PRUNE_EVERY = 100
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        disk_dir: Optional[str] = None,
+        max_disk_entries: int = 10000,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir or None
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk_writes = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Per-caller hit/miss counters, e.g. per endpoint
+        self.sources: Dict[str, Dict[str, int]] = {}
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key: str, source: Optional[str] = None) -> Optional[Any]:
+        """Return the cached value, or None on a miss."""
+        value = self._memory_get(key)
+        if value is not None:
+            self.memory_hits += 1
+            self._count(source, hit=True)
+            return value
+        if self.disk_dir:
+            stored = await asyncio.to_thread(self._disk_get, key)
+            if stored is not None:
+                value, stored_at = stored
+                self._memory_set(key, value, stored_at)
+                self.disk_hits += 1
+                self._count(source, hit=True)
+                return value
+        self._count(source, hit=False)
+        return None
+
+    async def set(self, key: str, value: Any):
+        stored_at = time.time()
+        self._memory_set(key, value, stored_at)
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_set, key, value, stored_at)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": _ratio(self.hits, self.misses),
+        }
+        if self.sources:
+            stats["sources"] = {
+                source: {**counts, "hit_ratio": _ratio(counts["hits"], counts["misses"])}
+                for source, counts in self.sources.items()
+            }
+        return stats
+
+    def _count(self, source: Optional[str], hit: bool):
+        field = "hits" if hit else "misses"
+        setattr(self, field, getattr(self, field) + 1)
+        if source is not None:
+            counts = self.sources.setdefault(source, {"hits": 0, "misses": 0})
+            counts[field] += 1
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if self._expired(stored_at):
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: Any, stored_at: float):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # --- disk tier (runs in a worker thread) ---
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(stored["stored_at"]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return stored["value"], stored["stored_at"]
+
+    def _disk_set(self, key: str, value: Any, stored_at: float):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"value": value, "stored_at": stored_at}, f)
+        os.replace(tmp_path, path)
+        self._disk_writes += 1
+        if self._disk_writes % self.DISK_PRUNE_EVERY == 0:
+            self._disk_prune()
+
+    def _disk_prune(self):
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        files.append((os.path.getmtime(path), path))
+                    except OSError:
+                        pass
+        files.sort()
+        excess = len(files) - self.max_disk_entries
+        for mtime, path in files:
+            if excess <= 0 and not self._expired(mtime):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            excess -= 1
+
+
+class StaleWhileRevalidate:
+    """A single value fetched once and kept with a TTL.
+
+    After the TTL the stale value keeps being served while one background
+    task refreshes it. The value can be saved to and warmed from a local
+    JSON snapshot so a restart doesn't have to wait for the first fetch.
+    """
+
+    def __init__(self, name: str, fetch, ttl: float, snapshot_path: Optional[str] = None):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path or None
+        self.value: Any = None
+        self.etag: Optional[str] = None
+        self.fetched_at = 0.0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def stale(self) -> bool:
+        return time.time() - self.fetched_at > self.ttl
+
+    async def get(self):
+        """Return (value, etag), fetching only if nothing has been loaded yet."""
+        if self.value is None:
+            await self._refresh_once()
+        elif self.stale and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+        return self.value, self.etag
+
+    async def load_snapshot(self):
+        if not self.snapshot_path:
+            return
+        try:
+            stored = await asyncio.to_thread(_read_json, self.snapshot_path)
+        except (OSError, ValueError):
+            return
+        self._store(stored["value"], stored["fetched_at"])
+
+    async def _refresh_once(self):
+        # Concurrent first requests share one fetch
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh())
+        task = self._refresh_task
+        try:
+            await task
+        finally:
+            if self._refresh_task is task:
+                self._refresh_task = None
+
+    async def _background_refresh(self):
+        try:
+            await self._refresh()
+        except Exception as e:
+            # Keep serving the stale copy; the next request after the TTL tries again
+            self.refresh_errors += 1
+            print(f"{self.name} refresh failed:", e)
+        finally:
+            self._refresh_task = None
+
+    async def _refresh(self):
+        value = await self.fetch()
+        self._store(value, time.time())
+        self.refreshes += 1
+        if self.snapshot_path:
+            await asyncio.to_thread(_write_json, self.snapshot_path, {"value": value, "fetched_at": self.fetched_at})
+
+    def _store(self, value: Any, fetched_at: float):
+        body = json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        self.value = value
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.fetched_at = fetched_at
+
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
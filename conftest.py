@@ -0,0 +1,11 @@
+"""
+Test settings: tests that import the app keep its files out of the working tree
+"""
+
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix="voicer-tests-")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_scratch, "uploads"))
+os.environ.setdefault("AUDIO_PROXY_DIR", os.path.join(_scratch, "audio_cache"))
+os.environ.setdefault("SESSION_SQLITE_PATH", os.path.join(_scratch, "sessions.db"))
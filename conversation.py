@@ -0,0 +1,188 @@
+"""
+Token-budgeted conversation context for the chat agent.
+
+Each turn sends Gemini a running summary of older turns followed by as many
+recent turns verbatim as fit in the token budget, in Gemini's native
+multi-turn `contents` format. When turns fall out of the budget they are
+folded into the session's summary by a background task, so the summary is
+updated incrementally (only the new overflow is summarized) and memoized
+per session instead of being rebuilt every turn.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# How many recent messages to load from the session store per turn
+CONTEXT_MAX_MESSAGES = int(os.getenv("CONTEXT_MAX_MESSAGES", "50"))
+CONTEXT_MAX_SESSIONS = int(os.getenv("CONTEXT_MAX_SESSIONS", "10000"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+class _Summary:
+    __slots__ = ("text", "upto", "tokens")
+
+    def __init__(self, text: str, upto: int):
+        self.text = text
+        # Absolute index of the first message NOT covered by the summary
+        self.upto = upto
+        self.tokens = estimate_tokens(text) if text else 0
+
+
+class ConversationContext:
+    """Builds per-turn LLM context within a token budget."""
+
+    def __init__(
+        self,
+        summarize: Callable[[str, List[Dict[str, Any]]], Awaitable[str]],
+        load_messages: Callable[[str, int, int], Awaitable[Tuple[List[Dict[str, Any]], int]]],
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        max_sessions: int = CONTEXT_MAX_SESSIONS,
+    ):
+        self.summarize = summarize
+        self.load_messages = load_messages
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._summarizing: Dict[str, asyncio.Task] = {}
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.full_history_tokens = 0
+        self.summary_updates = 0
+        self.summary_errors = 0
+
+    def build(self, session_id: str, messages: List[Dict[str, Any]], total_count: int) -> Tuple[List[Dict], Dict]:
+        """Context for a turn.
+
+        `messages` are the most recent messages of the session (the last one
+        is the current user message) and `total_count` the session's total
+        message count. Returns (contents, info) where info reports token use.
+        """
+        tail_start = total_count - len(messages)
+        summary = self._summaries.get(session_id)
+        if summary is not None and summary.upto >= total_count:
+            # The summary covers messages this session no longer has: it was evicted
+            # from the store and started over, so the summary belongs to the old one
+            del self._summaries[session_id]
+            summary = None
+        if summary is not None:
+            self._summaries.move_to_end(session_id)
+        upto = summary.upto if summary is not None else 0
+        summary_tokens = summary.tokens if summary is not None else 0
+
+        # Newest first: always keep the current message, then older turns while they fit
+        budget = self.token_budget - summary_tokens
+        included: List[Dict[str, Any]] = []
+        used = 0
+        first_included = total_count
+        for offset in range(len(messages) - 1, -1, -1):
+            index = tail_start + offset
+            if included and index < upto:
+                break
+            tokens = estimate_tokens(messages[offset]["content"])
+            if included and used + tokens > budget:
+                break
+            included.append(messages[offset])
+            used += tokens
+            first_included = index
+        included.reverse()
+
+        # Gemini wants alternating turns; merge consecutive messages from the same role
+        contents: List[Dict[str, Any]] = []
+        if summary is not None and summary.text:
+            contents.append({"role": "user", "parts": [f"Summary of our conversation so far:\n{summary.text}"]})
+            contents.append({"role": "model", "parts": ["Got it, I'll keep that in mind."]})
+        preamble = len(contents)
+        for msg in included:
+            role = "user" if msg["role"] == "user" else "model"
+            if len(contents) > preamble and contents[-1]["role"] == role:
+                contents[-1]["parts"].append(msg["content"])
+            else:
+                contents.append({"role": role, "parts": [msg["content"]]})
+        if contents and contents[0]["role"] == "model":
+            contents.insert(0, {"role": "user", "parts": ["(continuing our conversation)"]})
+
+        # Anything between the summary and the verbatim window gets folded in later
+        if first_included > upto:
+            self._schedule_summary(session_id, first_included)
+
+        prompt_tokens = summary_tokens + used
+        full_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        self.turns += 1
+        self.prompt_tokens += prompt_tokens
+        self.full_history_tokens += full_tokens
+        info = {
+            "prompt_tokens": prompt_tokens,
+            "summary_tokens": summary_tokens,
+            "verbatim_messages": len(included),
+            "summarized_messages": upto,
+            "token_budget": self.token_budget,
+        }
+        return contents, info
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._summaries),
+            "turns": self.turns,
+            "prompt_tokens": self.prompt_tokens,
+            "full_history_tokens": self.full_history_tokens,
+            "summary_updates": self.summary_updates,
+            "summary_errors": self.summary_errors,
+            "summarizing": len(self._summarizing),
+        }
+
+    def _schedule_summary(self, session_id: str, new_upto: int):
+        if session_id in self._summarizing:
+            return
+        task = asyncio.create_task(self._update_summary(session_id, new_upto))
+        self._summarizing[session_id] = task
+
+    async def _update_summary(self, session_id: str, new_upto: int):
+        try:
+            summary = self._summaries.get(session_id)
+            upto = summary.upto if summary is not None else 0
+            previous = summary.text if summary is not None else ""
+            # Only the turns to fold in are read (messages a capped store dropped are skipped)
+            history, total = await self.load_messages(session_id, upto, new_upto - upto)
+            if total < new_upto:
+                # The session started over while this was scheduled
+                return
+            overflow = [message for message in history if message["index"] < new_upto]
+            if not overflow:
+                if new_upto > upto:
+                    # Those turns were dropped before they could be summarized; move past them
+                    self._summaries[session_id] = _Summary(previous, new_upto)
+                return
+            text = await self.summarize(previous, overflow)
+            self._summaries[session_id] = _Summary(text.strip(), new_upto)
+            self._summaries.move_to_end(session_id)
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+            self.summary_updates += 1
+        except Exception as e:
+            # Next turn just works with the old summary and retries
+            self.summary_errors += 1
+            print("Conversation summary failed:", e)
+        finally:
+            self._summarizing.pop(session_id, None)
+
+
+def summary_prompt(previous: str, messages: List[Dict[str, Any]]) -> str:
+    """Prompt asking the LLM to fold new turns into an existing summary."""
+    lines = []
+    for msg in messages:
+        role = "User" if msg["role"] == "user" else "Assistant"
+        lines.append(f"{role}: {msg['content']}")
+    return (
+        "You maintain a concise running summary of a voice conversation between a user and an AI assistant. "
+        "Keep names, facts, preferences, decisions and open questions; drop small talk. "
+        "Reply with the updated summary only, at most 150 words.\n\n"
+        f"Current summary:\n{previous or '(none yet)'}\n\n"
+        "New turns to fold in:\n" + "\n".join(lines)
+    )
@@ -0,0 +1,115 @@
+"""
+Shared async HTTP client for provider calls (Murf, AssemblyAI).
+
+One httpx.AsyncClient is created when the app starts and reused by every
+endpoint, so provider calls don't block the event loop and keep-alive
+connections are pooled instead of opening a new TLS connection per call.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import record_stage
+
+# Configurable via environment (seconds / connection counts)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "50"))
+
+
+class ProviderHTTPClient:
+    """Pooled async HTTP client with a per-host concurrency limit."""
+
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        per_host_limit: int = HTTP_PER_HOST_LIMIT,
+    ):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("HTTP client not started")
+        return self._client
+
+    def _slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return slot
+
+    @asynccontextmanager
+    async def _acquire(self, url: str):
+        slot = self._slot(url)
+        if slot.locked():
+            # Only time the wait when the host is at its limit, so the common path stays free
+            start = time.perf_counter()
+            await slot.acquire()
+            record_stage("queue_wait", time.perf_counter() - start, provider=urlsplit(url).netloc)
+        else:
+            await slot.acquire()
+        try:
+            yield
+        finally:
+            slot.release()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with self._acquire(url):
+            return await self.client.request(method, url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streamed response (read it with aiter_bytes()); holds a host slot until closed."""
+        async with self._acquire(url):
+            async with self.client.stream(method, url, **kwargs) as response:
+                yield response
+
+    async def warm(self, url: str, timeout: float) -> Optional[str]:
+        """Open a pooled connection to a host; returns an error message or None.
+
+        Any HTTP response counts: the point is the TCP/TLS handshake, which
+        then stays in the pool for HTTP_KEEPALIVE_EXPIRY seconds.
+        """
+        try:
+            await self.request("HEAD", url, timeout=timeout)
+            return None
+        except httpx.HTTPError as e:
+            return f"{type(e).__name__}: {e}"
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
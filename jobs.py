@@ -0,0 +1,201 @@
+"""
+Background jobs for the voice pipelines.
+
+Submitting a job returns its ID at once; a fixed pool of workers takes jobs
+from a bounded queue and runs them independently of the request that
+submitted them, so a client disconnect doesn't throw away upstream work.
+Each job keeps an ordered list of progress events that clients can replay
+and follow from any offset (SSE or long-poll), and a finished job stays
+fetchable for JOB_RESULT_TTL seconds. An optional idempotency key maps a
+resubmission (e.g. a client retrying after a dropped connection) to the
+original job, so it gets the same result instead of a second run.
+
+Jobs live in this process's memory: with several workers, route a job's
+requests to the worker that accepted it.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from metrics import timing_context, timings_ms
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+
+# progress(event, data) callback handed to each job function
+Progress = Callable[[str, Dict[str, Any]], None]
+FINISHED = ("succeeded", "failed")
+
+
+class QueueFull(Exception):
+    """The job queue is at JOB_QUEUE_SIZE."""
+
+
+class Job:
+    __slots__ = (
+        "id", "kind", "status", "events", "result", "error",
+        "timings", "created_at", "finished_at", "_fn", "_changed",
+    )
+
+    def __init__(self, kind: str, fn: Callable[[Progress], Awaitable[Any]]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.events: List[Dict[str, Any]] = []
+        self.result: Any = None
+        self.error: Optional[Dict[str, Any]] = None
+        self.timings: Dict[str, float] = {}
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._fn = fn
+        self._changed = asyncio.Event()
+        self.emit("queued")
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def emit(self, event: str, data: Optional[Dict[str, Any]] = None):
+        self.events.append({"id": len(self.events), "event": event, "data": data or {}, "time": time.time()})
+        # Wake everyone waiting on the old event; later waiters get a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, since: int, timeout: float) -> bool:
+        """Wait until there are events past `since` (or the job finished); False on timeout."""
+        if len(self.events) > since or self.finished:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def to_dict(self, since: int = 0) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "events": self.events[since:],
+            "next": len(self.events),
+            "result": self.result,
+            "error": self.error,
+            "timings": self.timings,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Bounded job queue drained by a fixed pool of worker tasks."""
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE, result_ttl: float = JOB_RESULT_TTL):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._jobs: Dict[str, Job] = {}
+        self._keys: Dict[Tuple[str, str], str] = {}
+        self._job_keys: Dict[str, Tuple[str, str]] = {}
+        # Finished jobs in finishing order, so expiry is a pop from the left
+        self._finished: Deque[Job] = deque()
+        self._tasks: List[asyncio.Task] = []
+        self.submitted = 0
+        self.rejected = 0
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def find(self, kind: str, idempotency_key: Optional[str]) -> Optional[Job]:
+        """The live job submitted earlier with this idempotency key, if any."""
+        if not idempotency_key:
+            return None
+        self._expire()
+        job_id = self._keys.get((kind, idempotency_key))
+        return self._jobs.get(job_id) if job_id else None
+
+    def submit(self, kind: str, fn: Callable[[Progress], Awaitable[Any]], idempotency_key: Optional[str] = None) -> Job:
+        """Queue `fn(progress)`; raises QueueFull when the queue is at capacity."""
+        existing = self.find(kind, idempotency_key)
+        if existing is not None:
+            return existing
+        job = Job(kind, fn)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f"Job queue is full ({self._queue.maxsize} jobs waiting)") from None
+        self.submitted += 1
+        self._jobs[job.id] = job
+        if idempotency_key:
+            self._keys[(kind, idempotency_key)] = job.id
+            self._job_keys[job.id] = (kind, idempotency_key)
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.emit("started")
+        self.running += 1
+        with timing_context():
+            try:
+                job.result = await job._fn(job.emit)
+                job.status = "succeeded"
+                self.succeeded += 1
+            except Exception as e:
+                # HTTPException-style errors keep their status code and detail
+                job.error = {"status_code": getattr(e, "status_code", 500), "detail": getattr(e, "detail", None) or str(e)}
+                job.status = "failed"
+                self.failed += 1
+            job.timings = timings_ms()
+        self.running -= 1
+        job.finished_at = time.time()
+        job._fn = None
+        self._finished.append(job)
+        job.emit(job.status, job.result if job.status == "succeeded" else job.error)
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl
+        while self._finished and self._finished[0].finished_at < cutoff:
+            job = self._finished.popleft()
+            self._jobs.pop(job.id, None)
+            key = self._job_keys.pop(job.id, None)
+            if key is not None:
+                self._keys.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        self._expire()
+        return {
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "running": self.running,
+            "retained": len(self._jobs),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
@@ -0,0 +1,140 @@
+"""
+Registry of reusable Gemini model instances.
+
+genai.GenerativeModel objects are cheap to keep but not free to build (and
+their underlying client is set up lazily on first use), so endpoints fetch
+them from here instead of constructing one per request. Models in the
+GEMINI_MODELS allow-list are built at startup and can be warmed with a
+token-count call so the first real request doesn't pay for client setup
+and the TLS handshake to Gemini.
+
+The google.generativeai SDK takes most of a second to import, so it is
+only imported (and configured) when the first model is built; the startup
+warm-up does that in a worker thread after the app is already serving.
+Endpoints use aget(), which builds a model that isn't cached yet (and so
+may import the SDK or wait on another thread importing it) off the event
+loop.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+import startup_profile
+
+# Comma-separated models to build (and warm) at startup
+GEMINI_MODELS = [m.strip() for m in os.getenv("GEMINI_MODELS", "gemini-1.5-flash").split(",") if m.strip()]
+# Models requested outside the allow-list are still cached, up to this many
+GEMINI_MAX_EXTRA_MODELS = int(os.getenv("GEMINI_MAX_EXTRA_MODELS", "8"))
+
+
+class ModelRegistry:
+    """GenerativeModel instances keyed by model name."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = "",
+        preload: List[str] = GEMINI_MODELS,
+        max_extra: int = GEMINI_MAX_EXTRA_MODELS,
+    ):
+        self.api_key = api_key
+        # Non-default endpoint (e.g. stub_providers.py); needs the REST transport
+        self.base_url = base_url
+        self._genai = None
+        self._sdk_lock = threading.Lock()
+        self.preload = list(preload)
+        self.max_extra = max_extra
+        self._models: Dict[str, Any] = {}
+        # Models outside the allow-list, LRU-bounded so arbitrary names can't grow it forever
+        self._extra: "OrderedDict[str, Any]" = OrderedDict()
+        self.builds = 0
+        self.warmed: Dict[str, Optional[str]] = {}
+
+    def cached(self, name: str):
+        """The model if it has been built already, else None."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        model = self._extra.get(name)
+        if model is not None:
+            self._extra.move_to_end(name)
+        return model
+
+    def get(self, name: str):
+        """The model, built (blocking) on first use."""
+        model = self.cached(name)
+        if model is not None:
+            return model
+        model = self._build(name)
+        if name in self.preload:
+            self._models[name] = model
+        else:
+            self._extra[name] = model
+            while len(self._extra) > self.max_extra:
+                self._extra.popitem(last=False)
+        return model
+
+    async def aget(self, name: str):
+        """get() for the event loop: a model that isn't built yet is built in a worker thread."""
+        model = self.cached(name)
+        if model is None:
+            model = await run_in_threadpool(self.get, name)
+        return model
+
+    def sdk(self):
+        """The google.generativeai module, imported and configured on first use."""
+        if self._genai is None:
+            with self._sdk_lock:
+                if self._genai is None:
+                    with startup_profile.step("gemini sdk import"):
+                        import google.generativeai as genai
+                    if self.api_key:
+                        try:
+                            if self.base_url:
+                                genai.configure(api_key=self.api_key, transport="rest", client_options={"api_endpoint": self.base_url})
+                            else:
+                                genai.configure(api_key=self.api_key)
+                        except Exception:
+                            # Defer detailed error handling to endpoint call
+                            pass
+                    self._genai = genai
+        return self._genai
+
+    def build_all(self):
+        for name in self.preload:
+            self.get(name)
+
+    async def warm(self, timeout: float) -> Dict[str, Optional[str]]:
+        """Open the Gemini connection for every preloaded model.
+
+        Returns {model: None on success or an error message}; failures are
+        reported, not raised, so a flaky provider doesn't keep a worker down.
+        """
+
+        async def one(name: str):
+            try:
+                model = await self.aget(name)
+                await asyncio.wait_for(run_in_threadpool(model.count_tokens, "ping"), timeout)
+                self.warmed[name] = None
+            except Exception as e:
+                self.warmed[name] = f"{type(e).__name__}: {e}"
+
+        await asyncio.gather(*(one(name) for name in self.preload))
+        return dict(self.warmed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "preloaded": sorted(self._models),
+            "extra": list(self._extra),
+            "builds": self.builds,
+            "sdk_loaded": self._genai is not None,
+        }
+
+    def _build(self, name: str):
+        self.builds += 1
+        return self.sdk().GenerativeModel(name)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Benchmark / load test: starts the local provider stand-ins (stub_providers.py
+for Murf, AssemblyAI and Gemini) and the app, drives each endpoint at
+increasing concurrency and reports throughput, p50/p95/p99 latency and
+per-stage timings.
+
+Usage:
+    python load_test.py [--endpoints /generate,/agent/chat/stream | all] [--levels 1,4,16,64]
+                        [--requests 64] [--latency 0.2] [--jitter 0.05] [--error-rate 0.01]
+                        [--json results.json] [--compare baseline.json]
+
+Stages come from the SSE events of the streaming endpoints (time to
+transcript / first audio / done) and from the app's Server-Timing header
+when it sends one. --json writes every number plus the git commit, so runs
+can be compared across commits with --compare. Pipeline endpoints
+(/transcribe/file, /tts/echo) exercise transcript polling; --webhook
+switches the app to AssemblyAI webhook mode. --fetch-audio also downloads
+each reply's audio (compare with and without --audio-proxy, the local audio
+cache). Provider call counts seen by the stub are reported per level.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+ENDPOINTS = [
+    "/generate",
+    "/voices",
+    "/transcribe/file",
+    "/transcribe/batch",
+    "/tts/echo",
+    "/llm/query",
+    "/agent/chat",
+    "/llm/query/stream",
+    "/agent/chat/stream",
+]
+# Files per /transcribe/batch request
+BATCH_SIZE = 8
+SERVER_TIMING = re.compile(r"([\w.-]+)(?:;[^,]*?dur=([\d.]+))?")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(module: str, port: int, env: dict, cwd: Optional[str] = None) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env},
+        cwd=cwd or os.path.dirname(os.path.abspath(__file__)),
+    )
+
+
+async def _wait_ready(url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Server-Timing durations in seconds, e.g. "stt;dur=812.3, llm;dur=403" → {"stt": 0.8123, ...}."""
+    stages = {}
+    for name, dur in SERVER_TIMING.findall(header or ""):
+        if dur:
+            stages[name] = float(dur) / 1000
+    return stages
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "p50": round(rank(50), 4),
+        "p95": round(rank(95), 4),
+        "p99": round(rank(99), 4),
+        "mean": round(sum(ordered) / len(ordered), 4),
+    }
+
+
+async def _read_sse(response: httpx.Response, start: float, stages: Dict[str, float]) -> bool:
+    """Record when the first transcript / audio / done event arrives; False on an error event."""
+    ok = True
+    async for line in response.aiter_lines():
+        if not line.startswith("event: "):
+            continue
+        event = line[len("event: "):]
+        name = {"transcript": "sse_transcript", "audio": "sse_first_audio", "done": "sse_done"}.get(event)
+        if name and name not in stages:
+            stages[name] = time.perf_counter() - start
+        if event == "error":
+            ok = False
+    return ok
+
+
+async def _one(client: httpx.AsyncClient, endpoint: str, repeat: bool, fetch_audio: bool = False) -> Dict:
+    # Unique audio/text per request unless asked otherwise, so caches don't hide provider latency
+    audio = b"\0" * 4096 if repeat else os.urandom(16) + b"\0" * 4080
+    text = "Hello there" if repeat else f"Hello there {os.urandom(4).hex()}"
+    files = {"file": ("a.webm", audio, "audio/webm")}
+    form = {"voice_id": "en-US-natalie"}
+    stages: Dict[str, float] = {}
+    start = time.perf_counter()
+    try:
+        if endpoint == "/generate":
+            r = await client.post(endpoint, data={"text": text, "voice_id": "en-US-natalie"})
+        elif endpoint == "/voices":
+            r = await client.get(endpoint)
+        elif endpoint.endswith("/stream"):
+            url = endpoint.replace("/agent/chat", f"/agent/chat/{uuid.uuid4().hex}")
+            async with client.stream("POST", url, files=files, data=form) as r:
+                ok = r.status_code < 400 and await _read_sse(r, start, stages)
+                stages.update(_server_timing(r.headers.get("server-timing")))
+                return {"latency": time.perf_counter() - start, "ok": ok, "stages": stages}
+        elif endpoint == "/transcribe/batch":
+            batch = [("files", (f"{i}.webm", os.urandom(16) + audio[16:], "audio/webm")) for i in range(BATCH_SIZE)]
+            r = await client.post(endpoint, files=batch)
+            summary = json.loads(r.text.splitlines()[-1]) if r.status_code < 400 else {}
+            stages.update(_server_timing(r.headers.get("server-timing")))
+            return {"latency": time.perf_counter() - start, "ok": summary.get("failed") == 0, "stages": stages}
+        elif endpoint == "/agent/chat":
+            r = await client.post(f"/agent/chat/{uuid.uuid4().hex}", files=files, data=form)
+        else:
+            r = await client.post(endpoint, files=files, data=form)
+    except httpx.HTTPError:
+        return {"latency": time.perf_counter() - start, "ok": False, "stages": stages}
+    stages.update(_server_timing(r.headers.get("server-timing")))
+    latency = time.perf_counter() - start
+    ok = r.status_code < 400
+    audio_url = ok and fetch_audio and r.headers.get("content-type", "").startswith("application/json") and r.json().get("audio_url")
+    if audio_url:
+        # Download the reply audio like the browser would: playback_ready is when it's all here
+        fetch_start = time.perf_counter()
+        try:
+            audio_response = await client.get(audio_url)
+            ok = audio_response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        stages["audio_fetch"] = time.perf_counter() - fetch_start
+        stages["playback_ready"] = time.perf_counter() - start
+    return {"latency": latency, "ok": ok, "stages": stages}
+
+
+async def run_level(
+    base_url: str, stub_url: str, endpoint: str, concurrency: int, total: int, repeat: bool = False, fetch_audio: bool = False,
+) -> Dict:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient() as stub:
+        await stub.post(f"{stub_url}/stub/reset")
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def worker():
+            async with sem:
+                return await _one(client, endpoint, repeat, fetch_audio)
+
+        start = time.perf_counter()
+        samples = await asyncio.gather(*(worker() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+    async with httpx.AsyncClient() as stub:
+        provider_calls = (await stub.get(f"{stub_url}/stub/calls")).json()
+
+    ok = [sample for sample in samples if sample["ok"]]
+    stage_names = sorted({name for sample in ok for name in sample["stages"]})
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": total - len(ok),
+        "rps": round(len(ok) / elapsed, 2),
+        "latency": percentiles([sample["latency"] for sample in ok]),
+        "stages": {
+            name: percentiles([sample["stages"][name] for sample in ok if name in sample["stages"]])
+            for name in stage_names
+        },
+        "provider_calls": provider_calls,
+    }
+
+
+def _print_level(result: Dict, baseline_rps: float):
+    latency = result["latency"]
+    print(f"{result['concurrency']:>12} {result['rps']:>8.1f} {latency.get('p50', 0):>8.3f} "
+          f"{latency.get('p95', 0):>8.3f} {latency.get('p99', 0):>8.3f} {result['errors']:>7} "
+          f"{result['rps'] / baseline_rps if baseline_rps else 0:>8.1f}x")
+    for name, stage in result["stages"].items():
+        print(f"{'':>12} {name:>20}: p50 {stage['p50']:.3f}  p95 {stage['p95']:.3f}  p99 {stage['p99']:.3f}")
+
+
+def _print_comparison(results: Dict, baseline: Dict):
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} (new / old):")
+    print(f"{'endpoint':>22} {'conc.':>6} {'req/s':>8} {'p50':>8} {'p99':>8}")
+    for endpoint, levels in results.items():
+        old_levels = {level["concurrency"]: level for level in baseline.get("results", {}).get(endpoint, [])}
+        for level in levels:
+            old = old_levels.get(level["concurrency"])
+            if not old or not old["rps"] or not old["latency"]:
+                continue
+
+            def ratio(new_value, old_value):
+                return f"{new_value / old_value:.2f}x" if old_value else "-"
+
+            print(f"{endpoint:>22} {level['concurrency']:>6} {ratio(level['rps'], old['rps']):>8} "
+                  f"{ratio(level['latency'].get('p50', 0), old['latency'].get('p50')):>8} "
+                  f"{ratio(level['latency'].get('p99', 0), old['latency'].get('p99')):>8}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub provider latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="stub latency varies by up to ± this (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub provider calls that fail")
+    parser.add_argument("--reply-chars", type=int, default=0, help="length of non-streamed stub LLM replies (0 = short)")
+    parser.add_argument("--tts-cps", type=float, default=0.0, help="stub Murf synthesis speed in characters/s (0 = flat latency)")
+    parser.add_argument("--llm-chunk-delay", type=float, default=0.05, help="seconds between streamed LLM chunks")
+    parser.add_argument("--endpoints", "--endpoint", default="/generate", help=f"comma-separated, or 'all' ({', '.join(ENDPOINTS)})")
+    parser.add_argument("--levels", default="1,4,16,64")
+    parser.add_argument("--transcribe-time", type=float, default=None,
+                        help="seconds until a stub transcript completes (default: --latency)")
+    parser.add_argument("--webhook", action="store_true", help="use AssemblyAI webhook mode")
+    parser.add_argument("--fetch-audio", action="store_true", help="also download each reply's audio_url (audio_fetch / playback_ready stages)")
+    parser.add_argument("--audio-proxy", action="store_true", help="run the app with AUDIO_PROXY=true (local audio cache)")
+    parser.add_argument("--audio-kbps", type=float, default=512, help="stub audio download speed (KB/s, 0 = unthrottled)")
+    parser.add_argument("--repeat", action="store_true", help="send identical audio/text every request (cache hits)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="compare with results written by an earlier --json run")
+    args = parser.parse_args()
+    endpoints = ENDPOINTS if args.endpoints == "all" else args.endpoints.split(",")
+
+    stub_port, app_port = _free_port(), _free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    transcribe_time = args.latency if args.transcribe_time is None else args.transcribe_time
+    stub = _start("stub_providers:app", stub_port, {
+        "STUB_LATENCY": str(args.latency),
+        "STUB_JITTER": str(args.jitter),
+        "STUB_ERROR_RATE": str(args.error_rate),
+        "STUB_TRANSCRIBE_TIME": str(transcribe_time),
+        "STUB_LLM_CHUNK_DELAY": str(args.llm_chunk_delay),
+        "STUB_AUDIO_KBPS": str(args.audio_kbps),
+        "STUB_REPLY_CHARS": str(args.reply_chars),
+        "STUB_TTS_CHARS_PER_SECOND": str(args.tts_cps),
+    })
+    app_env = {
+        "MURF_API_KEY": "stub",
+        "ASSEMBLYAI_API_KEY": "stub",
+        "GEMINI_API_KEY": "stub",
+        "MURF_BASE_URL": stub_url,
+        "ASSEMBLYAI_BASE_URL": stub_url,
+        "GEMINI_BASE_URL": stub_url,
+    }
+    if args.webhook:
+        app_env["ASSEMBLYAI_WEBHOOK_BASE_URL"] = app_url
+    if args.audio_proxy:
+        app_env["AUDIO_PROXY"] = "true"
+        app_env["AUDIO_PROXY_DIR"] = tempfile.mkdtemp(prefix="voicer-audio-")
+    server = _start("app:app", app_port, app_env)
+    results: Dict[str, List[Dict]] = {}
+    try:
+        await _wait_ready(f"{stub_url}/stub/calls")
+        await _wait_ready(f"{app_url}/docs")
+
+        print(f"{args.requests} requests per level, stub latency {args.latency:.2f}s ±{args.jitter:.2f}s, "
+              f"error rate {args.error_rate:.1%}")
+        for endpoint in endpoints:
+            print(f"\n{endpoint}")
+            print(f"{'concurrency':>12} {'req/s':>8} {'p50 (s)':>8} {'p95':>8} {'p99':>8} {'errors':>7} {'speedup':>9}")
+            results[endpoint] = []
+            baseline_rps = None
+            for level in [int(x) for x in args.levels.split(",")]:
+                result = await run_level(app_url, stub_url, endpoint, level, args.requests, args.repeat, args.fetch_audio)
+                baseline_rps = baseline_rps or result["rps"]
+                results[endpoint].append(result)
+                _print_level(result, baseline_rps)
+            print("Provider calls (last level):", results[endpoint][-1]["provider_calls"])
+    finally:
+        server.terminate()
+        stub.terminate()
+        server.wait()
+        stub.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "timestamp": time.time(),
+                "config": vars(args),
+                "results": results,
+            }, f, indent=2)
+        print(f"\nWrote {args.json}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            _print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
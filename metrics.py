@@ -0,0 +1,254 @@
+"""
+Per-stage latency instrumentation and Prometheus metrics.
+
+Wrap each pipeline stage in `stage("name", provider=..., model=..., voice_id=...)`.
+The duration is added to the current request's timings, which
+TimingMiddleware returns in a Server-Timing header, and observed in the
+voicer_stage_duration_seconds histogram exposed by `render()` in the
+Prometheus text format. Label values that come from clients (model,
+voice_id) are capped to a fixed number of distinct values so the number of
+series stays bounded.
+
+Recording a span is a perf_counter() call, a list append and a bucket
+lookup, so it is cheap enough for every request.
+"""
+
+import contextlib
+import contextvars
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Distinct values kept per client-controlled label; the rest are reported as "other"
+METRICS_MAX_LABEL_VALUES = int(os.getenv("METRICS_MAX_LABEL_VALUES", "20"))
+# Upper bound on series per metric
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "2000"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+OTHER = "other"
+
+
+class _LabelLimiter:
+    def __init__(self, max_values: int):
+        self.max_values = max_values
+        self.values = set()
+
+    def __call__(self, value: str) -> str:
+        if value in self.values:
+            return value
+        if len(self.values) < self.max_values:
+            self.values.add(value)
+            return value
+        return OTHER
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a fixed tuple of label names."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, labels: Tuple[str, ...]):
+        series = self._series.get(labels)
+        if series is None:
+            if len(self._series) >= METRICS_MAX_SERIES:
+                labels = (labels[0],) + (OTHER,) * (len(labels) - 1)
+                series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in self._series.items():
+            base = _format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{{{base},le=\"{bound}\"}} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            yield f"{self.name}_bucket{{{base},le=\"+Inf\"}} {cumulative}"
+            yield f"{self.name}_sum{{{base}}} {series[-1]:.6f}"
+            yield f"{self.name}_count{{{base}}} {cumulative}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return ",".join(f"{name}=\"{_escape(value)}\"" for name, value in zip(names, values))
+
+
+def render_samples(name: str, metric_type: str, help_text: str, samples: Dict[Tuple[Tuple[str, str], ...], float]) -> Iterable[str]:
+    """Render gauge/counter samples given as {((label, value), ...): number}."""
+    yield f"# HELP {name} {help_text}"
+    yield f"# TYPE {name} {metric_type}"
+    for labels, value in samples.items():
+        if labels:
+            label_text = ",".join(f"{label}=\"{_escape(str(v))}\"" for label, v in labels)
+            yield f"{name}{{{label_text}}} {value}"
+        else:
+            yield f"{name} {value}"
+
+
+STAGE_LABELS = ("stage", "provider", "model", "voice_id", "status")
+stage_duration = Histogram(
+    "voicer_stage_duration_seconds", "Duration of each pipeline stage.", STAGE_LABELS,
+)
+request_duration = Histogram(
+    "voicer_request_duration_seconds", "HTTP request duration until the response starts.", ("route", "method", "status"),
+)
+_model_values = _LabelLimiter(METRICS_MAX_LABEL_VALUES)
+_voice_values = _LabelLimiter(METRICS_MAX_LABEL_VALUES)
+
+
+class _RequestContext:
+    __slots__ = ("timings", "headers")
+
+    def __init__(self):
+        self.timings: List[Tuple[str, float]] = []
+        self.headers: Dict[str, str] = {}
+
+
+_in_flight = [0]
+_current: contextvars.ContextVar[Optional[_RequestContext]] = contextvars.ContextVar("voicer_request", default=None)
+
+
+class stage:
+    """Context manager timing one pipeline stage (works around awaits too).
+
+    Set `.status` inside the block (e.g. "cache_hit") to label the outcome;
+    it defaults to "ok", or "error" when the block raises.
+    """
+
+    __slots__ = ("name", "provider", "model", "voice_id", "status", "_start")
+
+    def __init__(self, name: str, provider: str = "", model: str = "", voice_id: str = ""):
+        self.name = name
+        self.provider = provider
+        self.model = model
+        self.voice_id = voice_id
+        self.status: Optional[str] = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_stage(
+            self.name,
+            time.perf_counter() - self._start,
+            self.provider,
+            self.model,
+            self.voice_id,
+            self.status or ("error" if exc_type is not None else "ok"),
+        )
+        return False
+
+
+def record_stage(name: str, seconds: float, provider: str = "", model: str = "", voice_id: str = "", status: str = "ok"):
+    context = _current.get()
+    if context is not None:
+        context.timings.append((name, seconds))
+    stage_duration.observe(seconds, (
+        name,
+        provider,
+        _model_values(model) if model else "",
+        _voice_values(voice_id) if voice_id else "",
+        status,
+    ))
+
+
+def current_timings() -> Dict[str, float]:
+    """Stage durations (seconds, summed per stage) recorded so far in this request."""
+    context = _current.get()
+    totals: Dict[str, float] = {}
+    if context is not None:
+        for name, seconds in context.timings:
+            totals[name] = totals.get(name, 0.0) + seconds
+    return totals
+
+
+def timings_ms() -> Dict[str, float]:
+    """current_timings() in milliseconds, rounded, for JSON responses and events."""
+    return {name: round(seconds * 1000, 1) for name, seconds in current_timings().items()}
+
+
+def set_response_header(name: str, value: str):
+    """Add a header to the current HTTP response, if it hasn't started yet."""
+    context = _current.get()
+    if context is not None:
+        context.headers[name] = value
+
+
+def requests_in_flight() -> int:
+    return _in_flight[0]
+
+
+@contextlib.contextmanager
+def timing_context():
+    """Fresh timing context outside HTTP requests, e.g. for one WebSocket turn."""
+    token = _current.set(_RequestContext())
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware: per-request timing context, Server-Timing header, in-flight gauge."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        context = _RequestContext()
+        token = _current.set(context)
+        start = time.perf_counter()
+        _in_flight[0] += 1
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                timings = current_timings()
+                timings["total"] = elapsed
+                headers.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                for name, value in context.headers.items():
+                    headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+                message = {**message, "headers": headers}
+                route = scope.get("route")
+                request_duration.observe(elapsed, (
+                    getattr(route, "path", "unmatched"), scope["method"], str(message["status"]),
+                ))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _in_flight[0] -= 1
+            _current.reset(token)
+
+
+def render(extra: Iterable[str] = ()) -> str:
+    lines: List[str] = []
+    lines.extend(stage_duration.render())
+    lines.extend(request_duration.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,315 @@
+"""
+Timeouts, hedging and circuit breaking for provider calls.
+
+Every Murf, AssemblyAI and Gemini call goes through a ProviderPolicy:
+
+- Adaptive timeout: each operation keeps a window of recent successful
+  latencies; once it has PROVIDER_MIN_SAMPLES of them the call is given
+  PROVIDER_TIMEOUT_MULTIPLIER x p99 (clamped to PROVIDER_MIN_TIMEOUT ..
+  PROVIDER_MAX_TIMEOUT) and then fails with a 504.
+- Hedging: for idempotent calls a second attempt starts once the first one
+  has taken longer than the observed p95; the first success wins and the
+  other attempt is cancelled. At most PROVIDER_HEDGE_BUDGET of calls are
+  hedged, so a provider that is slow across the board doesn't get twice
+  the traffic.
+- Circuit breaker: when at least BREAKER_FAILURE_RATIO of the last
+  BREAKER_WINDOW calls failed (errors, timeouts, 5xx/429), calls fail at
+  once with a 503 for BREAKER_COOLDOWN seconds; then a single probe call is
+  let through (other calls wait for it) and its outcome closes or reopens
+  the circuit.
+
+Gemini's SDK runs in a worker thread, which can't be interrupted: on a
+timeout the request gets its 504 but the thread finishes in the background.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from metrics import record_stage
+
+PROVIDER_LATENCY_WINDOW = int(os.getenv("PROVIDER_LATENCY_WINDOW", "200"))
+PROVIDER_MIN_SAMPLES = int(os.getenv("PROVIDER_MIN_SAMPLES", "20"))
+PROVIDER_TIMEOUT_MULTIPLIER = float(os.getenv("PROVIDER_TIMEOUT_MULTIPLIER", "4"))
+PROVIDER_MIN_TIMEOUT = float(os.getenv("PROVIDER_MIN_TIMEOUT", "2"))
+# Also the timeout until enough latencies have been observed
+PROVIDER_MAX_TIMEOUT = float(os.getenv("PROVIDER_MAX_TIMEOUT", "60"))
+PROVIDER_HEDGE = os.getenv("PROVIDER_HEDGE", "true").lower() in ("1", "true", "yes")
+PROVIDER_HEDGE_QUANTILE = float(os.getenv("PROVIDER_HEDGE_QUANTILE", "0.95"))
+PROVIDER_HEDGE_BUDGET = float(os.getenv("PROVIDER_HEDGE_BUDGET", "0.1"))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "10"))
+
+T = TypeVar("T")
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class ProviderError(HTTPException):
+    """A provider call cut short by its policy."""
+
+
+class CircuitOpen(ProviderError):
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{provider} is failing; calls are paused for {retry_after:.0f}s",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class ProviderTimeout(ProviderError):
+    def __init__(self, provider: str, operation: str, timeout: float):
+        super().__init__(status_code=504, detail=f"{provider} {operation} timed out after {timeout:.1f}s")
+
+
+def is_failed_response(result: Any) -> bool:
+    """5xx and 429 responses count against the provider; other responses are the caller's business."""
+    status = getattr(result, "status_code", None)
+    return isinstance(status, int) and (status >= 500 or status == 429)
+
+
+def _is_failure(exc: BaseException) -> bool:
+    # Client errors (bad request, auth) say nothing about the provider's health
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls."""
+
+    __slots__ = ("samples", "_sorted")
+
+    def __init__(self, size: int = PROVIDER_LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self._sorted: Optional[List[float]] = None
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """None until PROVIDER_MIN_SAMPLES latencies have been seen."""
+        if len(self.samples) < PROVIDER_MIN_SAMPLES:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class CircuitBreaker:
+    """Closed -> open on too many failures -> half-open probe after the cooldown."""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_ratio: float = BREAKER_FAILURE_RATIO,
+        cooldown: float = BREAKER_COOLDOWN,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.state = "closed"
+        # True for each failed call among the most recent ones
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        # Set while the half-open probe is out; callers arriving meanwhile wait for its outcome
+        self._probe: Optional[asyncio.Event] = None
+        self.opens = 0
+        self.rejected = 0
+
+    async def acquire(self) -> bool:
+        """Raise CircuitOpen unless a call may go out; True if it's the half-open probe."""
+        while True:
+            if self.state == "open":
+                remaining = self._opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, remaining)
+                self.state = "half_open"
+            if self.state != "half_open":
+                return False
+            if self._probe is None:
+                self._probe = asyncio.Event()
+                return True
+            await self._probe.wait()
+
+    def record(self, failed: Optional[bool], probe: bool):
+        """Outcome of a call; None when it was cancelled before it finished."""
+        if probe:
+            self._probe.set()
+            self._probe = None
+            if failed:
+                self._open()
+            elif failed is not None:
+                self.state = "closed"
+                self._outcomes.clear()
+            return
+        if failed is None or self.state != "closed":
+            return
+        self._outcomes.append(failed)
+        if (
+            failed
+            and len(self._outcomes) >= self.min_calls
+            and sum(self._outcomes) >= self.failure_ratio * len(self._outcomes)
+        ):
+            self._open()
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self.opens += 1
+        print(f"Circuit for {self.name} opened for {self.cooldown:.0f}s")
+
+
+class ProviderPolicy:
+    """Adaptive timeouts, hedging and a circuit breaker for one provider."""
+
+    def __init__(
+        self,
+        name: str,
+        hedge: bool = PROVIDER_HEDGE,
+        min_timeout: float = PROVIDER_MIN_TIMEOUT,
+        max_timeout: float = PROVIDER_MAX_TIMEOUT,
+        hedge_budget: float = PROVIDER_HEDGE_BUDGET,
+    ):
+        self.name = name
+        self.hedge = hedge
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.hedge_budget = hedge_budget
+        self.breaker = CircuitBreaker(name)
+        self._latencies: Dict[str, LatencyWindow] = {}
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _window(self, operation: str) -> LatencyWindow:
+        window = self._latencies.get(operation)
+        if window is None:
+            window = self._latencies[operation] = LatencyWindow()
+        return window
+
+    def timeout(self, operation: str) -> float:
+        p99 = self._window(operation).quantile(0.99)
+        if p99 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * PROVIDER_TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self, operation: str) -> Optional[float]:
+        if not self.hedge or self.hedges >= self.hedge_budget * self.calls:
+            return None
+        return self._window(operation).quantile(PROVIDER_HEDGE_QUANTILE)
+
+    async def call(
+        self,
+        operation: str,
+        fn: Callable[[], Awaitable[T]],
+        hedge: bool = False,
+        adaptive_timeout: bool = True,
+    ) -> T:
+        """Run `fn()` under the policy.
+
+        `hedge=True` only for idempotent calls: `fn` may run twice at once.
+        `adaptive_timeout=False` for calls whose duration isn't up to the
+        provider (e.g. an upload streamed from a client).
+        """
+        probe = await self.breaker.acquire()
+        self.calls += 1
+        window = self._window(operation)
+        timeout = self.timeout(operation) if adaptive_timeout else None
+        hedge_delay = self.hedge_delay(operation) if hedge and not probe else None
+        failed: Optional[bool] = True
+        try:
+            result = await self._attempts(operation, fn, window, timeout, hedge_delay)
+            failed = is_failed_response(result)
+            return result
+        except asyncio.CancelledError:
+            failed = None
+            raise
+        except ProviderTimeout:
+            self.timeouts += 1
+            raise
+        except Exception as e:
+            failed = _is_failure(e)
+            raise
+        finally:
+            if failed:
+                self.failures += 1
+            self.breaker.record(failed, probe)
+
+    async def _attempts(self, operation: str, fn, window: LatencyWindow, timeout: Optional[float], hedge_delay: Optional[float]):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def attempt():
+            attempt_start = time.perf_counter()
+            result = await fn()
+            if not is_failed_response(result):
+                window.add(time.perf_counter() - attempt_start)
+            return result
+
+        first = asyncio.ensure_future(attempt())
+        tasks = [first]
+        hedged = False
+        try:
+            while True:
+                elapsed = loop.time() - start
+                wait = None if timeout is None else timeout - elapsed
+                if hedge_delay is not None and not hedged:
+                    wait = hedge_delay - elapsed if wait is None else min(wait, hedge_delay - elapsed)
+                done, _ = await asyncio.wait(tasks, timeout=max(0.0, wait) if wait is not None else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    # Keep waiting on the other attempt unless this one succeeded
+                    if not tasks or (task.exception() is None and not is_failed_response(task.result())):
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                if done:
+                    continue
+                elapsed = loop.time() - start
+                if timeout is not None and elapsed >= timeout:
+                    raise ProviderTimeout(self.name, operation, timeout)
+                if hedge_delay is not None and elapsed >= hedge_delay and not hedged:
+                    hedged = True
+                    self.hedges += 1
+                    record_stage("hedge", elapsed, provider=self.name)
+                    tasks.append(asyncio.ensure_future(attempt()))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        operations = {}
+        for operation, window in self._latencies.items():
+            p50, p95 = window.quantile(0.5), window.quantile(PROVIDER_HEDGE_QUANTILE)
+            operations[operation] = {
+                "samples": len(window.samples),
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "hedge_after_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "timeout_s": round(self.timeout(operation), 2),
+            }
+        return {
+            "circuit": self.breaker.state,
+            "circuit_opens": self.breaker.opens,
+            "rejected": self.breaker.rejected,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "operations": operations,
+        }
@@ -0,0 +1,678 @@
+"""
+Pluggable chat session storage.
+
+The in-memory store is the default and only works within one process.
+SQLiteSessionStore (WAL mode, shared file) and RedisSessionStore (any server
+speaking the Redis protocol) let several uvicorn workers or pods share
+sessions. Appends are atomic in every backend, so concurrent turns on the
+same session never lose messages.
+
+Select a backend with SESSION_STORE=memory|sqlite|redis.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.db")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://127.0.0.1:6379/0")
+# Seconds of inactivity before a shared session expires (0 = never); Redis only
+SESSION_TTL = int(os.getenv("SESSION_TTL", "0"))
+# Memory store: messages kept per session (oldest dropped first; 0 = all)
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+# Memory store: sessions held in memory, least recently used leave first (0 = no limit)
+SESSION_MEMORY_SESSIONS = int(os.getenv("SESSION_MEMORY_SESSIONS", "10000"))
+# Memory store: seconds without access before a session leaves memory (0 = never)
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+# Memory store: directory sessions leaving memory are written to and reloaded from (empty = drop them)
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "")
+
+
+class SessionStore:
+    """Interface every backend implements."""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def create(self, session_id: str):
+        raise NotImplementedError
+
+    async def exists(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    async def ensure(self, session_id: str):
+        """Create the session if it doesn't exist yet."""
+        if not await self.exists(session_id):
+            await self.create(session_id)
+
+    async def append(self, session_id: str, message: Dict[str, Any]) -> int:
+        """Atomically append a message; returns the new message count."""
+        raise NotImplementedError
+
+    async def messages(self, session_id: str, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """All messages of a session, or only the most recent `last` ones."""
+        raise NotImplementedError
+
+    async def tail(self, session_id: str, last: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """(messages, total appended) -- the messages are the last ones of those `total`.
+
+        Stores that cap history return fewer messages than `total`.
+        """
+        history = await self.messages(session_id)
+        return (history[-last:] if last else history), len(history)
+
+    async def page(
+        self, session_id: str, start: int = 0, limit: Optional[int] = None, after: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """(messages, total appended) for incremental fetches.
+
+        The messages are those with index >= `start` (and, with `after`, a
+        timestamp later than it), oldest first, at most `limit` of them; each
+        carries its absolute "index". Messages a capped store has dropped are
+        skipped.
+        """
+        history, total = await self.tail(session_id)
+        first = total - len(history)
+        found = [
+            {**message, "index": first + i}
+            for i, message in enumerate(history)
+            if first + i >= start and (after is None or (message.get("timestamp") or 0) > after)
+        ]
+        return (found[:limit] if limit is not None else found), total
+
+    async def version(self, session_id: str) -> Optional[Tuple[int, int]]:
+        """(epoch, messages appended so far), or None if the session doesn't exist.
+
+        The epoch changes whenever the session is created anew (e.g. after the
+        memory store dropped it, or a restart), so the pair identifies the
+        session's contents even where the count alone would repeat.
+        """
+        if not await self.exists(session_id):
+            return None
+        return 0, (await self.tail(session_id, 1))[1]
+
+    async def count(self) -> int:
+        """Number of sessions."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class _Message:
+    """One chat message; roles are interned so every message shares the same few strings."""
+
+    __slots__ = ("role", "content", "timestamp")
+
+    def __init__(self, role: str, content: str, timestamp: Optional[float]):
+        self.role = sys.intern(role)
+        self.content = content
+        self.timestamp = timestamp
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+
+    def to_indexed_dict(self, index: int) -> Dict[str, Any]:
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp, "index": index}
+
+
+def _new_epoch() -> int:
+    """Epoch for a newly created session (see SessionStore.version)."""
+    return time.time_ns()
+
+
+class _Session:
+    __slots__ = ("messages", "total", "touched", "epoch")
+
+    def __init__(self, messages: Optional[List[_Message]] = None, total: int = 0, epoch: Optional[int] = None):
+        # Only the newest max_messages are kept; `total` counts every append
+        self.messages: List[_Message] = messages or []
+        self.total = total
+        self.touched = time.monotonic()
+        self.epoch = epoch or _new_epoch()
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in this process's memory: fastest, but private to one process.
+
+    Each session keeps its newest `max_messages` messages (a ring buffer) as
+    slotted records. Sessions are kept in least-recently-used order; past
+    `max_sessions`, or after `idle_seconds` without access, a session leaves
+    memory. With `spill_dir` set it is written there and reloaded on its next
+    access, otherwise it is dropped.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = SESSION_MAX_MESSAGES,
+        max_sessions: int = SESSION_MEMORY_SESSIONS,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+        spill_dir: str = SESSION_SPILL_DIR,
+    ):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.spill_dir = spill_dir
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        # Sessions being written to / read from spill_dir
+        self._spilling: Dict[str, asyncio.Future] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self.spilled = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    async def start(self):
+        if self.spill_dir:
+            self.spilled = await asyncio.to_thread(self._count_spilled)
+        if self.idle_seconds > 0 and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_idle())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    async def create(self, session_id: str):
+        self._sessions[session_id] = _Session()
+        self._sessions.move_to_end(session_id)
+        await self._evict_over_limit()
+
+    async def exists(self, session_id: str) -> bool:
+        return await self._get(session_id) is not None
+
+    async def append(self, session_id: str, message: Dict[str, Any]) -> int:
+        session = await self._get(session_id)
+        if session is None:
+            session = self._sessions.setdefault(session_id, _Session())
+        session.messages.append(_Message(message["role"], message["content"], message.get("timestamp")))
+        if self.max_messages and len(session.messages) > self.max_messages:
+            del session.messages[0]
+        session.total += 1
+        total = session.total
+        await self._evict_over_limit()
+        return total
+
+    async def messages(self, session_id: str, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        return (await self.tail(session_id, last))[0]
+
+    async def tail(self, session_id: str, last: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        session = await self._get(session_id)
+        if session is None:
+            return [], 0
+        kept = session.messages[-last:] if last else session.messages
+        return [message.to_dict() for message in kept], session.total
+
+    async def page(
+        self, session_id: str, start: int = 0, limit: Optional[int] = None, after: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        session = await self._get(session_id)
+        if session is None:
+            return [], 0
+        first = session.total - len(session.messages)
+        skip = max(0, start - first)
+        if after is None:
+            end = skip + limit if limit is not None else None
+            kept = list(enumerate(session.messages[skip:end], first + skip))
+        else:
+            kept = [
+                (first + skip + i, message) for i, message in enumerate(session.messages[skip:])
+                if (message.timestamp or 0) > after
+            ][:limit]
+        return [message.to_indexed_dict(index) for index, message in kept], session.total
+
+    async def version(self, session_id: str) -> Optional[Tuple[int, int]]:
+        session = await self._get(session_id)
+        return (session.epoch, session.total) if session is not None else None
+
+    async def count(self) -> int:
+        return len(self._sessions) + self.spilled
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_memory": len(self._sessions),
+            "messages_in_memory": sum(len(session.messages) for session in self._sessions.values()),
+            "spilled": self.spilled,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+        }
+
+    async def _get(self, session_id: str) -> Optional[_Session]:
+        session = self._sessions.get(session_id)
+        if session is None and self.spill_dir:
+            session = await self._reload(session_id)
+        if session is not None:
+            session.touched = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    async def _reload(self, session_id: str) -> Optional[_Session]:
+        spilling = self._spilling.get(session_id)
+        if spilling is not None:
+            await asyncio.shield(spilling)
+        if session_id not in self._sessions:
+            loading = self._loading.get(session_id)
+            if loading is None:
+                # Concurrent requests for the same spilled session share one read
+                loading = self._loading[session_id] = asyncio.create_task(self._load(session_id))
+                loading.add_done_callback(lambda _: self._loading.pop(session_id, None))
+            await asyncio.shield(loading)
+        return self._sessions.get(session_id)
+
+    async def _load(self, session_id: str):
+        data = await asyncio.to_thread(_read_spilled, self._spill_path(session_id))
+        if data is None:
+            return
+        self.spilled -= 1
+        if session_id not in self._sessions:
+            self.reloads += 1
+            self._sessions[session_id] = _Session(
+                [_Message(*fields) for fields in data["messages"]], data["total"], data.get("epoch"),
+            )
+            await self._evict_over_limit()
+
+    async def _evict_over_limit(self):
+        evicted = []
+        while self.max_sessions and len(self._sessions) > self.max_sessions:
+            evicted.append(self._sessions.popitem(last=False))
+        await self._evict(evicted)
+
+    async def _sweep_idle(self):
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_seconds / 4))
+            cutoff = time.monotonic() - self.idle_seconds
+            evicted = []
+            # Least recently used first, so the idle ones are all at the front
+            while self._sessions:
+                if next(iter(self._sessions.values())).touched >= cutoff:
+                    break
+                evicted.append(self._sessions.popitem(last=False))
+            try:
+                await self._evict(evicted)
+            except Exception as e:
+                print("Session spill failed:", e)
+
+    async def _evict(self, evicted: List[Tuple[str, _Session]]):
+        if not evicted:
+            return
+        self.evictions += len(evicted)
+        if not self.spill_dir:
+            return
+        files = [
+            (session_id, self._spill_path(session_id), {
+                "total": session.total,
+                "epoch": session.epoch,
+                "messages": [[m.role, m.content, m.timestamp] for m in session.messages],
+            })
+            for session_id, session in evicted
+        ]
+        writing = asyncio.create_task(self._write(files))
+        for session_id, _, _ in files:
+            self._spilling[session_id] = writing
+        await asyncio.shield(writing)
+
+    async def _write(self, files: List[Tuple[str, str, Dict[str, Any]]]):
+        try:
+            self.spilled += await asyncio.to_thread(_write_spilled, [(path, data) for _, path, data in files])
+        finally:
+            for session_id, _, _ in files:
+                if self._spilling.get(session_id) is asyncio.current_task():
+                    del self._spilling[session_id]
+
+    def _spill_path(self, session_id: str) -> str:
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, name[:2], f"{name}.json")
+
+    def _count_spilled(self) -> int:
+        return sum(
+            1 for _, _, names in os.walk(self.spill_dir) for name in names if name.endswith(".json")
+        )
+
+
+def _write_spilled(files: List[Tuple[str, Dict[str, Any]]]) -> int:
+    """Write spilled sessions; returns how many files are new."""
+    created = 0
+    for path, data in files:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        created += not os.path.exists(path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    return created
+
+
+def _read_spilled(path: str) -> Optional[Dict[str, Any]]:
+    """Load and remove a spilled session; None if there is none."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    os.remove(path)
+    return data
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite file in WAL mode, shared by every worker process on a host."""
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per worker thread; SQLite connections aren't thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _setup(self):
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, message_count INTEGER NOT NULL DEFAULT 0)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+            "timestamp REAL, PRIMARY KEY (session_id, seq))"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if "epoch" not in columns:
+            # Databases from before sessions had an epoch; their rows keep epoch 0
+            conn.execute("ALTER TABLE sessions ADD COLUMN epoch INTEGER NOT NULL DEFAULT 0")
+
+    async def start(self):
+        await asyncio.to_thread(self._setup)
+
+    async def create(self, session_id: str):
+        await asyncio.to_thread(
+            lambda: self._conn().execute(
+                "INSERT OR IGNORE INTO sessions (session_id, epoch) VALUES (?, ?)", (session_id, _new_epoch()),
+            )
+        )
+
+    async def exists(self, session_id: str) -> bool:
+        row = await asyncio.to_thread(
+            lambda: self._conn().execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        )
+        return row is not None
+
+    def _append(self, session_id: str, message: Dict[str, Any]) -> int:
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes the write lock up front, so the count read and
+        # the insert can't interleave with another process's append
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO sessions (session_id, epoch) VALUES (?, ?)", (session_id, _new_epoch()))
+            conn.execute("UPDATE sessions SET message_count = message_count + 1 WHERE session_id = ?", (session_id,))
+            (count,) = conn.execute("SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            conn.execute(
+                "INSERT INTO messages (session_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (session_id, count - 1, message["role"], message["content"], message.get("timestamp")),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    async def append(self, session_id: str, message: Dict[str, Any]) -> int:
+        return await asyncio.to_thread(self._append, session_id, message)
+
+    def _messages(self, session_id: str, last: Optional[int]) -> List[Dict[str, Any]]:
+        query = "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY seq DESC"
+        params: tuple = (session_id,)
+        if last:
+            query += " LIMIT ?"
+            params += (last,)
+        rows = self._conn().execute(query, params).fetchall()
+        return [{"role": role, "content": content, "timestamp": ts} for role, content, ts in reversed(rows)]
+
+    async def messages(self, session_id: str, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._messages, session_id, last)
+
+    def _page(self, session_id: str, start: int, limit: Optional[int], after: Optional[float]) -> Tuple[List[Dict[str, Any]], int]:
+        conn = self._conn()
+        query = "SELECT seq, role, content, timestamp FROM messages WHERE session_id = ? AND seq >= ?"
+        params: tuple = (session_id, start)
+        if after is not None:
+            query += " AND timestamp > ?"
+            params += (after,)
+        query += " ORDER BY seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        # One read transaction, so the rows and the count agree
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(query, params).fetchall()
+            row = conn.execute("SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        finally:
+            conn.execute("COMMIT")
+        messages = [{"role": role, "content": content, "timestamp": ts, "index": seq} for seq, role, content, ts in rows]
+        return messages, row[0] if row else 0
+
+    async def page(
+        self, session_id: str, start: int = 0, limit: Optional[int] = None, after: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        return await asyncio.to_thread(self._page, session_id, start, limit, after)
+
+    async def version(self, session_id: str) -> Optional[Tuple[int, int]]:
+        row = await asyncio.to_thread(
+            lambda: self._conn().execute(
+                "SELECT epoch, message_count FROM sessions WHERE session_id = ?", (session_id,),
+            ).fetchone()
+        )
+        return (row[0], row[1]) if row else None
+
+    async def count(self) -> int:
+        (count,) = await asyncio.to_thread(lambda: self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone())
+        return count
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class RespClient:
+    """Minimal Redis-protocol (RESP2) client multiplexing one connection.
+
+    Commands are written in order and replies are matched to them FIFO, so
+    many concurrent callers share one pipelined connection.
+    """
+
+    def __init__(self, url: str = SESSION_REDIS_URL):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int((parts.path or "/0").lstrip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._waiters: deque = deque()
+        self._read_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self):
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._read_task = asyncio.create_task(self._read_loop())
+            if self.password:
+                await self.execute("AUTH", self.password)
+            if self.db:
+                await self.execute("SELECT", self.db)
+
+    async def close(self):
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._fail_waiters(ConnectionError("connection closed"))
+
+    async def execute(self, *args):
+        if self._writer is None:
+            await self.connect()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._writer.write(_encode_command(args))
+        return await future
+
+    async def _read_loop(self):
+        try:
+            while True:
+                reply = await _read_reply(self._reader)
+                future = self._waiters.popleft()
+                if future.done():
+                    continue
+                if isinstance(reply, RespError):
+                    future.set_exception(reply)
+                else:
+                    future.set_result(reply)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            self._writer = None
+            self._fail_waiters(ConnectionError(f"Redis connection lost: {e}"))
+
+    def _fail_waiters(self, exc: Exception):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_exception(exc)
+
+
+def _encode_command(args) -> bytes:
+    out = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        out.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+    return b"".join(out)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = (await reader.readuntil(b"\r\n"))[:-2]
+    kind, rest = line[:1], line[1:]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RespError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected RESP reply: {line!r}")
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as Redis lists; RPUSH is atomic and returns the new length."""
+
+    def __init__(self, url: str = SESSION_REDIS_URL, ttl: int = SESSION_TTL, prefix: str = "voicer"):
+        self.client = RespClient(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _session_key(self, session_id: str) -> str:
+        return f"{self.prefix}:session:{session_id}"
+
+    def _messages_key(self, session_id: str) -> str:
+        return f"{self.prefix}:messages:{session_id}"
+
+    async def start(self):
+        await self.client.connect()
+
+    async def close(self):
+        await self.client.close()
+
+    async def create(self, session_id: str):
+        # The session key holds the session's epoch
+        await self.client.execute("SET", self._session_key(session_id), _new_epoch())
+        if self.ttl:
+            await self.client.execute("EXPIRE", self._session_key(session_id), self.ttl)
+
+    async def exists(self, session_id: str) -> bool:
+        return bool(await self.client.execute("EXISTS", self._session_key(session_id)))
+
+    async def append(self, session_id: str, message: Dict[str, Any]) -> int:
+        count, _ = await asyncio.gather(
+            self.client.execute("RPUSH", self._messages_key(session_id), json.dumps(message)),
+            self.client.execute("SET", self._session_key(session_id), _new_epoch(), "NX"),
+        )
+        if self.ttl:
+            await asyncio.gather(
+                self.client.execute("EXPIRE", self._messages_key(session_id), self.ttl),
+                self.client.execute("EXPIRE", self._session_key(session_id), self.ttl),
+            )
+        return count
+
+    async def messages(self, session_id: str, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        start = -last if last else 0
+        items = await self.client.execute("LRANGE", self._messages_key(session_id), start, -1)
+        return [json.loads(item) for item in items or []]
+
+    async def page(
+        self, session_id: str, start: int = 0, limit: Optional[int] = None, after: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        # Timestamps aren't indexed, so a timestamp query reads from `start` to the end
+        end = start + limit - 1 if limit is not None and after is None else -1
+        if limit == 0 and after is None:
+            items = []
+            total = await self.client.execute("LLEN", self._messages_key(session_id))
+        else:
+            items, total = await asyncio.gather(
+                self.client.execute("LRANGE", self._messages_key(session_id), start, end),
+                self.client.execute("LLEN", self._messages_key(session_id)),
+            )
+        messages = [{**json.loads(item), "index": start + i} for i, item in enumerate(items or [])]
+        if after is not None:
+            messages = [m for m in messages if (m.get("timestamp") or 0) > after][:limit]
+        return messages, total
+
+    async def version(self, session_id: str) -> Optional[Tuple[int, int]]:
+        epoch, total = await asyncio.gather(
+            self.client.execute("GET", self._session_key(session_id)),
+            self.client.execute("LLEN", self._messages_key(session_id)),
+        )
+        return (int(epoch), total) if epoch is not None else None
+
+    async def count(self) -> int:
+        # DBSIZE would count other keys too; SCAN the session keys instead
+        cursor, total = b"0", 0
+        while True:
+            cursor, keys = await self.client.execute("SCAN", cursor, "MATCH", f"{self.prefix}:session:*", "COUNT", 1000)
+            total += len(keys)
+            if cursor in (b"0", "0"):
+                return total
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    if kind == "redis":
+        return RedisSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE backend: {kind!r} (expected memory, sqlite or redis)")
@@ -0,0 +1,69 @@
+"""
+Request coalescing ("singleflight") for provider calls.
+
+Concurrent calls with the same key share one upstream call: the first
+caller starts it and later callers wait for the same result. Errors reach
+every waiter. A waiter that is cancelled only stops waiting; the shared
+call is cancelled only when nobody is waiting for it any more.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls, keyed by the caller."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self.upstream_calls += 1
+            flight = self._flights[key] = _Flight(asyncio.create_task(fn()))
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.task.cancelled() or flight.waiters > 1:
+                raise
+            # Last waiter gave up: nobody needs the result any more. Forget the flight
+            # now so a caller arriving before the task has wound down starts a new one
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieve the exception so an unawaited failure isn't logged as "never retrieved"
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.upstream_calls,
+            "saved": self.coalesced,
+            "in_flight": len(self._flights),
+        }
@@ -0,0 +1,151 @@
+"""
+Startup profile: where the time between process start and serving goes.
+
+Two kinds of entries are recorded:
+
+- imports: with STARTUP_PROFILE=true, an import hook times every module
+  imported directly by the app's own modules (the time includes whatever
+  that module pulls in), so `import fastapi` shows up as one line rather
+  than hundreds. The hook is only installed when profiling is enabled.
+- steps: init work wrapped in `step("name")` (building clients, opening
+  stores, lifespan start-up). Steps are always recorded; they are a couple
+  of perf_counter() calls each.
+
+`report()` returns both along with the process age at the milestones
+marked with `mark()` (app imported, serving, warm-up done), and is
+served at GET /startup. With STARTUP_PROFILE=true it is also printed once
+the app is ready.
+"""
+
+import contextlib
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+# Imports faster than this are left out of the report
+STARTUP_PROFILE_MIN_MS = float(os.getenv("STARTUP_PROFILE_MIN_MS", "1"))
+
+_steps: List[Tuple[str, float]] = []
+_imports: List[Tuple[str, str, float]] = []
+_marks: Dict[str, Optional[float]] = {}
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process was started (Linux only, 10 ms resolution)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            started = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - started / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def mark(name: str):
+    """Record the process age at a milestone; only the first call per name counts."""
+    if name not in _marks:
+        _marks[name] = process_age()
+
+
+@contextlib.contextmanager
+def step(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _steps.append((name, time.perf_counter() - started))
+
+
+class _TimedLoader:
+    """Wraps a module loader to time exec_module for modules imported by app code."""
+
+    def __init__(self, loader, hook: "_ImportHook"):
+        self._loader = loader
+        self._hook = hook
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        hook = self._hook
+        # Only the outermost import made by app code is timed; nested ones are part of it
+        importer = None if hook.depth else hook.importer()
+        if importer is None:
+            return self._loader.exec_module(module)
+        hook.depth = 1
+        started = time.perf_counter()
+        try:
+            return self._loader.exec_module(module)
+        finally:
+            hook.depth = 0
+            seconds = time.perf_counter() - started
+            if seconds * 1000 >= STARTUP_PROFILE_MIN_MS:
+                _imports.append((module.__name__, importer, seconds))
+
+
+class _ImportHook:
+    """Meta path finder that hands out timed loaders for modules found by the other finders."""
+
+    def __init__(self, app_dir: str):
+        self.app_dir = app_dir
+        self.depth = 0
+
+    def importer(self) -> Optional[str]:
+        """Name of the app module whose import statement is running, if any."""
+        frame = sys._getframe(2)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(self.app_dir) and not filename.startswith(os.path.join(self.app_dir, "venv")):
+                return frame.f_globals.get("__name__")
+            if not filename.startswith("<frozen"):
+                return None
+            frame = frame.f_back
+        return None
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+
+def install():
+    """Start timing imports (no-op unless STARTUP_PROFILE is enabled)."""
+    if STARTUP_PROFILE and not any(isinstance(f, _ImportHook) for f in sys.meta_path):
+        sys.meta_path.insert(0, _ImportHook(os.path.dirname(os.path.abspath(__file__)) + os.sep))
+
+
+def report() -> Dict[str, Any]:
+    imports = sorted(_imports, key=lambda entry: entry[2], reverse=True)
+    return {
+        "process_age_s": {name: round(age, 3) if age is not None else None for name, age in _marks.items()},
+        "steps_ms": [{"step": name, "ms": round(seconds * 1000, 1)} for name, seconds in _steps],
+        "imports_ms": [
+            {"module": name, "imported_by": importer, "ms": round(seconds * 1000, 1)}
+            for name, importer, seconds in imports
+        ],
+        "import_profiling": STARTUP_PROFILE,
+    }
+
+
+def print_report():
+    data = report()
+    print("Startup profile:")
+    for name, age in data["process_age_s"].items():
+        print(f"  {name:<28} {age if age is not None else '?':>8}s after process start")
+    for entry in data["steps_ms"]:
+        print(f"  step   {entry['step']:<32} {entry['ms']:>8.1f} ms")
+    for entry in data["imports_ms"]:
+        print(f"  import {entry['module']:<32} {entry['ms']:>8.1f} ms  ({entry['imported_by']})")
@@ -0,0 +1,117 @@
+"""
+Helpers for the streaming response pipeline.
+
+LLM output arrives in arbitrary text chunks; SentenceSplitter turns it into
+complete sentences so each one can be sent to TTS as soon as it is done,
+split_for_tts packs a finished reply into as few chunks under Murf's limit
+as possible, and sse_event formats Server-Sent Events for the browser.
+"""
+
+import json
+import re
+from typing import AsyncIterator, List, Optional
+
+# Murf rejects requests with more characters than this
+MURF_MAX_CHARS = 3000
+
+# Sentence end: terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, or a blank line / line break between paragraphs and list items
+_BOUNDARY = re.compile(r"""[.!?…]+["'”’)\]]*\s+|\n+""")
+
+
+class SentenceSplitter:
+    """Incrementally split streamed text into sentences."""
+
+    def __init__(self, min_chars: int = 20, max_chars: int = MURF_MAX_CHARS):
+        # Very short pieces ("Hi!", "1.") are merged with the next sentence
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add a chunk of text and return any sentences it completed."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(self._buffer):
+            if match.end() - start < self.min_chars:
+                continue
+            sentences.extend(self._cut(self._buffer[start:match.end()]))
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        # No boundary in sight: don't let a run-on sentence exceed the TTS limit
+        while len(self._buffer) > self.max_chars:
+            piece, self._buffer = _split_at_space(self._buffer, self.max_chars)
+            sentences.extend(self._cut(piece))
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever text is left once the stream has ended."""
+        rest, self._buffer = self._buffer, ""
+        return self._cut(rest)
+
+    def _cut(self, text: str) -> List[str]:
+        pieces = []
+        text = text.strip()
+        while len(text) > self.max_chars:
+            piece, text = _split_at_space(text, self.max_chars)
+            pieces.append(piece.strip())
+        if text:
+            pieces.append(text)
+        return pieces
+
+
+def _split_at_space(text: str, limit: int):
+    cut = text.rfind(" ", 0, limit)
+    if cut <= 0:
+        cut = limit
+    return text[:cut], text[cut:]
+
+
+async def iter_sentences(chunks: AsyncIterator[str], splitter: Optional[SentenceSplitter] = None,
+                         raw_parts: Optional[List[str]] = None) -> AsyncIterator[str]:
+    """Yield complete sentences from an async stream of text chunks.
+
+    If raw_parts is given, the unmodified chunks are appended to it so the
+    caller can keep the full response text.
+    """
+    splitter = splitter or SentenceSplitter()
+    async for chunk in chunks:
+        if raw_parts is not None:
+            raw_parts.append(chunk)
+        for sentence in splitter.feed(chunk):
+            yield sentence
+    for sentence in splitter.flush():
+        yield sentence
+
+
+def split_for_tts(text: str, max_chars: int = MURF_MAX_CHARS) -> List[str]:
+    """Split text into chunks of at most max_chars, cutting only between sentences when possible.
+
+    Sentences are packed greedily, and a chunk that is at least half full
+    ends at a paragraph break rather than starting the next paragraph.
+    """
+    chunks: List[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        splitter = SentenceSplitter(min_chars=0, max_chars=max_chars)
+        sentences = splitter.feed(paragraph) + splitter.flush()
+        if current and len(current) >= max_chars // 2:
+            chunks.append(current)
+            current = ""
+        separator = "\n\n"
+        for sentence in sentences:
+            if current and len(current) + len(separator) + len(sentence) > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}{separator}{sentence}" if current else sentence
+            separator = " "
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def sse_event(event: str, data, event_id: Optional[int] = None) -> str:
+    """Format one Server-Sent Event with a JSON payload (and an id clients can resume from)."""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
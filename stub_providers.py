@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the Murf, AssemblyAI and Gemini HTTP APIs.
+
+Lets the app be driven without real API keys or network access. Point the
+app at it with MURF_BASE_URL / ASSEMBLYAI_BASE_URL / GEMINI_BASE_URL, e.g.:
+
+    uvicorn stub_providers:app --port 9100
+    MURF_BASE_URL=http://127.0.0.1:9100 ASSEMBLYAI_BASE_URL=http://127.0.0.1:9100 \
+        GEMINI_BASE_URL=http://127.0.0.1:9100 GEMINI_API_KEY=stub uvicorn app:app
+
+`python stub_providers.py --resp` instead serves an in-memory Redis-protocol
+stand-in for SESSION_STORE=redis.
+
+Latency is configurable with STUB_LATENCY (seconds per call, varied by up
+to ±STUB_JITTER), STUB_TRANSCRIBE_TIME (seconds until a transcript
+completes) and STUB_LLM_CHUNK_DELAY (seconds between streamed Gemini
+chunks). Generated audio is served from /stub-audio/ as STUB_AUDIO_BYTES
+of filler sent at STUB_AUDIO_KBPS (a slow CDN). STUB_ERROR_RATE makes that fraction of provider calls fail with a
+503. Transcript requests that carry a webhook_url get a completion callback
+like the real API.
+
+STUB_REPLY_CHARS makes non-streamed Gemini replies about that long, and
+with STUB_TTS_CHARS_PER_SECOND Murf takes longer for longer texts (like the
+real API); texts over Murf's 3000 character limit get a 400.
+
+For resilience testing, STUB_SLOW_RATE of calls take STUB_SLOW_SECONDS
+longer (tail latency) and STUB_HANG_RATE of calls never answer. All fault
+settings can be changed at runtime with `POST /stub/faults`, e.g.
+{"error_rate": 1, "providers": ["murf"]} for a Murf outage.
+
+STUB_CONCURRENCY_LIMIT rate-limits like the real APIs do under a spike:
+calls beyond that many in flight per provider get a 429.
+"""
+
+import asyncio
+import fnmatch
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from typing import Dict, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", "0.2"))
+STUB_JITTER = float(os.getenv("STUB_JITTER", "0"))
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_TRANSCRIBE_TIME = float(os.getenv("STUB_TRANSCRIBE_TIME", "1.0"))
+STUB_LLM_CHUNK_DELAY = float(os.getenv("STUB_LLM_CHUNK_DELAY", "0.05"))
+STUB_AUDIO_BYTES = int(os.getenv("STUB_AUDIO_BYTES", str(64 * 1024)))
+STUB_AUDIO_KBPS = float(os.getenv("STUB_AUDIO_KBPS", "512"))
+STUB_REPLY_CHARS = int(os.getenv("STUB_REPLY_CHARS", "0"))
+STUB_TTS_CHARS_PER_SECOND = float(os.getenv("STUB_TTS_CHARS_PER_SECOND", "0"))
+STUB_SLOW_RATE = float(os.getenv("STUB_SLOW_RATE", "0"))
+STUB_SLOW_SECONDS = float(os.getenv("STUB_SLOW_SECONDS", "2"))
+STUB_HANG_RATE = float(os.getenv("STUB_HANG_RATE", "0"))
+STUB_CONCURRENCY_LIMIT = int(os.getenv("STUB_CONCURRENCY_LIMIT", "0"))
+
+app = FastAPI()
+
+# Uploaded audio and pending transcripts, keyed by id
+uploads: Dict[str, int] = {}
+transcripts: Dict[str, Dict] = {}
+
+# Simple request counters so callers can see what reached the "provider"
+calls: Dict[str, int] = {}
+
+# Injected faults; "providers" limits them to calls whose name starts with one of these
+faults: Dict = {
+    "error_rate": STUB_ERROR_RATE,
+    "slow_rate": STUB_SLOW_RATE,
+    "slow_seconds": STUB_SLOW_SECONDS,
+    "hang_rate": STUB_HANG_RATE,
+    "concurrency_limit": STUB_CONCURRENCY_LIMIT,
+    "providers": [],
+}
+
+# Calls currently in flight per provider ("murf", "aai", "gemini")
+in_flight: Dict[str, int] = {}
+
+
+def _count(name: str):
+    calls[name] = calls.get(name, 0) + 1
+
+
+def _targeted(name: str) -> bool:
+    providers = faults["providers"]
+    return not providers or any(name.startswith(p) for p in providers)
+
+
+def _faulty(name: str, rate_name: str) -> bool:
+    rate = faults[rate_name]
+    if not rate or random.random() >= rate:
+        return False
+    return _targeted(name)
+
+
+def _provider_call(name: str):
+    """Count a provider call, failing it at the injected error rate."""
+    _count(name)
+    if _faulty(name, "error_rate"):
+        calls["injected_errors"] = calls.get("injected_errors", 0) + 1
+        raise HTTPException(status_code=503, detail="Stub injected failure")
+
+
+async def _delay(seconds: Optional[float] = None):
+    base = STUB_LATENCY if seconds is None else seconds
+    await asyncio.sleep(max(0.0, base + random.uniform(-STUB_JITTER, STUB_JITTER)))
+
+
+async def _provider_delay(name: str, seconds: Optional[float] = None):
+    """Latency of one provider call, with injected slow and hanging calls and the rate limit."""
+    provider = name.split("_")[0]
+    limit = faults["concurrency_limit"]
+    if limit and in_flight.get(provider, 0) >= limit and _targeted(name):
+        calls["rate_limited"] = calls.get("rate_limited", 0) + 1
+        raise HTTPException(status_code=429, detail="Stub rate limit", headers={"Retry-After": "1"})
+    in_flight[provider] = in_flight.get(provider, 0) + 1
+    try:
+        if _faulty(name, "hang_rate"):
+            calls["injected_hangs"] = calls.get("injected_hangs", 0) + 1
+            await asyncio.sleep(3600)
+        if _faulty(name, "slow_rate"):
+            calls["injected_slow"] = calls.get("injected_slow", 0) + 1
+            await asyncio.sleep(faults["slow_seconds"])
+        await _delay(seconds)
+    finally:
+        in_flight[provider] -= 1
+
+
+@app.get("/stub/calls")
+async def get_calls():
+    return calls
+
+
+@app.post("/stub/faults")
+async def set_faults(request: Request):
+    faults.update(await request.json())
+    return faults
+
+
+@app.post("/stub/reset")
+async def reset_calls():
+    calls.clear()
+    return calls
+
+
+# --- Murf ---
+
+@app.get("/v1/speech/voices")
+async def murf_voices():
+    _provider_call("murf_voices")
+    await _provider_delay("murf_voices")
+    return [
+        {"voiceId": "en-US-natalie", "displayName": "Natalie", "locale": "en-US"},
+        {"voiceId": "en-US-terrell", "displayName": "Terrell", "locale": "en-US"},
+    ]
+
+
+@app.post("/v1/speech/generate")
+async def murf_generate(request: Request):
+    _provider_call("murf_generate")
+    body = await request.json()
+    text = body.get("text") or ""
+    if len(text) > 3000:
+        raise HTTPException(status_code=400, detail=f"Text is {len(text)} characters; the limit is 3000")
+    await _provider_delay("murf_generate")
+    if STUB_TTS_CHARS_PER_SECOND:
+        await asyncio.sleep(len(text) / STUB_TTS_CHARS_PER_SECOND)
+    digest = hashlib.sha1(f"{body.get('voice_id')}:{body.get('text')}".encode()).hexdigest()
+    return {
+        "audioFile": f"{str(request.base_url).rstrip('/')}/stub-audio/{digest}.mp3",
+        "audioLengthInSeconds": len(body.get("text") or "") / 15,
+    }
+
+
+@app.get("/stub-audio/{name}")
+async def murf_audio(name: str):
+    _count("murf_audio")
+    await _delay()
+    chunk = 16 * 1024
+
+    async def body():
+        for offset in range(0, STUB_AUDIO_BYTES, chunk):
+            yield (name.encode() * (chunk // len(name) + 1))[: min(chunk, STUB_AUDIO_BYTES - offset)]
+            if STUB_AUDIO_KBPS:
+                await asyncio.sleep(chunk / (STUB_AUDIO_KBPS * 1024))
+
+    return StreamingResponse(body(), media_type="audio/mpeg", headers={"Content-Length": str(STUB_AUDIO_BYTES)})
+
+
+# --- AssemblyAI ---
+
+@app.post("/v2/upload")
+async def aai_upload(request: Request):
+    _provider_call("aai_upload")
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+    await _provider_delay("aai_upload")
+    upload_id = uuid.uuid4().hex
+    uploads[upload_id] = size
+    return {"upload_url": f"https://cdn.stub/upload/{upload_id}"}
+
+
+@app.post("/v2/transcript")
+async def aai_transcript(request: Request):
+    _provider_call("aai_transcript")
+    body = await request.json()
+    await _provider_delay("aai_transcript")
+    upload_id = body["audio_url"].rsplit("/", 1)[-1]
+    transcript_id = uuid.uuid4().hex
+    transcripts[transcript_id] = {
+        "ready_at": time.monotonic() + STUB_TRANSCRIBE_TIME,
+        # Distinct per upload, so downstream LLM/TTS calls aren't coalesced or cached
+        "text": f"Stub transcript {upload_id[:8]} of {uploads.get(upload_id, 0)} bytes.",
+    }
+    if body.get("webhook_url"):
+        asyncio.create_task(_deliver_webhook(transcript_id, body))
+    return {"id": transcript_id, "status": "queued"}
+
+
+async def _deliver_webhook(transcript_id: str, body: Dict):
+    await asyncio.sleep(STUB_TRANSCRIBE_TIME)
+    headers = {}
+    if body.get("webhook_auth_header_name"):
+        headers[body["webhook_auth_header_name"]] = body.get("webhook_auth_header_value", "")
+    _count("aai_webhook")
+    async with httpx.AsyncClient() as client:
+        try:
+            await client.post(
+                body["webhook_url"],
+                json={"transcript_id": transcript_id, "status": "completed"},
+                headers=headers,
+            )
+        except httpx.HTTPError:
+            pass
+
+
+@app.get("/v2/transcript/{transcript_id}")
+async def aai_transcript_status(transcript_id: str):
+    _provider_call("aai_poll")
+    entry = transcripts.get(transcript_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Transcript not found")
+    await _provider_delay("aai_poll", STUB_LATENCY / 4)
+    if time.monotonic() < entry["ready_at"]:
+        return {"id": transcript_id, "status": "processing", "text": None}
+    return {"id": transcript_id, "status": "completed", "text": entry["text"]}
+
+
+# --- Gemini (REST transport: genai.configure(transport="rest", client_options={"api_endpoint": ...})) ---
+
+STUB_REPLY_SENTENCES = [
+    "That's a great question.",
+    "Here is a short answer from the stub model.",
+    "It has a few sentences so the reply is spoken in parts.",
+    "Let me know if you want more detail!",
+]
+
+
+def _reply_text(prompt: str) -> str:
+    sentences = " ".join(STUB_REPLY_SENTENCES)
+    if not STUB_REPLY_CHARS:
+        return sentences
+    # Long answer: paragraphs of the stub sentences up to STUB_REPLY_CHARS, distinct per prompt
+    tag = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+    paragraphs = []
+    length = 0
+    while length < STUB_REPLY_CHARS:
+        paragraph = f"Part {len(paragraphs) + 1} of reply {tag}. {sentences} {sentences}"
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def _prompt_text(body: Dict) -> str:
+    return " ".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def _llm_chunk(text: str, prompt_tokens: int, last: bool) -> Dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if last:
+        candidate["finishReason"] = 1
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": len(text) // 4},
+    }
+
+
+@app.post("/v1beta/models/{model_action}")
+async def gemini(model_action: str, request: Request):
+    _, _, action = model_action.partition(":")
+    body = await request.json()
+    prompt_tokens = max(1, len(_prompt_text(body)) // 4)
+    if action == "countTokens":
+        _provider_call("gemini_count_tokens")
+        return {"totalTokens": prompt_tokens}
+    if action == "generateContent":
+        _provider_call("gemini_generate")
+        await _provider_delay("gemini_generate")
+        return _llm_chunk(_reply_text(_prompt_text(body)), prompt_tokens, last=True)
+    if action == "streamGenerateContent":
+        _provider_call("gemini_stream")
+
+        # The REST transport reads a streamed JSON array of responses
+        async def chunks():
+            await _provider_delay("gemini_stream")
+            yield "["
+            for i, sentence in enumerate(STUB_REPLY_SENTENCES):
+                if i:
+                    await _delay(STUB_LLM_CHUNK_DELAY)
+                    yield ","
+                last = i == len(STUB_REPLY_SENTENCES) - 1
+                yield json.dumps(_llm_chunk(sentence + ("" if last else " "), prompt_tokens, last))
+            yield "]"
+
+        return StreamingResponse(chunks(), media_type="application/json")
+    raise HTTPException(status_code=404, detail=f"Unknown Gemini action {action!r}")
+
+
+# --- Redis-protocol stand-in (for SESSION_STORE=redis) ---
+
+class RespStandIn:
+    """In-memory server speaking enough of the Redis protocol for RedisSessionStore."""
+
+    def __init__(self):
+        self.strings: Dict[bytes, bytes] = {}
+        self.lists: Dict[bytes, list] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                writer.write(self._execute(args))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> list:
+        header = await reader.readuntil(b"\r\n")
+        args = []
+        for _ in range(int(header[1:-2])):
+            length = int((await reader.readuntil(b"\r\n"))[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _execute(self, args: list) -> bytes:
+        command, args = args[0].upper(), args[1:]
+        if command in (b"PING", b"AUTH", b"SELECT", b"EXPIRE", b"FLUSHDB"):
+            if command == b"FLUSHDB":
+                self.strings.clear()
+                self.lists.clear()
+            return b":1\r\n" if command == b"EXPIRE" else b"+OK\r\n"
+        if command == b"SET":
+            self.strings[args[0]] = args[1]
+            return b"+OK\r\n"
+        if command == b"GET":
+            return _bulk(self.strings.get(args[0]))
+        if command == b"EXISTS":
+            return b":%d\r\n" % sum(1 for key in args if key in self.strings or key in self.lists)
+        if command == b"DEL":
+            removed = sum(1 for key in args if self.strings.pop(key, None) is not None or self.lists.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if command == b"RPUSH":
+            items = self.lists.setdefault(args[0], [])
+            items.extend(args[1:])
+            return b":%d\r\n" % len(items)
+        if command == b"LLEN":
+            return b":%d\r\n" % len(self.lists.get(args[0], []))
+        if command == b"LRANGE":
+            items = self.lists.get(args[0], [])
+            start, stop = int(args[1]), int(args[2])
+            stop = len(items) if stop == -1 else stop + 1
+            selected = items[start:stop] if start >= 0 else items[max(len(items) + start, 0):stop]
+            return b"*%d\r\n" % len(selected) + b"".join(_bulk(item) for item in selected)
+        if command == b"SCAN":
+            pattern = args[args.index(b"MATCH") + 1] if b"MATCH" in args else b"*"
+            keys = [key for key in list(self.strings) + list(self.lists) if fnmatch.fnmatchcase(key, pattern)]
+            return b"*2\r\n" + _bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(_bulk(key) for key in keys)
+        return b"-ERR unknown command '%s'\r\n" % command
+
+
+def _bulk(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+async def serve_resp(host: str = "127.0.0.1", port: int = 6379):
+    server = await asyncio.start_server(RespStandIn().handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--resp" in sys.argv:
+        asyncio.run(serve_resp(port=int(os.getenv("STUB_RESP_PORT", "6379"))))
+    else:
+        import uvicorn
+
+        uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("STUB_PORT", "9100")))
@@ -0,0 +1,137 @@
+"""
+Unit tests for admission.py (per-provider admission control)
+"""
+
+import asyncio
+
+import pytest
+
+import admission
+from admission import AdmissionQueue, Overloaded, classify
+
+
+async def _hold(queue: AdmissionQueue, priority: str, key: str, order: list, release: asyncio.Event):
+    classify(priority, key)
+    async with queue.slot():
+        order.append((priority, key))
+        await release.wait()
+
+
+def test_unlimited_queue_admits_everything():
+    async def run():
+        queue = AdmissionQueue("test", 0)
+        async with queue.slot(), queue.slot(), queue.slot():
+            return queue.in_use
+
+    assert asyncio.run(run()) == 3
+
+
+def test_waiters_served_by_priority_then_round_robin():
+    async def run():
+        queue = AdmissionQueue("test", 1, deadline=5)
+        order = []
+        release = asyncio.Event()
+        blocker = asyncio.create_task(_hold(queue, "standard", "blocker", order, release))
+        await asyncio.sleep(0)
+        waiters = []
+        for priority, key in [("batch", "b"), ("standard", "a"), ("standard", "a"), ("standard", "c"), ("interactive", "x")]:
+            waiters.append(asyncio.create_task(_hold(queue, priority, key, order, release)))
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(blocker, *waiters)
+        return queue, order
+
+    queue, order = asyncio.run(run())
+    assert order[1:] == [("interactive", "x"), ("standard", "a"), ("standard", "c"), ("standard", "a"), ("batch", "b")]
+    assert queue.in_use == 0
+    assert queue.stats()["queued"] == {"interactive": 0, "standard": 0, "batch": 0}
+
+
+def test_shed_when_expected_wait_exceeds_deadline():
+    async def run():
+        queue = AdmissionQueue("test", 1, deadline=1)
+        queue.in_use = 1
+        queue._hold = 2.0
+        classify("standard", "k")
+        with pytest.raises(Overloaded) as raised:
+            queue.check()
+        return queue, raised.value
+
+    queue, error = asyncio.run(run())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "2"
+    assert queue.shed["standard"] == 1
+
+
+def test_shed_after_waiting_for_the_deadline():
+    async def run():
+        queue = AdmissionQueue("test", 1, deadline=0.05)
+        queue.in_use = 1
+        classify("standard", "k")
+        with pytest.raises(Overloaded):
+            async with queue.slot():
+                pass
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.in_use == 1
+    assert queue.queued["standard"] == 0
+    assert queue.shed["standard"] == 1
+
+
+def test_unshed_requests_wait_past_the_deadline():
+    async def run():
+        queue = AdmissionQueue("test", 1, deadline=0.01)
+        queue.in_use = 1
+        queue._hold = 10.0
+        classify("batch", "job", shed=False)
+        task = asyncio.create_task(queue._acquire())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        queue._release()
+        await task
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.in_use == 1
+    assert queue.shed["batch"] == 0
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def run():
+        queue = AdmissionQueue("test", 1, deadline=5)
+        queue.in_use = 1
+        classify("standard", "k")
+        task = asyncio.create_task(queue._acquire())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        queue._release()
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.in_use == 0
+    assert queue.queued["standard"] == 0
+
+
+def test_slot_handed_over_as_deadline_passes_is_kept(monkeypatch):
+    async def run():
+        queue = AdmissionQueue("test", 1, deadline=5)
+        queue.in_use = 1
+
+        async def wait_for(waiter, timeout):
+            # The holder releases (handing its slot to this waiter) just as the timeout fires
+            queue._release()
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", wait_for)
+        classify("standard", "k")
+        async with queue.slot():
+            in_use = queue.in_use
+        return queue, in_use
+
+    queue, in_use = asyncio.run(run())
+    assert in_use == 1
+    assert queue.in_use == 0
+    assert queue.shed["standard"] == 0
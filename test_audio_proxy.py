@@ -0,0 +1,66 @@
+"""
+Unit tests for audio_proxy.py: workers sharing AUDIO_PROXY_DIR serve each
+other's cached audio
+"""
+
+import asyncio
+
+import httpx
+
+from audio_proxy import AudioProxy
+
+AUDIO_URL = "https://murf.example/speech/reply.mp3"
+
+
+def _http(fetches):
+    def handler(request):
+        fetches.append(str(request.url))
+        return httpx.Response(200, content=b"mp3 bytes")
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _proxy(http, directory):
+    return AudioProxy(http, enabled=True, directory=str(directory))
+
+
+def test_file_cached_by_another_worker_is_served(tmp_path):
+    async def scenario():
+        fetches = []
+        async with _http(fetches) as http:
+            first, second = _proxy(http, tmp_path), _proxy(http, tmp_path)
+            await first.start()
+            await second.start()
+            name = first.local_url(AUDIO_URL).rsplit("/", 1)[1]
+            await asyncio.gather(*first._tasks)
+            # The second worker never saw this id
+            return await second.get(name), second.stats()["disk_hits"], fetches
+
+    audio, disk_hits, fetches = asyncio.run(scenario())
+    assert audio == b"mp3 bytes"
+    assert disk_hits == 1
+    assert fetches == [AUDIO_URL]
+
+
+def test_prefetch_reuses_file_cached_by_another_worker(tmp_path):
+    async def scenario():
+        fetches = []
+        async with _http(fetches) as http:
+            first, second = _proxy(http, tmp_path), _proxy(http, tmp_path)
+            first.local_url(AUDIO_URL)
+            await asyncio.gather(*first._tasks)
+            name = second.local_url(AUDIO_URL).rsplit("/", 1)[1]
+            await asyncio.gather(*second._tasks)
+            return await second.get(name), fetches
+
+    audio, fetches = asyncio.run(scenario())
+    assert audio == b"mp3 bytes"
+    assert fetches == [AUDIO_URL]
+
+
+def test_unknown_id_is_none(tmp_path):
+    async def scenario():
+        async with _http([]) as http:
+            return await _proxy(http, tmp_path).get("0" * 32 + ".mp3")
+
+    assert asyncio.run(scenario()) is None
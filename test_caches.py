@@ -0,0 +1,104 @@
+"""
+Unit tests for caches.py (ResultCache and StaleWhileRevalidate)
+"""
+
+import asyncio
+import os
+
+from caches import ResultCache, StaleWhileRevalidate, normalize_text, tts_key
+
+
+def test_tts_key_and_normalize_text():
+    assert normalize_text("  hello \n world ") == "hello world"
+    assert tts_key("hi", "en-US-natalie", "MP3") == tts_key("hi", "en-US-natalie", "MP3")
+    assert tts_key("hi", "en-US-natalie", "MP3") != tts_key("hi", "en-US-terrell", "MP3")
+
+
+def test_lru_eviction_and_counters():
+    async def run():
+        cache = ResultCache("test", max_entries=2)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        assert await cache.get("a", source="/x") == 1
+        await cache.set("c", 3)
+        # "b" was least recently used
+        return cache, await cache.get("b", source="/x"), await cache.get("a"), await cache.get("c")
+
+    cache, b, a, c = asyncio.run(run())
+    assert (b, a, c) == (None, 1, 3)
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+    assert stats["sources"]["/x"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_ttl_expires_entries(monkeypatch):
+    async def run():
+        cache = ResultCache("test", ttl=10)
+        await cache.set("k", "v")
+        monkeypatch.setattr("caches.time.time", lambda: now + 11)
+        return cache, await cache.get("k")
+
+    now = 1_000_000.0
+    monkeypatch.setattr("caches.time.time", lambda: now)
+    cache, value = asyncio.run(run())
+    assert value is None
+    assert cache.evictions == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    async def run():
+        await ResultCache("test", disk_dir=str(tmp_path)).set("ab12", {"text": "hello"})
+        restarted = ResultCache("test", disk_dir=str(tmp_path))
+        return restarted, await restarted.get("ab12"), await restarted.get("ab12")
+
+    restarted, first, second = asyncio.run(run())
+    assert first == second == {"text": "hello"}
+    assert (restarted.disk_hits, restarted.memory_hits) == (1, 1)
+    assert os.path.exists(tmp_path / "ab" / "ab12.json")
+
+
+def test_disk_prune_keeps_newest(tmp_path):
+    async def run():
+        cache = ResultCache("test", disk_dir=str(tmp_path), max_disk_entries=3)
+        cache.DISK_PRUNE_EVERY = 1000
+        for i in range(5):
+            await cache.set(f"{i:02d}key", i)
+            os.utime(cache._disk_path(f"{i:02d}key"), (1000 + i, 1000 + i))
+        cache._disk_prune()
+
+    asyncio.run(run())
+    kept = sorted(name for _, _, names in os.walk(tmp_path) for name in names)
+    assert kept == ["02key.json", "03key.json", "04key.json"]
+
+
+def test_stale_while_revalidate_serves_stale_during_refresh(tmp_path):
+    async def run():
+        values = iter(["first", "second"])
+        fetches = []
+
+        async def fetch():
+            fetches.append(None)
+            await asyncio.sleep(0.01)
+            return next(values)
+
+        snapshot = str(tmp_path / "voices.json")
+        holder = StaleWhileRevalidate("voices", fetch, ttl=60, snapshot_path=snapshot)
+        first = await asyncio.gather(holder.get(), holder.get())
+        holder.fetched_at -= 120
+        stale = await holder.get()
+        await holder._refresh_task
+        fresh = await holder.get()
+
+        warmed = StaleWhileRevalidate("voices", fetch, ttl=60, snapshot_path=snapshot)
+        await warmed.load_snapshot()
+        return first, stale, fresh, len(fetches), warmed
+
+    first, stale, fresh, fetches, warmed = asyncio.run(run())
+    # Concurrent first requests share one fetch
+    assert first[0] == first[1] and first[0][0] == "first"
+    assert stale[0] == "first"
+    assert fresh[0] == "second" and fresh[1] != first[0][1]
+    assert fetches == 2
+    assert warmed.value == "second" and warmed.etag == fresh[1]
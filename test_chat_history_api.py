@@ -0,0 +1,98 @@
+"""
+Unit tests for GET /agent/chat/{session_id} (incremental, paged chat history)
+"""
+
+import asyncio
+import gzip
+
+from fastapi.testclient import TestClient
+
+import app
+
+client = TestClient(app.app)
+
+
+def _session(count: int) -> str:
+    session_id = client.post("/agent/session").json()["session_id"]
+
+    async def fill():
+        for i in range(count):
+            role = "user" if i % 2 == 0 else "assistant"
+            await app.session_store.append(session_id, {"role": role, "content": f"message {i}", "timestamp": 1700000000.0 + i})
+
+    asyncio.run(fill())
+    return session_id
+
+
+def test_full_history_has_indices():
+    session_id = _session(4)
+    data = client.get(f"/agent/chat/{session_id}").json()
+    assert [m["index"] for m in data["messages"]] == [0, 1, 2, 3]
+    assert data["message_count"] == 4
+    assert data["next_cursor"] == 4
+    assert data["has_more"] is False
+
+
+def test_since_index_and_timestamp():
+    session_id = _session(5)
+    data = client.get(f"/agent/chat/{session_id}", params={"since": 3}).json()
+    assert [m["content"] for m in data["messages"]] == ["message 3", "message 4"]
+    data = client.get(f"/agent/chat/{session_id}", params={"since": "1700000002.5"}).json()
+    assert [m["index"] for m in data["messages"]] == [3, 4]
+
+
+def test_cursor_pages_through_history():
+    session_id = _session(5)
+    seen, cursor, more = [], 0, True
+    while more:
+        data = client.get(f"/agent/chat/{session_id}", params={"cursor": cursor, "limit": 2}).json()
+        seen += [m["index"] for m in data["messages"]]
+        cursor, more = data["next_cursor"], data["has_more"]
+    assert seen == [0, 1, 2, 3, 4]
+
+
+def test_limit_below_one_is_rejected():
+    session_id = _session(3)
+    for limit in (0, -1):
+        assert client.get(f"/agent/chat/{session_id}", params={"limit": limit}).status_code == 400
+
+
+def test_bad_since_and_unknown_session():
+    session_id = _session(1)
+    assert client.get(f"/agent/chat/{session_id}", params={"since": "soon"}).status_code == 400
+    assert client.get(f"/agent/chat/{session_id}", params={"since": -1}).status_code == 400
+    assert client.get("/agent/chat/no-such-session").status_code == 404
+
+
+def test_etag_revalidation():
+    session_id = _session(2)
+    response = client.get(f"/agent/chat/{session_id}")
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"') and etag.endswith('-2"')
+    assert client.get(f"/agent/chat/{session_id}", headers={"If-None-Match": etag}).status_code == 304
+    asyncio.run(app.session_store.append(session_id, {"role": "user", "content": "more"}))
+    response = client.get(f"/agent/chat/{session_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == etag.replace('-2"', '-3"')
+
+
+def test_etag_changes_when_session_starts_over():
+    session_id = _session(2)
+    etag = client.get(f"/agent/chat/{session_id}").headers["etag"]
+    # Dropped from memory (idle, or over the session cap), then started again by a new turn
+    app.session_store._sessions.pop(session_id)
+    asyncio.run(app.session_store.append(session_id, {"role": "user", "content": "a"}))
+    asyncio.run(app.session_store.append(session_id, {"role": "assistant", "content": "b"}))
+    response = client.get(f"/agent/chat/{session_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["messages"][0]["content"] == "a"
+
+
+def test_large_history_is_gzipped():
+    session_id = _session(60)
+    response = client.get(f"/agent/chat/{session_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["messages"]) == 60
+    raw = client.get(f"/agent/chat/{session_id}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert len(gzip.compress(raw.content)) < len(raw.content)
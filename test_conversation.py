@@ -0,0 +1,132 @@
+"""
+Unit tests for conversation.py (token-budgeted chat context)
+"""
+
+import asyncio
+
+from conversation import ConversationContext, _Summary, estimate_tokens, summary_prompt
+
+
+def _message(role, content):
+    return {"role": role, "content": content}
+
+
+def _turns(count, size=40):
+    return [_message("user" if i % 2 == 0 else "assistant", f"{i}:" + "x" * size) for i in range(count)]
+
+
+async def _no_summary(previous, messages):
+    raise AssertionError("summarize should not be called")
+
+
+def _context(summarize=_no_summary, history=None, **kwargs):
+    async def load_messages(session_id, start, limit):
+        messages = history if history is not None else []
+        reads.append((start, limit))
+        return [{**m, "index": i} for i, m in enumerate(messages)][start:start + limit], len(messages)
+
+    reads = []
+    context = ConversationContext(summarize, load_messages, **kwargs)
+    context.reads = reads
+    return context
+
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 400) == 100
+
+
+def test_build_short_history_is_verbatim():
+    context = _context()
+    messages = _turns(3)
+    contents, info = context.build("s", messages, 3)
+    assert [c["role"] for c in contents] == ["user", "model", "user"]
+    assert contents[-1]["parts"] == [messages[-1]["content"]]
+    assert info["verbatim_messages"] == 3
+    assert info["summarized_messages"] == 0
+
+
+def test_build_merges_same_role_and_starts_with_user():
+    context = _context()
+    messages = [_message("assistant", "hello"), _message("user", "a"), _message("user", "b")]
+    contents, _ = context.build("s", messages, 3)
+    assert contents[0]["role"] == "user"
+    assert contents[1] == {"role": "model", "parts": ["hello"]}
+    assert contents[2] == {"role": "user", "parts": ["a", "b"]}
+
+
+def test_build_keeps_current_message_over_budget():
+    async def run():
+        context = _context(token_budget=1)
+        build = context.build("s", messages, 4)
+        # The overflow would be summarized in the background; not under test here
+        for task in context._summarizing.values():
+            task.cancel()
+        return build
+
+    messages = _turns(4, size=400)
+    contents, info = asyncio.run(run())
+    assert info["verbatim_messages"] == 1
+    assert contents[-1]["parts"] == [messages[-1]["content"]]
+
+
+def test_build_uses_summary_and_schedules_overflow():
+    summaries = []
+
+    async def summarize(previous, messages):
+        summaries.append((previous, [m["content"] for m in messages]))
+        return "new summary"
+
+    async def run():
+        history = _turns(10, size=400)
+        context = _context(summarize, history, token_budget=300)
+        context._summaries["s"] = _Summary("old summary", 2)
+        contents, info = context.build("s", history, 10)
+        assert contents[0]["parts"][0].endswith("old summary")
+        assert contents[-1]["parts"] == [history[-1]["content"]]
+        assert info["summarized_messages"] == 2
+        await asyncio.gather(*context._summarizing.values())
+        return history, context, info
+
+    history, context, info = asyncio.run(run())
+    # Only the messages between the old summary and the verbatim window are folded in
+    assert summaries == [("old summary", [m["content"] for m in history[2:10 - info["verbatim_messages"]]])]
+    assert context._summaries["s"].text == "new summary"
+    assert context._summaries["s"].upto == 10 - info["verbatim_messages"]
+    # Only the range being folded in is read from the store
+    assert context.reads == [(2, 8 - info["verbatim_messages"])]
+
+
+def test_build_drops_summary_of_restarted_session():
+    context = _context()
+    context._summaries["s"] = _Summary("about the old session", 6)
+    current = _message("user", "hello again")
+    contents, info = context.build("s", [current], 1)
+    assert contents == [{"role": "user", "parts": ["hello again"]}]
+    assert info["summary_tokens"] == 0
+    assert "s" not in context._summaries
+
+
+def test_build_empty_summary_of_restarted_session():
+    context = _context()
+    context._summaries["s"] = _Summary("", 4)
+    contents, _ = context.build("s", [_message("user", "hi")], 1)
+    assert contents == [{"role": "user", "parts": ["hi"]}]
+
+
+def test_summary_update_skipped_when_session_restarted():
+    async def run():
+        context = _context(history=[_message("user", "hi")])
+        await context._update_summary("s", 5)
+        return context
+
+    context = asyncio.run(run())
+    assert "s" not in context._summaries
+    assert context.summary_errors == 0
+
+
+def test_summary_prompt_lists_turns():
+    prompt = summary_prompt("", [_message("user", "I like tea"), _message("assistant", "Noted")])
+    assert "(none yet)" in prompt
+    assert "User: I like tea\nAssistant: Noted" in prompt
@@ -0,0 +1,40 @@
+"""
+Unit tests for job submission (POST /jobs/...): idempotency keys are scoped
+"""
+
+import uuid
+
+from fastapi.testclient import TestClient
+
+import app
+
+
+def _submit(client: TestClient, path: str, key: str) -> str:
+    response = client.post(
+        path, files={"file": ("a.wav", uuid.uuid4().bytes, "audio/wav")}, headers={"Idempotency-Key": key},
+    )
+    assert response.status_code == 202, response.text
+    return response.json()["job_id"]
+
+
+def test_same_key_from_same_client_returns_original_job():
+    client = TestClient(app.app, client=("10.0.0.1", 50000))
+    key = uuid.uuid4().hex
+    assert _submit(client, "/jobs/tts/echo", key) == _submit(client, "/jobs/tts/echo", key)
+
+
+def test_same_key_from_other_clients_is_a_new_job():
+    key = uuid.uuid4().hex
+    first = _submit(TestClient(app.app, client=("10.0.0.1", 50000)), "/jobs/tts/echo", key)
+    second = _submit(TestClient(app.app, client=("10.0.0.2", 50000)), "/jobs/tts/echo", key)
+    assert first != second
+
+
+def test_session_jobs_are_scoped_to_the_session(monkeypatch):
+    monkeypatch.setattr(app, "API_KEY", "test")
+    monkeypatch.setattr(app, "GEMINI_API_KEY", "test")
+    client = TestClient(app.app)
+    key = uuid.uuid4().hex
+    first = _submit(client, "/jobs/agent/chat/session-a", key)
+    assert _submit(client, "/jobs/agent/chat/session-a", key) == first
+    assert _submit(client, "/jobs/agent/chat/session-b", key) != first
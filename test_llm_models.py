@@ -0,0 +1,51 @@
+"""
+Unit tests for llm_models.py: models are built off the event loop
+"""
+
+import asyncio
+import threading
+import time
+
+from llm_models import ModelRegistry
+
+
+class _Registry(ModelRegistry):
+    """Builds placeholder models slowly, like a first SDK import."""
+
+    def _build(self, name):
+        self.builds += 1
+        time.sleep(0.2)
+        return (name, threading.get_ident())
+
+
+def test_aget_builds_off_the_event_loop():
+    async def scenario():
+        registry = _Registry(preload=["preloaded"], max_extra=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        model = await registry.aget("other")
+        task.cancel()
+        return model, ticks, await registry.aget("other"), registry.builds
+
+    (name, thread), ticks, again, builds = asyncio.run(scenario())
+    assert name == "other"
+    assert thread != threading.get_ident()
+    # The loop kept running while the model was built
+    assert ticks >= 5
+    assert again == (name, thread) and builds == 1
+
+
+def test_extra_models_are_bounded():
+    registry = _Registry(preload=["preloaded"], max_extra=1)
+    for name in ("preloaded", "a", "b"):
+        registry.get(name)
+    assert registry.stats()["preloaded"] == ["preloaded"]
+    assert registry.stats()["extra"] == ["b"]
+    assert registry.cached("a") is None
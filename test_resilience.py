@@ -0,0 +1,140 @@
+"""
+Unit tests for resilience.py (adaptive timeouts, hedging, circuit breaker)
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpen, LatencyWindow, ProviderPolicy, ProviderTimeout, is_failed_response
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def _filled_window(policy: ProviderPolicy, operation: str, seconds: float):
+    window = policy._window(operation)
+    for _ in range(resilience.PROVIDER_MIN_SAMPLES):
+        window.add(seconds)
+
+
+def test_failed_response():
+    assert is_failed_response(_Response(500))
+    assert is_failed_response(_Response(429))
+    assert not is_failed_response(_Response(404))
+    assert not is_failed_response("text")
+
+
+def test_latency_window_needs_min_samples():
+    window = LatencyWindow()
+    for i in range(resilience.PROVIDER_MIN_SAMPLES - 1):
+        window.add(i)
+    assert window.quantile(0.5) is None
+    window.add(100)
+    assert window.quantile(0.99) == 100
+
+
+def test_timeout_adapts_to_latency():
+    policy = ProviderPolicy("test", min_timeout=2, max_timeout=60)
+    assert policy.timeout("op") == 60
+    _filled_window(policy, "op", 1.0)
+    assert policy.timeout("op") == 1.0 * resilience.PROVIDER_TIMEOUT_MULTIPLIER
+    _filled_window(policy, "fast", 0.01)
+    assert policy.timeout("fast") == 2
+
+
+def test_call_times_out():
+    async def run():
+        policy = ProviderPolicy("test", min_timeout=0.05, max_timeout=0.05)
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        with pytest.raises(ProviderTimeout) as raised:
+            await policy.call("op", slow)
+        return policy, raised.value
+
+    policy, error = asyncio.run(run())
+    assert error.status_code == 504
+    assert policy.timeouts == 1
+    assert policy.breaker._outcomes[-1] is True
+
+
+def test_hedge_wins_over_slow_attempt():
+    async def run():
+        policy = ProviderPolicy("test", hedge=True, hedge_budget=1.0)
+        _filled_window(policy, "op", 0.01)
+        policy.calls = 10
+        attempts = []
+
+        async def fn():
+            attempts.append(None)
+            await asyncio.sleep(1 if len(attempts) == 1 else 0)
+            return len(attempts)
+
+        return policy, await policy.call("op", fn, hedge=True)
+
+    policy, result = asyncio.run(run())
+    assert result == 2
+    assert (policy.hedges, policy.hedge_wins) == (1, 1)
+
+
+def test_client_errors_dont_count_against_provider():
+    async def run():
+        policy = ProviderPolicy("test")
+
+        async def bad_request():
+            raise HTTPException(status_code=400, detail="bad input")
+
+        with pytest.raises(HTTPException):
+            await policy.call("op", bad_request)
+        return policy
+
+    policy = asyncio.run(run())
+    assert policy.failures == 0
+    assert list(policy.breaker._outcomes) == [False]
+
+
+def test_breaker_opens_then_probe_closes_it(monkeypatch):
+    async def run():
+        breaker = CircuitBreaker("test", window=4, min_calls=4, failure_ratio=0.5, cooldown=10)
+        for failed in (False, True, False, True):
+            assert await breaker.acquire() is False
+            breaker.record(failed, probe=False)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpen) as raised:
+            await breaker.acquire()
+        assert raised.value.status_code == 503
+        assert raised.value.headers["Retry-After"] == "10"
+
+        monkeypatch.setattr(resilience.time, "monotonic", lambda: breaker._opened_at + 11)
+        assert await breaker.acquire() is True
+        waiting = asyncio.create_task(breaker.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        breaker.record(False, probe=True)
+        return breaker, await waiting
+
+    breaker, second = asyncio.run(run())
+    assert breaker.state == "closed"
+    assert second is False
+    assert breaker.opens == 1
+
+
+def test_failed_probe_reopens_breaker(monkeypatch):
+    async def run():
+        breaker = CircuitBreaker("test", window=2, min_calls=2, failure_ratio=0.5, cooldown=10)
+        breaker.record(True, probe=False)
+        breaker.record(True, probe=False)
+        monkeypatch.setattr(resilience.time, "monotonic", lambda: breaker._opened_at + 11)
+        probe = await breaker.acquire()
+        breaker.record(True, probe=probe)
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.state == "open"
+    assert breaker.opens == 2
@@ -0,0 +1,176 @@
+"""
+Unit tests for session_store.py; the shared-store tests run against the
+memory and SQLite backends, and Redis when one is reachable at
+SESSION_REDIS_URL
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from session_store import MemorySessionStore, RedisSessionStore, SQLiteSessionStore, create_session_store
+
+
+def _message(i, timestamp=None):
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}", "timestamp": timestamp}
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def run(request, tmp_path):
+    """Run `scenario(store)` on a fresh store of each backend."""
+
+    def make():
+        if request.param == "memory":
+            return MemorySessionStore(idle_seconds=0)
+        if request.param == "sqlite":
+            return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        return RedisSessionStore(prefix=f"test-{uuid.uuid4().hex}")
+
+    def runner(scenario):
+        async def main():
+            store = make()
+            try:
+                await store.start()
+            except OSError:
+                pytest.skip("no Redis server reachable")
+            try:
+                return await scenario(store)
+            finally:
+                await store.close()
+
+        return asyncio.run(main())
+
+    return runner
+
+
+def test_create_exists_and_append(run):
+    async def scenario(store):
+        assert not await store.exists("s")
+        assert await store.version("s") is None
+        await store.create("s")
+        assert await store.exists("s")
+        epoch, count = await store.version("s")
+        assert count == 0
+        counts = [await store.append("s", _message(i, 100.0 + i)) for i in range(3)]
+        return counts, await store.messages("s"), await store.messages("s", last=2), await store.version("s") == (epoch, 3)
+
+    counts, messages, last, same_epoch = run(scenario)
+    assert counts == [1, 2, 3]
+    assert [m["content"] for m in messages] == ["message 0", "message 1", "message 2"]
+    assert messages[0] == {"role": "user", "content": "message 0", "timestamp": 100.0}
+    assert [m["content"] for m in last] == ["message 1", "message 2"]
+    assert same_epoch
+
+
+def test_concurrent_appends_are_not_lost(run):
+    async def scenario(store):
+        await store.create("s")
+        counts = await asyncio.gather(*(store.append("s", _message(i)) for i in range(20)))
+        return sorted(counts), await store.tail("s")
+
+    counts, (messages, total) = run(scenario)
+    assert counts == list(range(1, 21))
+    assert total == 20 and len(messages) == 20
+
+
+def test_page_by_index_limit_and_timestamp(run):
+    async def scenario(store):
+        await store.create("s")
+        for i in range(6):
+            await store.append("s", _message(i, 100.0 + i))
+        return (
+            await store.page("s", 2, 3),
+            await store.page("s", 5),
+            await store.page("s", 6, 10),
+            await store.page("s", 0, 2, after=102.5),
+            await store.page("missing"),
+        )
+
+    middle, last, empty, recent, missing = run(scenario)
+    assert [m["index"] for m in middle[0]] == [2, 3, 4] and middle[1] == 6
+    assert last[0] == [{"role": "assistant", "content": "message 5", "timestamp": 105.0, "index": 5}]
+    assert empty == ([], 6)
+    assert [m["index"] for m in recent[0]] == [3, 4]
+    assert missing == ([], 0)
+
+
+def test_memory_keeps_newest_messages_and_indices():
+    async def scenario():
+        store = MemorySessionStore(max_messages=3, idle_seconds=0)
+        await store.create("s")
+        for i in range(5):
+            await store.append("s", _message(i))
+        return await store.tail("s"), await store.page("s", 0)
+
+    (messages, total), (page, page_total) = asyncio.run(scenario())
+    assert total == page_total == 5
+    assert [m["content"] for m in messages] == ["message 2", "message 3", "message 4"]
+    assert [m["index"] for m in page] == [2, 3, 4]
+
+
+def test_memory_evicts_least_recently_used():
+    async def scenario():
+        store = MemorySessionStore(max_sessions=2, idle_seconds=0)
+        for session_id in ("a", "b"):
+            await store.create(session_id)
+        await store.append("a", _message(0))
+        await store.create("c")
+        return store, [await store.exists(s) for s in ("a", "b", "c")]
+
+    store, exists = asyncio.run(scenario())
+    assert exists == [True, False, True]
+    assert store.evictions == 1
+
+
+def test_memory_session_started_over_has_new_epoch():
+    async def scenario():
+        store = MemorySessionStore(max_sessions=1, idle_seconds=0)
+        await store.append("a", _message(0))
+        before = await store.version("a")
+        # "a" is dropped, and the next append starts it over with the same count
+        await store.create("b")
+        await store.append("a", _message(0))
+        return before, await store.version("a")
+
+    before, after = asyncio.run(scenario())
+    assert before[1] == after[1] == 1
+    assert before[0] != after[0]
+
+
+def test_memory_spills_and_reloads(tmp_path):
+    async def scenario():
+        store = MemorySessionStore(max_sessions=1, idle_seconds=0, spill_dir=str(tmp_path))
+        await store.create("a")
+        await store.append("a", _message(0, 1.0))
+        epoch, _ = await store.version("a")
+        await store.create("b")
+        spilled = store.spilled
+        reloaded = await asyncio.gather(store.messages("a"), store.messages("a"))
+        count = await store.append("a", _message(1))
+        return store, spilled, reloaded, count, epoch, await store.version("a")
+
+    store, spilled, reloaded, count, epoch, version = asyncio.run(scenario())
+    assert spilled == 1
+    assert reloaded[0] == reloaded[1] == [{"role": "user", "content": "message 0", "timestamp": 1.0}]
+    assert count == 2
+    assert version == (epoch, 2)
+    assert store.reloads == 1
+
+
+def test_memory_idle_sessions_are_swept():
+    async def scenario():
+        store = MemorySessionStore(idle_seconds=0.04)
+        await store.start()
+        await store.create("s")
+        await asyncio.sleep(0.1)
+        exists = await store.exists("s")
+        await store.close()
+        return exists
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_session_store("cassandra")
@@ -0,0 +1,102 @@
+"""
+Unit tests for singleflight.py (request coalescing)
+"""
+
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    async def run():
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("k", fn) for _ in range(5)))
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(run())
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flights.stats() == {"calls": 5, "upstream_calls": 1, "saved": 4, "in_flight": 0}
+
+
+def test_different_keys_are_not_coalesced():
+    async def run():
+        flights = SingleFlight("test")
+
+        async def fn(value):
+            await asyncio.sleep(0)
+            return value
+
+        return await asyncio.gather(flights.do("a", lambda: fn(1)), flights.do("b", lambda: fn(2)))
+
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_error_reaches_every_waiter():
+    async def run():
+        flights = SingleFlight("test")
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        return await asyncio.gather(*(flights.do("k", fn) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_cancelled_waiter_leaves_shared_call_running():
+    async def run():
+        flights = SingleFlight("test")
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(flights.do("k", fn))
+        second = asyncio.create_task(flights.do("k", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first
+
+    result, first = asyncio.run(run())
+    assert result == "done"
+    assert first.cancelled()
+
+
+def test_retry_after_last_waiter_cancels_starts_new_call():
+    async def run():
+        flights = SingleFlight("test")
+        started = []
+
+        async def fn():
+            started.append(None)
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                # Tearing down takes a moment, as closing a connection would
+                await asyncio.shield(asyncio.sleep(0.01))
+                raise
+            return "fresh"
+
+        waiter = asyncio.create_task(flights.do("k", fn))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # Same key while the old call is still winding down
+        result = await flights.do("k", fn)
+        return result, len(started)
+
+    assert asyncio.run(run()) == ("fresh", 2)
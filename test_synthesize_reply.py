@@ -0,0 +1,37 @@
+"""
+Unit tests for long replies synthesized in chunks (_synthesize_reply)
+"""
+
+import asyncio
+
+import pytest
+
+import app
+
+TEXT = "First sentence here. Second sentence here. Third sentence here."
+
+
+@pytest.fixture
+def murf(monkeypatch):
+    async def synthesize(text, voice_id, source=None):
+        return f"https://murf.example/{len(text)}-{text.split()[0].lower()}.mp3"
+
+    monkeypatch.setattr(app, "_synthesize_with_murf", synthesize)
+    monkeypatch.setattr(app, "TTS_CHUNK_CHARS", 25)
+
+
+def test_chunk_urls_are_the_main_result(murf, monkeypatch):
+    monkeypatch.setattr(app, "TTS_PLAYLIST", False)
+    playlists = len(app.audio_proxy._playlists)
+    audio_url, audio_urls = asyncio.run(app._synthesize_reply(TEXT, "voice", source="test"))
+    assert len(audio_urls) == 3
+    assert [url.rsplit("-", 1)[1] for url in audio_urls] == ["first.mp3", "second.mp3", "third.mp3"]
+    assert audio_url == audio_urls[0]
+    assert len(app.audio_proxy._playlists) == playlists
+
+
+def test_playlist_is_opt_in(murf, monkeypatch):
+    monkeypatch.setattr(app, "TTS_PLAYLIST", True)
+    audio_url, audio_urls = asyncio.run(app._synthesize_reply(TEXT, "voice", source="test"))
+    assert audio_url.startswith("/audio/playlist/") and audio_url.endswith(".mp3")
+    assert app.audio_proxy.playlist(audio_url.rsplit("/", 1)[1]) == audio_urls
@@ -0,0 +1,61 @@
+"""
+Unit tests for streamed transcription uploads (POST /transcribe/file): the
+transcript cache is checked before a small recording is uploaded
+"""
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+
+client = TestClient(app.app)
+
+
+@pytest.fixture
+def assemblyai(monkeypatch):
+    """Record uploads instead of calling AssemblyAI."""
+    uploads = []
+
+    async def upload(content):
+        if isinstance(content, bytes):
+            uploads.append(len(content))
+        else:
+            uploads.append(sum([len(chunk) async for chunk in content]))
+        return f"upload-{len(uploads)}"
+
+    async def transcribe(audio_url):
+        return f"transcript of {audio_url}"
+
+    monkeypatch.setattr(app, "ASSEMBLYAI_API_KEY", "test")
+    monkeypatch.setattr(app, "_upload_to_assemblyai", upload)
+    monkeypatch.setattr(app, "_transcribe_uploaded_audio", transcribe)
+    return uploads
+
+
+def _post(audio: bytes):
+    return client.post("/transcribe/file", files={"file": ("a.wav", audio, "audio/wav")})
+
+
+def test_cache_hit_skips_upload(assemblyai):
+    audio = os.urandom(50_000)
+    first, second = _post(audio), _post(audio)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == {"transcript": "transcript of upload-1"}
+    assert assemblyai == [50_000]
+
+
+def test_large_upload_is_streamed_and_cached(assemblyai, monkeypatch):
+    monkeypatch.setattr(app, "STT_BUFFER_BYTES", 10_000)
+    audio = os.urandom(100_000)
+    first, second = _post(audio), _post(audio)
+    assert first.json() == second.json() == {"transcript": "transcript of upload-1"}
+    # Streamed before the hash is known, so each request uploads; the transcript is reused
+    assert assemblyai == [100_000, 100_000]
+
+
+def test_missing_file_field(assemblyai):
+    response = client.post("/transcribe/file", files={"other": ("a.wav", b"x", "audio/wav")})
+    assert response.status_code == 400
+    assert assemblyai == []
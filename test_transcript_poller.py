@@ -0,0 +1,74 @@
+"""
+Unit tests for transcript_poller.py: a slow status check does not hold up
+the polls of other transcripts
+"""
+
+import asyncio
+
+import httpx
+
+from transcript_poller import TranscriptPoller
+
+
+class _FakeHttp:
+    """Answers status polls; polls for IDs in `stuck` hang until released."""
+
+    def __init__(self, stuck=()):
+        self.stuck = set(stuck)
+        self.release = asyncio.Event()
+        self.polls = []
+
+    async def get(self, url, headers=None):
+        transcript_id = url.rsplit("/", 1)[1]
+        self.polls.append(transcript_id)
+        if transcript_id in self.stuck:
+            await self.release.wait()
+        body = {"status": "completed", "text": f"text of {transcript_id}"}
+        return httpx.Response(200, json=body, request=httpx.Request("GET", url))
+
+
+def _poller(http):
+    return TranscriptPoller(http, "http://assemblyai", "key", initial_interval=0.01, max_interval=0.02)
+
+
+def test_slow_poll_does_not_block_others():
+    async def scenario():
+        http = _FakeHttp(stuck={"slow"})
+        poller = _poller(http)
+        await poller.start()
+        try:
+            slow = asyncio.create_task(poller.wait("slow"))
+            fast = await asyncio.wait_for(poller.wait("fast"), 1)
+            await asyncio.sleep(0.05)
+            # Registered while the slow poll is still out
+            late = await asyncio.wait_for(poller.wait("late"), 1)
+            slow_polls = http.polls.count("slow")
+            http.release.set()
+            return fast, late, slow_polls, await asyncio.wait_for(slow, 1)
+        finally:
+            await poller.close()
+
+    fast, late, slow_polls, slow = asyncio.run(scenario())
+    assert fast == "text of fast"
+    assert late == "text of late"
+    # Never polled again while its first poll was in flight
+    assert slow_polls == 1
+    assert slow == "text of slow"
+
+
+def test_close_cancels_polls_in_flight():
+    async def scenario():
+        http = _FakeHttp(stuck={"slow"})
+        poller = _poller(http)
+        await poller.start()
+        waiter = asyncio.create_task(poller.wait("slow"))
+        await asyncio.sleep(0.05)
+        await poller.close()
+        try:
+            await asyncio.wait_for(waiter, 1)
+        except asyncio.CancelledError:
+            pass
+        return waiter.cancelled(), poller.outstanding, poller._in_flight
+
+    cancelled, outstanding, in_flight = asyncio.run(scenario())
+    assert cancelled and outstanding == 0 and not in_flight
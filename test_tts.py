@@ -1,8 +1,30 @@
+#!/usr/bin/env python3
+"""
+Test script for text-to-speech generation (needs the app running on :8000;
+skipped when nothing is listening there)
+"""
+
+import pytest
 import requests
 
-response = requests.post("http://127.0.0.1:5000/generate-audio", json={
-    "text": "The 2010 world cup was held in South Africa"
-})
+BASE_URL = "http://127.0.0.1:8000"
+
+
+def test_tts():
+    try:
+        response = requests.post(f"{BASE_URL}/generate", data={
+            "text": "The 2010 world cup was held in South Africa",
+            "voice_id": "en-US-natalie"
+        }, timeout=60)
+    except requests.ConnectionError:
+        pytest.skip(f"no server running at {BASE_URL}")
+    print("Status Code:", response.status_code)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    print("Response:", data)
+    assert data["audio_url"]
+    assert data["audio_urls"] and all(data["audio_urls"])
+
 
-print("Status Code:", response.status_code)
-print("Response:", response.json())
\ No newline at end of file
+if __name__ == "__main__":
+    test_tts()
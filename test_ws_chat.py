@@ -0,0 +1,63 @@
+"""
+Unit tests for the WebSocket chat upload path (/ws/agent/{session_id})
+"""
+
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+
+client = TestClient(app.app)
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Keys set, the upload fails after its first chunk, and the reply is a bare "done"."""
+    received = []
+
+    async def upload(content):
+        async for chunk in content:
+            received.append(len(chunk))
+            raise RuntimeError("upload failed")
+
+    async def chat_turn_events(session_id, transcript_text, model, voice_id, source):
+        yield "done", {"transcript": transcript_text}
+
+    for key in ("API_KEY", "GEMINI_API_KEY", "ASSEMBLYAI_API_KEY"):
+        monkeypatch.setattr(app, key, "test")
+    monkeypatch.setattr(app.audio_preprocessor, "enabled", False)
+    monkeypatch.setattr(app, "_upload_to_assemblyai", upload)
+    monkeypatch.setattr(app, "_chat_turn_events", chat_turn_events)
+    return received
+
+
+def _turn(frames):
+    with client.websocket_connect("/ws/agent/ws-test") as websocket:
+        for frame in frames:
+            websocket.send_bytes(frame)
+        websocket.send_json({"type": "end"})
+        return websocket.receive_json()
+
+
+def test_streamed_upload_is_capped(providers, monkeypatch):
+    monkeypatch.setattr(app.upload_store, "max_bytes", 100)
+    reply = _turn([os.urandom(60), os.urandom(60)])
+    assert reply["type"] == "error" and "100 byte limit" in reply["detail"]
+
+
+def test_failed_upload_is_reported(providers):
+    reply = _turn([os.urandom(100) for _ in range(3)])
+    assert reply == {"type": "error", "detail": "upload failed"}
+    # Nothing is queued for an upload that already failed
+    assert providers == [100]
+
+
+def test_failed_upload_with_cached_transcript(providers):
+    frames = [os.urandom(100) for _ in range(3)]
+    key = hashlib.sha256(b"".join(frames)).hexdigest()
+    asyncio.run(app.transcript_cache.set(key, "cached words"))
+    assert _turn(frames) == {"type": "done", "transcript": "cached words"}
@@ -0,0 +1,191 @@
+"""
+Background scheduler for AssemblyAI transcript status.
+
+Instead of each request sleeping in its own poll loop, every outstanding
+transcript ID is registered with one TranscriptPoller. A single task schedules the
+polls of all IDs that are due, each as its own task so a slow status check
+never holds up the others, backing off from fast early polls to slower
+later ones, and resolves a future per transcript that the waiting request
+awaits.
+
+In webhook mode AssemblyAI calls us back when a transcript finishes, so the
+poller only checks those IDs on a slow fallback interval (covers lost
+webhooks and webhooks delivered to a different worker).
+
+Status polls are idempotent, so with a ProviderPolicy a slow poll is hedged
+and a stuck one times out.
+"""
+
+import asyncio
+import os
+from typing import Dict, Optional
+
+import httpx
+
+from resilience import ProviderError
+
+POLL_INITIAL_INTERVAL = float(os.getenv("POLL_INITIAL_INTERVAL", "0.3"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "3.0"))
+POLL_BACKOFF = float(os.getenv("POLL_BACKOFF", "1.5"))
+# Polls due within this window of each other are sent together
+POLL_COALESCE_WINDOW = float(os.getenv("POLL_COALESCE_WINDOW", "0.05"))
+WEBHOOK_FALLBACK_INTERVAL = float(os.getenv("WEBHOOK_FALLBACK_INTERVAL", "30"))
+
+
+class _Pending:
+    __slots__ = ("transcript_id", "future", "interval", "next_poll", "webhook", "waiters")
+
+    def __init__(self, transcript_id: str, future: asyncio.Future, interval: float, next_poll: float, webhook: bool):
+        self.transcript_id = transcript_id
+        self.future = future
+        self.interval = interval
+        self.next_poll = next_poll
+        self.webhook = webhook
+        self.waiters = 0
+
+
+class TranscriptPoller:
+    """Tracks outstanding transcript IDs and resolves them as they finish."""
+
+    def __init__(
+        self,
+        http,
+        base_url: str,
+        api_key: Optional[str],
+        initial_interval: float = POLL_INITIAL_INTERVAL,
+        max_interval: float = POLL_MAX_INTERVAL,
+        backoff: float = POLL_BACKOFF,
+        webhook_fallback_interval: float = WEBHOOK_FALLBACK_INTERVAL,
+        policy=None,
+    ):
+        self.http = http
+        self.policy = policy
+        self.base_url = base_url
+        self.api_key = api_key
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.webhook_fallback_interval = webhook_fallback_interval
+        self.polls_sent = 0
+        self._pending: Dict[str, _Pending] = {}
+        # Polls currently out, by transcript ID; an ID is never polled twice at once
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        self._in_flight.clear()
+        for entry in self._pending.values():
+            if not entry.future.done():
+                entry.future.cancel()
+        self._pending.clear()
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._pending)
+
+    async def wait(self, transcript_id: str, webhook: bool = False) -> str:
+        """Wait for a transcript to finish and return its text."""
+        entry = self._pending.get(transcript_id)
+        if entry is None:
+            loop = asyncio.get_running_loop()
+            interval = self.webhook_fallback_interval if webhook else self.initial_interval
+            entry = _Pending(transcript_id, loop.create_future(), interval, loop.time() + interval, webhook)
+            self._pending[transcript_id] = entry
+            self._wakeup.set()
+        entry.waiters += 1
+        try:
+            return await asyncio.shield(entry.future)
+        finally:
+            entry.waiters -= 1
+            # Last waiter gave up (e.g. client disconnected): stop tracking
+            if entry.waiters == 0 and not entry.future.done():
+                entry.future.cancel()
+                self._pending.pop(transcript_id, None)
+
+    async def notify(self, transcript_id: str):
+        """Webhook callback: check a finished transcript right away."""
+        entry = self._pending.get(transcript_id)
+        if entry is not None:
+            # A poll already out for it will see the result just as well
+            await asyncio.shield(self._in_flight.get(transcript_id) or self._start_poll(entry))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            waiting = [e for e in self._pending.values() if e.transcript_id not in self._in_flight]
+            for entry in waiting:
+                if entry.next_poll <= now + POLL_COALESCE_WINDOW:
+                    self._start_poll(entry)
+            waiting = [e for e in waiting if e.transcript_id not in self._in_flight]
+            timeout = min(e.next_poll for e in waiting) - now if waiting else None
+            # Finished polls and new registrations set the event, so the next due time is recomputed
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start_poll(self, entry: _Pending) -> asyncio.Task:
+        task = asyncio.create_task(self._poll(entry))
+        self._in_flight[entry.transcript_id] = task
+        task.add_done_callback(lambda task: self._poll_done(entry, task))
+        return task
+
+    def _poll_done(self, entry: _Pending, task: asyncio.Task):
+        if self._in_flight.get(entry.transcript_id) is task:
+            del self._in_flight[entry.transcript_id]
+        if not task.cancelled() and task.exception() is not None:
+            self._finish(entry, exception=task.exception())
+        self._wakeup.set()
+
+    async def _poll(self, entry: _Pending):
+        if entry.future.done():
+            self._pending.pop(entry.transcript_id, None)
+            return
+        polling_url = f"{self.base_url}/v2/transcript/{entry.transcript_id}"
+        try:
+            self.polls_sent += 1
+            request = lambda: self.http.get(polling_url, headers={"authorization": self.api_key})
+            if self.policy is not None:
+                poll_response = await self.policy.call("poll", request, hedge=True)
+            else:
+                poll_response = await request()
+            if poll_response.status_code != 200:
+                raise RuntimeError(f"Polling failed: {poll_response.text}")
+            body = poll_response.json()
+            status = body["status"]
+        except (httpx.HTTPError, ProviderError, RuntimeError, KeyError, ValueError) as e:
+            self._finish(entry, exception=e)
+            return
+        if status == "completed":
+            self._finish(entry, result=body.get("text", "") or "")
+        elif status == "error":
+            self._finish(entry, exception=RuntimeError(f"Transcription failed: {body.get('error')}"))
+        else:
+            if not entry.webhook:
+                entry.interval = min(entry.interval * self.backoff, self.max_interval)
+            entry.next_poll = asyncio.get_running_loop().time() + entry.interval
+
+    def _finish(self, entry: _Pending, result: Optional[str] = None, exception: Optional[BaseException] = None):
+        self._pending.pop(entry.transcript_id, None)
+        if entry.future.done():
+            return
+        if exception is not None:
+            entry.future.set_exception(exception)
+        else:
+            entry.future.set_result(result)
@@ -0,0 +1,306 @@
+"""
+Streaming upload handling.
+
+MultipartFileStream reads a multipart/form-data request body as it arrives
+and yields the bytes of one file field, so an upload never has to be held
+in memory (or fully received) before it's processed. UploadStore writes such
+a stream to disk in fixed-size chunks off the event loop, enforces a size
+cap as the bytes arrive and stores files under their SHA-256 so identical
+recordings are kept once. A periodic compaction job applies retention.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Stored files unused for this long are deleted (0 = keep forever)
+UPLOAD_RETENTION_DAYS = float(os.getenv("UPLOAD_RETENTION_DAYS", "7"))
+# Oldest files are deleted once the directory grows past this (0 = no cap)
+UPLOAD_MAX_TOTAL_MB = float(os.getenv("UPLOAD_MAX_TOTAL_MB", "1024"))
+UPLOAD_COMPACT_INTERVAL = float(os.getenv("UPLOAD_COMPACT_INTERVAL", "3600"))
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded the configured maximum size."""
+
+
+class MultipartError(ValueError):
+    """The request body isn't a usable multipart/form-data upload."""
+
+
+class MultipartFileStream:
+    """Async iterator over the bytes of one file field of a multipart request.
+
+    Small text fields seen along the way are collected in `fields`; fields
+    sent after the file are available once iteration has finished.
+    """
+
+    MAX_FIELD_SIZE = 64 * 1024
+
+    def __init__(self, request, field: str = "file", max_bytes: Optional[int] = None):
+        self.request = request
+        self.field = field
+        self.max_bytes = max_bytes
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.fields: Dict[str, str] = {}
+        self.size = 0
+        self.found = False
+        # Per-part parser state, filled in by the callbacks below
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._part_name: Optional[str] = None
+        self._is_target = False
+        self._field_value = bytearray()
+        self._pending: List[bytes] = []
+
+    def _parser(self) -> MultipartParser:
+        content_type = self.request.headers.get("content-type", "")
+        kind, params = parse_options_header(content_type)
+        if kind != b"multipart/form-data" or b"boundary" not in params:
+            raise MultipartError("Expected a multipart/form-data upload")
+        return MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._part_name = None
+        self._is_target = False
+        self._field_value = bytearray()
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name")
+        self._part_name = name.decode("utf-8", "replace") if name is not None else None
+        if self._part_name == self.field and b"filename" in options and not self.found:
+            self._is_target = True
+            self.found = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            content_type = self._headers.get(b"content-type")
+            self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._is_target:
+            self._pending.append(data[start:end])
+        elif len(self._field_value) < self.MAX_FIELD_SIZE:
+            self._field_value.extend(data[start:end])
+
+    def _on_part_end(self):
+        if not self._is_target and self._part_name is not None:
+            self.fields[self._part_name] = self._field_value[: self.MAX_FIELD_SIZE].decode("utf-8", "replace")
+
+    def _take_pending(self) -> bytes:
+        data = b"".join(self._pending)
+        self._pending.clear()
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {self.max_bytes} byte limit")
+        return data
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        parser = self._parser()
+        async for chunk in self.request.stream():
+            if chunk:
+                parser.write(chunk)
+            if self._pending:
+                yield self._take_pending()
+        parser.finalize()
+        if self._pending:
+            yield self._take_pending()
+        if not self.found:
+            raise MultipartError(f"Missing file field {self.field!r}")
+
+
+class UploadStore:
+    """Content-addressed upload directory: <dir>/<sha256[:2]>/<sha256>."""
+
+    def __init__(
+        self,
+        directory: str = UPLOAD_DIR,
+        max_bytes: int = UPLOAD_MAX_BYTES,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        retention_days: float = UPLOAD_RETENTION_DAYS,
+        max_total_mb: float = UPLOAD_MAX_TOTAL_MB,
+        compact_interval: float = UPLOAD_COMPACT_INTERVAL,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.retention = retention_days * 86400
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024)
+        self.compact_interval = compact_interval
+        self._task: Optional[asyncio.Task] = None
+        self.stored = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.compacted = 0
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    async def load(self, digest: str) -> bytes:
+        """Contents of a stored upload; KeyError if there is no such upload."""
+        if not is_upload_id(digest):
+            raise KeyError(digest)
+        try:
+            return await asyncio.to_thread(_read, self.path_for(digest))
+        except FileNotFoundError:
+            raise KeyError(digest) from None
+
+    async def save(self, chunks: AsyncIterator[bytes]) -> Tuple[str, int, bool]:
+        """Write a byte stream to the store; returns (sha256, size, deduplicated)."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        size = 0
+        buffer = bytearray()
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            try:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f"Upload exceeds the {self.max_bytes} byte limit")
+                    digest.update(chunk)
+                    buffer.extend(chunk)
+                    if len(buffer) >= self.chunk_size:
+                        await asyncio.to_thread(f.write, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+            finally:
+                await asyncio.to_thread(f.close)
+            key = digest.hexdigest()
+            deduplicated = await asyncio.to_thread(self._commit, tmp_path, key)
+        except BaseException as e:
+            if isinstance(e, UploadTooLarge):
+                self.rejected += 1
+            await asyncio.to_thread(_remove, tmp_path)
+            raise
+        if deduplicated:
+            self.deduplicated += 1
+        else:
+            self.stored += 1
+        return key, size, deduplicated
+
+    def _commit(self, tmp_path: str, key: str) -> bool:
+        path = self.path_for(key)
+        if os.path.exists(path):
+            # Same recording already stored: keep one copy, refresh it for retention
+            os.remove(tmp_path)
+            os.utime(path)
+            return True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return False
+
+    async def start(self):
+        if self._task is None and self.compact_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                self.compacted += await asyncio.to_thread(self.compact)
+            except Exception as e:
+                print("Upload compaction failed:", e)
+            await asyncio.sleep(self.compact_interval)
+
+    def compact(self) -> int:
+        """Delete expired files, then the oldest ones beyond the size cap.
+
+        Only files this store wrote are considered; anything else in the
+        directory (e.g. older uploads saved under their client filename) is left alone.
+        """
+        now = time.time()
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                is_part = root == self.directory and name.startswith(".") and name.endswith(".part")
+                if not is_part and not _is_stored_name(root, name):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if is_part:
+                    # Uploads in progress are left alone; leftovers of interrupted ones go after an hour
+                    if now - st.st_mtime > 3600:
+                        files.append((0.0, st.st_size, path))
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            expired = self.retention > 0 and now - mtime > self.retention
+            over_cap = self.max_total_bytes > 0 and total > self.max_total_bytes
+            if not expired and not over_cap:
+                break
+            if _remove(path):
+                total -= size
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "compacted": self.compacted,
+        }
+
+
+def is_upload_id(name: str) -> bool:
+    """True for a SHA-256 hex digest as returned by /upload_audio."""
+    return len(name) == 64 and all(c in "0123456789abcdef" for c in name)
+
+
+def _is_stored_name(root: str, name: str) -> bool:
+    return is_upload_id(name) and os.path.basename(root) == name[:2]
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False